@@ -0,0 +1,78 @@
+"""
+requests/sec of small downloads and deletes against a local stub server, with a
+fresh connection per request (square_commons make_request, the previous behaviour)
+and with the pooled session owned by SquareFileStoreHelper.
+
+usage (from the repository root): python -m benchmarks.benchmark_connection_pool [--requests 2000]
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from io import BytesIO
+from unittest.mock import patch
+
+from square_commons.api_utils import make_request as unpooled_make_request
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.stub_server import StubFileStoreServer
+
+
+def _unpooled_make_request(session=None, stream=False, **kwargs):
+    # the behaviour before the pooled session: a new connection for every request.
+    return unpooled_make_request(**kwargs)
+
+
+def _requests_per_second(function, number_of_requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number_of_requests):
+        function()
+    return number_of_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with StubFileStoreServer() as server, tempfile.TemporaryDirectory() as temp_dir:
+        helper = SquareFileStoreHelper(
+            param_str_square_file_store_ip=server.host,
+            param_int_square_file_store_port=server.port,
+        )
+        token = helper.upload_file_using_tuple_v0(
+            file=("small.txt", BytesIO(b"x" * 1024), "text/plain")
+        )["data"]["main"]
+
+        def download():
+            helper.download_file_v0(token, temp_dir)
+
+        def delete():
+            helper.delete_file_v0(["missing"])
+
+        results = {"requests": args.requests}
+        for mode in ("unpooled", "pooled"):
+            for name, function in (("download", download), ("delete", delete)):
+                connection_count = server.connection_count
+                if mode == "unpooled":
+                    with patch(
+                        "square_file_store_helper.main.make_request",
+                        _unpooled_make_request,
+                    ):
+                        requests_per_second = _requests_per_second(
+                            function, args.requests
+                        )
+                else:
+                    requests_per_second = _requests_per_second(function, args.requests)
+                results[f"{mode}_{name}"] = {
+                    "requests_per_second": round(requests_per_second, 1),
+                    "new_connections": server.connection_count - connection_count,
+                }
+        helper.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
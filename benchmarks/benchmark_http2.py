@@ -0,0 +1,98 @@
+"""
+files/sec of small uploads, downloads and deletes made by concurrent threads sharing
+one SquareFileStoreHelper, over HTTP/1.1 (a kept-alive connection per thread) and
+over http/2 (param_bool_http2, the threads' requests multiplexed as streams of one
+connection), against the h2c capable stub server. --delay-ms adds server side
+processing time, which each HTTP/1.1 connection spends idle.
+
+the stub and the client share one process and both frame http/2 in pure python, so
+the files/sec understate what a native server gives; new_connections shows the
+connections each protocol needed.
+
+usage (from the repository root):
+    python -m benchmarks.benchmark_http2 [--requests 2000] [--workers 1 16 64]
+        [--size-kb 1] [--delay-ms 0]
+"""
+
+import argparse
+import json
+import os
+import time
+from io import BytesIO
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.concurrency import run_in_parallel
+from square_file_store_helper.stub_server import StubFileStoreServer
+
+
+def _files_per_second(function, number_of_requests: int, workers: int) -> float:
+    start = time.perf_counter()
+    outcomes = run_in_parallel(lambda _: function(), range(number_of_requests), workers)
+    elapsed = time.perf_counter() - start
+    for _, error in outcomes:
+        if error is not None:
+            raise error
+    return number_of_requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--size-kb", type=int, default=1)
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    content = os.urandom(args.size_kb * 1024)
+
+    results = {
+        "requests": args.requests,
+        "size_kb": args.size_kb,
+        "delay_ms": args.delay_ms,
+    }
+    with StubFileStoreServer(http2=True) as server:
+        server.response_delay_seconds = args.delay_ms / 1000
+        for workers in args.workers:
+            for protocol in ("http/1.1", "http/2"):
+                connection_count = server.connection_count
+                helper = SquareFileStoreHelper(
+                    param_str_square_file_store_ip=server.host,
+                    param_int_square_file_store_port=server.port,
+                    param_int_max_connections_per_host=max(workers, 10),
+                    param_bool_http2=protocol == "http/2",
+                )
+                token = helper.upload_file_using_tuple_v0(
+                    file=("small.bin", BytesIO(content), "application/octet-stream")
+                )["data"]["main"]
+
+                def upload():
+                    helper.upload_file_using_tuple_v0(
+                        file=("small.bin", BytesIO(content), "application/octet-stream")
+                    )
+
+                def download():
+                    helper.download_file_to_sink_v0(token, bytearray())
+
+                def delete():
+                    helper.delete_file_v0(["missing"])
+
+                scenario = {}
+                for name, function in (
+                    ("upload", upload),
+                    ("download", download),
+                    ("delete", delete),
+                ):
+                    scenario[f"{name}_files_per_second"] = round(
+                        _files_per_second(function, args.requests, workers), 1
+                    )
+                # the h2c probe counts as one.
+                scenario["new_connections"] = server.connection_count - connection_count
+                helper.close()
+                with server.lock:
+                    server.files = {token: server.files[token]}
+                results[f"{protocol} workers={workers}"] = scenario
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
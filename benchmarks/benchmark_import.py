@@ -0,0 +1,93 @@
+"""
+startup cost of the helper: import time, construction and first delete_file_v0 call
+(as a dict and as pydantic) against a local stub server, each measured in fresh
+python processes so nothing is already imported.
+
+pass several --source-root to compare checkouts, e.g. a previous release from
+    git worktree add /tmp/previous <tag>
+
+usage (from the repository root):
+    python -m benchmarks.benchmark_import [--runs 20] [--source-root . /tmp/previous]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from square_file_store_helper.stub_server import StubFileStoreServer
+
+STAGES = {
+    "import_package": "import square_file_store_helper",
+    "import_helper": "from square_file_store_helper import SquareFileStoreHelper",
+    "construct": (
+        "from square_file_store_helper import SquareFileStoreHelper\n"
+        "helper = SquareFileStoreHelper(param_int_square_file_store_port=port)"
+    ),
+    "first_call": (
+        "from square_file_store_helper import SquareFileStoreHelper\n"
+        "helper = SquareFileStoreHelper(param_int_square_file_store_port=port)\n"
+        "helper.delete_file_v0(['token'])"
+    ),
+    "first_call_pydantic": (
+        "from square_file_store_helper import SquareFileStoreHelper\n"
+        "helper = SquareFileStoreHelper(param_int_square_file_store_port=port)\n"
+        "helper.delete_file_v0(['token'], response_as_pydantic=True)"
+    ),
+}
+CHILD = """
+import json, sys, time
+port = {port}
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": len(sys.modules)}}))
+"""
+
+
+def _measure(source_root: str, code: str, port: int) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD.format(port=port, code=code)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=source_root,
+        env={**os.environ, "PYTHONPATH": source_root},
+    )
+    return json.loads(completed.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--source-root", nargs="+", default=[os.getcwd()])
+    args = parser.parse_args()
+
+    results = {"runs": args.runs, "python": sys.version.split()[0], "results": []}
+    with StubFileStoreServer() as server:
+        for source_root in args.source_root:
+            source_root = os.path.abspath(source_root)
+            for stage, code in STAGES.items():
+                samples = [
+                    _measure(source_root, code, server.port) for _ in range(args.runs)
+                ]
+                results["results"].append(
+                    {
+                        "source_root": source_root,
+                        "stage": stage,
+                        "median_ms": round(
+                            statistics.median(s["seconds"] for s in samples) * 1000, 2
+                        ),
+                        "min_ms": round(min(s["seconds"] for s in samples) * 1000, 2),
+                        "modules_loaded": samples[-1]["modules"],
+                    }
+                )
+                print(f"{source_root} {stage} done", file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+throughput and tail latency of concurrent downloads balanced over a growing number
+of local stub servers, each limited to a fixed number of requests processed at once,
+and the same with one node killed half way through the run.
+
+usage (from the repository root):
+    python -m benchmarks.benchmark_load_balancing [--requests 2000] [--workers 32]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.concurrency import run_in_parallel
+from square_file_store_helper.load_balancing import EndpointPool
+from square_file_store_helper.stub_server import StubFileStoreServer
+
+
+def _percentile(values, percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def _run(args, node_count: int, strategy: str, kill_after: int | None = None):
+    servers = []
+    for _ in range(node_count):
+        server = StubFileStoreServer().start()
+        server.files["token"] = ("small.bin", os.urandom(16 * 1024), "text/plain")
+        server.response_delay_seconds = args.node_delay_ms / 1000
+        server.max_concurrent_requests = args.node_capacity
+        servers.append(server)
+    killed = []
+    completed = [0]
+    lock = threading.Lock()
+    try:
+        with (
+            SquareFileStoreHelper(
+                param_int_max_connections_per_host=args.workers,
+                param_endpoint_pool=EndpointPool(
+                    [server.url_base for server in servers], strategy=strategy
+                ),
+            ) as helper,
+            tempfile.TemporaryDirectory() as temp_dir,
+        ):
+
+            def download(index: int) -> float:
+                output_folder_path = os.path.join(temp_dir, str(index % args.workers))
+                start = time.perf_counter()
+                helper.download_file_v0("token", output_folder_path)
+                latency = time.perf_counter() - start
+                with lock:
+                    completed[0] += 1
+                    if kill_after is not None and completed[0] == kill_after:
+                        servers[-1].stop()
+                        killed.append(servers[-1])
+                return latency
+
+            start = time.perf_counter()
+            outcomes = run_in_parallel(download, range(args.requests), args.workers)
+            elapsed = time.perf_counter() - start
+    finally:
+        for server in servers:
+            if server not in killed:
+                server.stop()
+    latencies = [latency for latency, error in outcomes if error is None]
+    return {
+        "nodes": node_count,
+        "strategy": strategy,
+        "node_killed_after_requests": kill_after,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "errors": sum(error is not None for _, error in outcomes),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--node-counts", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--node-capacity", type=int, default=4)
+    parser.add_argument("--node-delay-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    results = {
+        "requests": args.requests,
+        "workers": args.workers,
+        "node_capacity": args.node_capacity,
+        "node_delay_ms": args.node_delay_ms,
+        "runs": [],
+    }
+    for strategy in ("least_outstanding_requests", "weighted_round_robin"):
+        for node_count in args.node_counts:
+            results["runs"].append(_run(args, node_count, strategy))
+        results["runs"].append(
+            _run(args, max(args.node_counts), strategy, kill_after=args.requests // 2)
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
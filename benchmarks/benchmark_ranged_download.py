@@ -0,0 +1,66 @@
+"""
+download throughput of download_file_using_stream_v0 for growing connection_count
+against a local stub server that caps the throughput of every single connection,
+the way a long round trip time does.
+
+usage (from the repository root):
+    python -m benchmarks.benchmark_ranged_download [--size-mb 32] [--per-connection-mb-per-second 16]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.stub_server import StubFileStoreServer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=32)
+    parser.add_argument("--per-connection-mb-per-second", type=float, default=16)
+    parser.add_argument(
+        "--connection-counts", type=int, nargs="+", default=[1, 2, 4, 8]
+    )
+    args = parser.parse_args()
+
+    results = {
+        "size_mb": args.size_mb,
+        "per_connection_mb_per_second": args.per_connection_mb_per_second,
+        "runs": [],
+    }
+    with StubFileStoreServer() as server, tempfile.TemporaryDirectory() as temp_dir:
+        server.files["token"] = (
+            "large.bin",
+            os.urandom(args.size_mb * 1024 * 1024),
+            "application/octet-stream",
+        )
+        server.download_bytes_per_second = (
+            args.per_connection_mb_per_second * 1024 * 1024
+        )
+        with SquareFileStoreHelper(
+            param_str_square_file_store_ip=server.host,
+            param_int_square_file_store_port=server.port,
+            param_int_max_connections_per_host=max(args.connection_counts),
+        ) as helper:
+            for connection_count in args.connection_counts:
+                start = time.perf_counter()
+                helper.download_file_using_stream_v0(
+                    "token", temp_dir, connection_count=connection_count
+                )
+                elapsed = time.perf_counter() - start
+                results["runs"].append(
+                    {
+                        "connection_count": connection_count,
+                        "seconds": round(elapsed, 3),
+                        "mb_per_second": round(args.size_mb / elapsed, 1),
+                    }
+                )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+decode cost per response of upload_file/v0 and delete_files/v0 json bodies, from
+the parsed dict to the object returned by the helper: the dict itself,
+StandardResponse (pydantic) or StandardResult (response_as_result, validated and
+trusted). microseconds_per_response adds the json parsing shared by all modes.
+
+usage (from the repository root):
+    python -m benchmarks.benchmark_response_decoding [--number 20000] [--tokens 1 100]
+"""
+
+import argparse
+import json
+import timeit
+
+from square_file_store_helper.pydantic_models import (
+    DeleteFilesV0Response,
+    UploadFileV0Response,
+)
+from square_file_store_helper.response_decoding import (
+    decode_delete_files_v0_response,
+    decode_upload_file_v0_response,
+    get_standard_response_model,
+)
+
+
+def _get_modes(data_model, decode):
+    # every mode starts from the dict requests parsed, "dict" returns it as is.
+    standard_response_model = get_standard_response_model(data_model)
+    return {
+        "dict": lambda response: response,
+        "pydantic": lambda response: standard_response_model(**response),
+        "result": decode,
+        "result_trusted": lambda response: decode(response, True),
+    }
+
+
+def _measure(function, number: int, repeat: int) -> float:
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tokens", type=int, nargs="+", default=[1, 100])
+    args = parser.parse_args()
+
+    bodies = [
+        (
+            "upload_file/v0",
+            json.dumps(
+                {"data": {"main": "0" * 36}, "message": None, "log": None}
+            ).encode(),
+            _get_modes(UploadFileV0Response, decode_upload_file_v0_response),
+        )
+    ]
+    for token_count in args.tokens:
+        bodies.append(
+            (
+                f"delete_files/v0 tokens={token_count}",
+                json.dumps(
+                    {
+                        "data": {
+                            "main": [f"{index:036}" for index in range(token_count)],
+                            "failed_file_storage_tokens": [],
+                        },
+                        "message": None,
+                        "log": None,
+                    }
+                ).encode(),
+                _get_modes(DeleteFilesV0Response, decode_delete_files_v0_response),
+            )
+        )
+
+    results = []
+    for name, body, modes in bodies:
+        parse_seconds = _measure(lambda: json.loads(body), args.number, args.repeat)
+        response = json.loads(body)
+        for mode, decode in modes.items():
+            decode_seconds = _measure(
+                lambda: decode(response), args.number, args.repeat
+            )
+            results.append(
+                {
+                    "response": name,
+                    "mode": mode,
+                    "decode_microseconds": round(decode_seconds * 1_000_000, 3),
+                    "microseconds_per_response": round(
+                        (parse_seconds + decode_seconds) * 1_000_000, 3
+                    ),
+                }
+            )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
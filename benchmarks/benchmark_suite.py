@@ -0,0 +1,308 @@
+"""
+throughput, p50 / p99 latency and peak rss of every SquareFileStoreHelper method
+across file sizes and concurrency levels, against the bundled stub server.
+
+every scenario runs in a fresh python process so its peak rss is its own, the stub
+server runs in this process so the measured rss is the client's only. the results
+are printed (or written to --output) as json, --compare reports the change of every
+scenario against an earlier result file and exits with status 1 on regressions.
+
+usage (from the repository root):
+    python -m benchmarks.benchmark_suite [--sizes-kb 1 1024 16384] [--concurrency 1 8]
+        [--requests 40] [--output results.json] [--compare previous.json]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tomllib
+from io import BytesIO
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.concurrency import run_in_parallel
+from square_file_store_helper.stub_server import StubFileStoreServer
+
+TRANSFER_METHODS = (
+    "upload_file_using_file_path_v0",
+    "upload_file_using_file_path_v0[stream]",
+    "upload_file_using_tuple_v0",
+    "download_file_v0",
+    "download_file_using_stream_v0",
+)
+# non ascii on purpose, downloads then go through the filename* parameter of
+# Content-Disposition.
+FILE_NAME = "données é.bin"
+
+
+def _percentile(values, percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def _read_proc_status_mb(field: str) -> float | None:
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    # linux only, elsewhere the peak includes the setup of the scenario.
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        pass
+
+
+def _get_peak_rss_mb() -> float:
+    # ru_maxrss survives fork and exec on linux, it would report the peak of the
+    # suite process, VmHWM belongs to this process only.
+    peak_rss_mb = _read_proc_status_mb("VmHWM")
+    if peak_rss_mb is not None:
+        return peak_rss_mb
+    # kilobytes on linux, bytes on macos.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _run_scenario(
+    port: int, method: str, file_size: int | None, concurrency: int, requests: int
+) -> dict:
+    """
+    runs requests calls of method in this process and measures them.
+    """
+    helper = SquareFileStoreHelper(
+        param_str_square_file_store_ip="127.0.0.1",
+        param_int_square_file_store_port=port,
+        param_int_max_connections_per_host=concurrency,
+    )
+    temp_dir = tempfile.mkdtemp()
+    content = os.urandom(file_size or 0)
+    file_path = os.path.join(temp_dir, FILE_NAME)
+    with open(file_path, "wb") as file:
+        file.write(content)
+    tokens = []
+    if method.startswith("download") or method == "delete_file_v0":
+        count = 1 if method.startswith("download") else requests
+        tokens = [
+            helper.upload_file_using_file_path_v0(file_path)["data"]["main"]
+            for _ in range(count)
+        ]
+    uploaded_tokens = []
+
+    def call(index: int):
+        output_folder_path = os.path.join(temp_dir, str(index))
+        start = time.perf_counter()
+        if method == "upload_file_using_file_path_v0":
+            response = helper.upload_file_using_file_path_v0(file_path)
+        elif method == "upload_file_using_file_path_v0[stream]":
+            response = helper.upload_file_using_file_path_v0(file_path, stream=True)
+        elif method == "upload_file_using_tuple_v0":
+            response = helper.upload_file_using_tuple_v0(
+                (FILE_NAME, BytesIO(content), "application/octet-stream")
+            )
+        elif method == "download_file_v0":
+            helper.download_file_v0(tokens[0], output_folder_path)
+        elif method == "download_file_using_stream_v0":
+            helper.download_file_using_stream_v0(tokens[0], output_folder_path)
+        else:
+            helper.delete_file_v0([tokens[index]])
+        latency = time.perf_counter() - start
+        if method.startswith("upload"):
+            uploaded_tokens.append(response["data"]["main"])
+        if method.startswith("download"):
+            # keeps the disk usage of the run flat, outside of the measurement.
+            shutil.rmtree(output_folder_path)
+        return latency
+
+    baseline_rss_mb = _read_proc_status_mb("VmRSS") or _get_peak_rss_mb()
+    _reset_peak_rss()
+    start = time.perf_counter()
+    outcomes = run_in_parallel(call, range(requests), concurrency)
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = _get_peak_rss_mb()
+    if uploaded_tokens:
+        helper.delete_file_v0(uploaded_tokens)
+    helper.close()
+    shutil.rmtree(temp_dir)
+
+    latencies = [latency for latency, error in outcomes if error is None]
+    errors = [repr(error) for _, error in outcomes if error is not None]
+    result = {
+        "method": method,
+        "file_size": file_size,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "mb_per_second": None,
+        "p50_ms": None,
+        "p99_ms": None,
+        "baseline_rss_mb": round(baseline_rss_mb, 1),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+    if file_size is not None:
+        result["mb_per_second"] = round(
+            len(latencies) * file_size / (1024 * 1024) / elapsed, 2
+        )
+    if latencies:
+        result["p50_ms"] = round(statistics.median(latencies) * 1000, 3)
+        result["p99_ms"] = round(_percentile(latencies, 99) * 1000, 3)
+    return result
+
+
+def _get_version() -> str:
+    pyproject_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pyproject.toml"
+    )
+    with open(pyproject_path, "rb") as file:
+        return tomllib.load(file)["project"]["version"]
+
+
+def _get_key(result: dict) -> str:
+    return f"{result['method']}|{result['file_size']}|{result['concurrency']}"
+
+
+def compare(previous: dict, current: dict, threshold: float) -> dict:
+    """
+    :return: per scenario relative changes (current / previous - 1) of throughput,
+        p99 latency and peak rss, and the scenarios that regressed by more than
+        threshold on any of them.
+    """
+    previous_results = {_get_key(result): result for result in previous["results"]}
+    changes = []
+    regressions = []
+    for result in current["results"]:
+        key = _get_key(result)
+        before = previous_results.get(key)
+        if before is None:
+            continue
+        change = {"scenario": key}
+        for field, higher_is_better in (
+            ("requests_per_second", True),
+            ("p99_ms", False),
+            ("peak_rss_mb", False),
+        ):
+            if not before[field] or result[field] is None:
+                change[field] = None
+                continue
+            relative = result[field] / before[field] - 1
+            change[field] = round(relative, 4)
+            if (-relative if higher_is_better else relative) > threshold:
+                regressions.append(f"{key} {field}")
+        changes.append(change)
+    return {
+        "previous_version": previous.get("version"),
+        "current_version": current.get("version"),
+        "threshold": threshold,
+        "changes": changes,
+        "regressions": regressions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[1, 1024, 16384])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--methods", nargs="+", default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--regression-threshold", type=float, default=0.1)
+    # internal: run a single scenario against --port and print its result.
+    parser.add_argument("--scenario", nargs=3, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario is not None:
+        method, file_size, concurrency = args.scenario
+        print(
+            json.dumps(
+                _run_scenario(
+                    args.port,
+                    method,
+                    None if file_size == "None" else int(file_size),
+                    int(concurrency),
+                    args.requests,
+                )
+            )
+        )
+        return
+
+    methods = args.methods or [*TRANSFER_METHODS, "delete_file_v0"]
+    scenarios = []
+    for method in methods:
+        sizes = [None] if method == "delete_file_v0" else args.sizes_kb
+        for size_kb in sizes:
+            for concurrency in args.concurrency:
+                file_size = None if size_kb is None else size_kb * 1024
+                scenarios.append((method, file_size, concurrency))
+
+    results = {
+        "version": _get_version(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "requests": args.requests,
+        "results": [],
+    }
+    with StubFileStoreServer() as server:
+        for method, file_size, concurrency in scenarios:
+            completed = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.benchmark_suite",
+                    "--scenario",
+                    method,
+                    str(file_size),
+                    str(concurrency),
+                    "--port",
+                    str(server.port),
+                    "--requests",
+                    str(args.requests),
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            results["results"].append(json.loads(completed.stdout))
+            print(
+                f"{method} size={file_size} concurrency={concurrency} done",
+                file=sys.stderr,
+            )
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            results["comparison"] = compare(
+                json.load(file), results, args.regression_threshold
+            )
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as file:
+            file.write(output)
+    if results.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
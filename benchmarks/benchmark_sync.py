@@ -0,0 +1,77 @@
+"""
+duration of DirectorySync.run over a generated tree of small files: the first run
+uploading everything to a local stub server, a second run over the unchanged tree,
+and a third one after changing a few files.
+
+usage (from the repository root):
+    python -m benchmarks.benchmark_sync [--files 100000] [--workers 16]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.stub_server import StubFileStoreServer
+from square_file_store_helper.sync import DirectorySync
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--files-per-folder", type=int, default=500)
+    parser.add_argument("--changed-files", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    results = {"files": args.files, "workers": args.workers, "runs": []}
+    with StubFileStoreServer() as server, tempfile.TemporaryDirectory() as temp_dir:
+        root = os.path.join(temp_dir, "tree")
+        paths = []
+        for index in range(args.files):
+            folder_path = os.path.join(root, f"folder_{index // args.files_per_folder}")
+            if index % args.files_per_folder == 0:
+                os.makedirs(folder_path)
+            path = os.path.join(folder_path, f"file_{index}.txt")
+            with open(path, "wb") as file:
+                file.write(f"content {index}\n".encode())
+            paths.append(path)
+
+        with SquareFileStoreHelper(
+            param_str_square_file_store_ip=server.host,
+            param_int_square_file_store_port=server.port,
+            param_int_max_connections_per_host=args.workers,
+        ) as helper:
+
+            def run(name: str):
+                start = time.perf_counter()
+                output = DirectorySync(
+                    helper,
+                    root,
+                    os.path.join(temp_dir, "manifest.sqlite3"),
+                    max_workers=args.workers,
+                ).run()
+                results["runs"].append(
+                    {
+                        "run": name,
+                        "seconds": round(time.perf_counter() - start, 3),
+                        "uploaded": len(output.uploaded),
+                        "unchanged": output.unchanged,
+                        "errors": len(output.errors),
+                    }
+                )
+
+            run("initial")
+            run("unchanged")
+            for path in paths[: args.changed_files]:
+                with open(path, "ab") as file:
+                    file.write(b"changed\n")
+            run("changed")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
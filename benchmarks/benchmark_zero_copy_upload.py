@@ -0,0 +1,83 @@
+"""
+client cpu time per gigabyte uploaded with upload_file_using_file_path_v0 through
+the buffered path (the whole multipart body built in memory), the streamed path
+(stream=True, the file read in chunks) and the zero copy path (sendfile), against a
+local stub server running in a separate process so only the client is measured.
+
+usage (from the repository root):
+    python -m benchmarks.benchmark_zero_copy_upload [--size-mb 256] [--repeat 4]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.stub_server import StubFileStoreServer
+
+
+def _serve(port_queue, stop_event):
+    with StubFileStoreServer() as server:
+        port_queue.put(server.port)
+        stop_event.wait()
+
+
+def _run(args, port: int, file_path: str, mode: str):
+    with SquareFileStoreHelper(
+        param_int_square_file_store_port=port,
+        param_str_square_file_store_ip="127.0.0.1",
+        param_bool_zero_copy_upload=mode == "zero_copy",
+    ) as helper:
+        cpu_seconds = 0.0
+        wall_seconds = 0.0
+        for _ in range(args.repeat):
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            token = helper.upload_file_using_file_path_v0(
+                file_path, stream=mode == "streamed"
+            )["data"]["main"]
+            cpu_seconds += time.process_time() - cpu_start
+            wall_seconds += time.perf_counter() - wall_start
+            # keeps the memory of the stub server flat.
+            helper.delete_file_v0([token])
+    gigabytes = args.size_mb * args.repeat / 1024
+    return {
+        "mode": mode,
+        "cpu_seconds_per_gb": round(cpu_seconds / gigabytes, 3),
+        "mb_per_second": round(args.size_mb * args.repeat / wall_seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=4)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    port_queue = context.Queue()
+    stop_event = context.Event()
+    process = context.Process(target=_serve, args=(port_queue, stop_event))
+    process.start()
+    results = {"size_mb": args.size_mb, "repeat": args.repeat, "runs": []}
+    try:
+        port = port_queue.get(timeout=30)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "large.bin")
+            with open(file_path, "wb") as file:
+                for _ in range(args.size_mb):
+                    file.write(os.urandom(1024 * 1024))
+            for mode in ("buffered", "streamed", "zero_copy"):
+                results["runs"].append(_run(args, port, file_path, mode))
+    finally:
+        stop_event.set()
+        process.join()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,16 @@ download_file_output = square_file_store_helper.download_file_v0(
 )
 print(download_file_output)
 
+# Example: Download file in chunks (constant memory, atomic rename)
+download_file_using_stream_output = (
+    square_file_store_helper.download_file_using_stream_v0(
+        file_storage_token=upload_file_using_io_output["data"]["main"],
+        output_folder_path=output_folder_path,
+        chunk_size=1024 * 1024,
+    )
+)
+print(download_file_using_stream_output)
+
 # Example: Delete files,
 list_file_storage_token = list()
 list_file_storage_token.append(upload_file_using_path_output["data"]["main"])
@@ -1 +1,61 @@
-from square_file_store_helper.main import *
+import importlib
+
+# names are resolved on first access, so importing the package (or a submodule such
+# as stub_server) does not load requests, pydantic and httpx up front.
+_LAZY_ATTRIBUTES = {
+    "SquareFileStoreHelper": "square_file_store_helper.main",
+    "DEFAULT_DOWNLOAD_CHUNK_SIZE": "square_file_store_helper.main",
+    "DEFAULT_MAX_RESUME_ATTEMPTS": "square_file_store_helper.main",
+    "DEFAULT_DELETE_MAX_BATCH_SIZE": "square_file_store_helper.main",
+    "DEFAULT_DELETE_MAX_URL_LENGTH": "square_file_store_helper.main",
+    "AsyncSquareFileStoreHelper": "square_file_store_helper.async_main",
+    "CompressionPolicy": "square_file_store_helper.content_encoding",
+    "DownloadCache": "square_file_store_helper.download_cache",
+    "EndpointPool": "square_file_store_helper.load_balancing",
+    "RetryEngine": "square_file_store_helper.retry",
+    "Digests": "square_file_store_helper.checksums",
+    "DigestMismatchError": "square_file_store_helper.checksums",
+    "RateLimiter": "square_file_store_helper.rate_limiting",
+    "rate_limit_priority": "square_file_store_helper.rate_limiting",
+    "PRIORITY_INTERACTIVE": "square_file_store_helper.rate_limiting",
+    "PRIORITY_BULK": "square_file_store_helper.rate_limiting",
+    "AdaptiveConcurrencyLimiter": "square_file_store_helper.adaptive_concurrency",
+    "UploadDeduplicationIndex": "square_file_store_helper.upload_deduplication",
+    "UploadFileV0Response": "square_file_store_helper.pydantic_models",
+    "DeleteFilesV0Response": "square_file_store_helper.pydantic_models",
+    "DownloadFileV0Output": "square_file_store_helper.pydantic_models",
+    "BulkUploadFileV0Input": "square_file_store_helper.pydantic_models",
+    "BulkUploadFileV0Output": "square_file_store_helper.pydantic_models",
+    "BulkDownloadFileV0Output": "square_file_store_helper.pydantic_models",
+    "DownloadToSinkV0Output": "square_file_store_helper.pydantic_models",
+    "DownloadStream": "square_file_store_helper.download_stream",
+    "AsyncDownloadStream": "square_file_store_helper.download_stream",
+    "StandardResponse": "square_commons.api_utils",
+    "StandardResult": "square_file_store_helper.response_decoding",
+    "UploadFileV0Result": "square_file_store_helper.response_decoding",
+    "DeleteFilesV0Result": "square_file_store_helper.response_decoding",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    if name.startswith("__"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # anything else main used to re-export is still found there.
+    module = importlib.import_module(
+        _LAZY_ATTRIBUTES.get(name, "square_file_store_helper.main")
+    )
+    if name in globals():
+        # a submodule, bound to the package by the import above.
+        return globals()[name]
+    try:
+        value = getattr(module, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+
+import requests
+
+# the models are only built once the limit changes or stats are asked for.
+if TYPE_CHECKING:
+    from square_file_store_helper.pydantic_models import (
+        ConcurrencyLimitDecision,
+        ConcurrencyLimiterStats,
+    )
+
+# statuses telling that the store is overloaded rather than the request wrong.
+OVERLOAD_STATUS_CODES = (429, 500, 502, 503, 504)
+
+DECISION_SLOW_START = "slow_start"
+DECISION_INCREASE = "increase"
+DECISION_DECREASE_LATENCY = "decrease_latency"
+DECISION_DECREASE_ERRORS = "decrease_errors"
+
+
+def is_overload_error(error: Exception) -> bool:
+    """
+    :return: True for errors that say the store is struggling (connection errors,
+        timeouts, 429 and 5xx responses) rather than that the request was wrong.
+    """
+    if isinstance(error, requests.HTTPError):
+        return (
+            error.response is not None
+            and error.response.status_code in OVERLOAD_STATUS_CODES
+        )
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    number of operations allowed in flight at once, adjusted from their observed
+    latency and error rate (additive increase, multiplicative decrease).
+
+    every window of max(limit, min_window_size) completed operations is compared
+    with the baseline, the lowest window latency seen so far (rising by
+    baseline_drift per window, so a store that became slower for good is
+    eventually taken as the new normal):
+    - an error rate above max_error_rate or a mean latency above
+      latency_tolerance * baseline multiplies the limit by backoff_ratio.
+    - otherwise, if the window used the whole limit, it grows by one, doubling
+      instead until the first decrease (slow start).
+
+    operations started before a decrease are left out of the windows, they still
+    carry the load of the previous limit.
+
+    use it with run_in_parallel(..., limiter=...), the concurrency_limiter of the
+    bulk helpers or slot() around each operation. every change of the limit is kept
+    in get_stats().decisions and passed to on_decision. clock is injectable for
+    deterministic tests.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_tolerance: float = 2.0,
+        max_error_rate: float = 0.1,
+        backoff_ratio: float = 0.5,
+        baseline_drift: float = 0.05,
+        min_window_size: int = 4,
+        max_decisions: int = 100,
+        on_decision: Callable[[ConcurrencyLimitDecision], Any] | None = None,
+        is_error: Callable[[Exception], bool] = is_overload_error,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param latency_tolerance: mean window latency, relative to the baseline,
+            above which the limit is decreased.
+        :param max_error_rate: share of failed operations in a window above which
+            the limit is decreased, errors are those is_error returns True for.
+        :param backoff_ratio: factor applied to the limit on a decrease.
+        :param max_decisions: number of the latest decisions kept for get_stats.
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("expected 1 <= min_limit <= initial_limit <= max_limit.")
+        if latency_tolerance < 1:
+            raise ValueError("latency_tolerance must be at least 1.")
+        if not 0 < backoff_ratio < 1:
+            raise ValueError("backoff_ratio must be between 0 and 1.")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.max_error_rate = max_error_rate
+        self.backoff_ratio = backoff_ratio
+        self.baseline_drift = baseline_drift
+        self.min_window_size = min_window_size
+        self.on_decision = on_decision
+        self.is_error = is_error
+        self.clock = clock
+        self._limit = initial_limit
+        self._in_flight = 0
+        self._slow_start = True
+        self._decreased_at = float("-inf")
+        self._baseline_latency: float | None = None
+        self._last_window_latency: float | None = None
+        self._operation_count = 0
+        self._error_count = 0
+        self._window_count = 0
+        self._window_latency_sum = 0.0
+        self._window_error_count = 0
+        self._window_max_in_flight = 0
+        self._decisions: collections.deque = collections.deque(maxlen=max_decisions)
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self):
+        """
+        blocks until fewer than limit operations are in flight and counts one more.
+        """
+        with self._condition:
+            while self._in_flight >= self._limit:
+                self._condition.wait()
+            self._in_flight += 1
+            self._window_max_in_flight = max(
+                self._window_max_in_flight, self._in_flight
+            )
+
+    def release(self, latency_seconds: float, error: Exception | None = None):
+        """
+        ends an operation started with acquire.
+        :param latency_seconds: duration of the operation, measured with clock.
+        :param error: the exception it raised, if any.
+        """
+        failed = error is not None and self.is_error(error)
+        decision = None
+        with self._condition:
+            self._in_flight -= 1
+            self._operation_count += 1
+            if failed:
+                self._error_count += 1
+            if self.clock() - latency_seconds >= self._decreased_at:
+                self._window_count += 1
+                self._window_latency_sum += latency_seconds
+                if failed:
+                    self._window_error_count += 1
+                if self._window_count >= max(self._limit, self.min_window_size):
+                    decision = self._end_window()
+            self._condition.notify_all()
+        if decision is not None and self.on_decision is not None:
+            self.on_decision(decision)
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        runs the block as one operation, timed and counted as failed when it raises.
+        """
+        self.acquire()
+        started_at = self.clock()
+        try:
+            yield
+        except Exception as error:
+            self.release(self.clock() - started_at, error)
+            raise
+        self.release(self.clock() - started_at)
+
+    def _end_window(self) -> ConcurrencyLimitDecision | None:
+        # called with the condition held.
+        latency = self._window_latency_sum / self._window_count
+        error_rate = self._window_error_count / self._window_count
+        limit_used = self._window_max_in_flight >= self._limit
+        self._last_window_latency = latency
+        self._window_count = 0
+        self._window_latency_sum = 0.0
+        self._window_error_count = 0
+        self._window_max_in_flight = self._in_flight
+        baseline = self._baseline_latency
+        if baseline is None:
+            baseline = latency
+        elif error_rate <= self.max_error_rate:
+            baseline = min(baseline * (1 + self.baseline_drift), latency)
+        self._baseline_latency = baseline
+
+        limit = self._limit
+        if error_rate > self.max_error_rate:
+            reason = DECISION_DECREASE_ERRORS
+        elif latency > baseline * self.latency_tolerance:
+            reason = DECISION_DECREASE_LATENCY
+        elif limit_used and self._slow_start:
+            reason = DECISION_SLOW_START
+            limit = min(self.max_limit, limit * 2)
+        elif limit_used:
+            reason = DECISION_INCREASE
+            limit = min(self.max_limit, limit + 1)
+        else:
+            return None
+        if reason in (DECISION_DECREASE_ERRORS, DECISION_DECREASE_LATENCY):
+            self._slow_start = False
+            self._decreased_at = self.clock()
+            limit = max(self.min_limit, int(limit * self.backoff_ratio))
+        if limit == self._limit:
+            return None
+
+        from square_file_store_helper.pydantic_models import ConcurrencyLimitDecision
+
+        decision = ConcurrencyLimitDecision(
+            at=self.clock(),
+            reason=reason,
+            previous_limit=self._limit,
+            limit=limit,
+            window_latency_seconds=latency,
+            baseline_latency_seconds=baseline,
+            window_error_rate=error_rate,
+        )
+        self._limit = limit
+        self._decisions.append(decision)
+        return decision
+
+    def get_stats(self) -> ConcurrencyLimiterStats:
+        from square_file_store_helper.pydantic_models import ConcurrencyLimiterStats
+
+        with self._condition:
+            return ConcurrencyLimiterStats(
+                limit=self._limit,
+                in_flight=self._in_flight,
+                min_limit=self.min_limit,
+                max_limit=self.max_limit,
+                slow_start=self._slow_start,
+                baseline_latency_seconds=self._baseline_latency,
+                last_window_latency_seconds=self._last_window_latency,
+                operation_count=self._operation_count,
+                error_count=self._error_count,
+                decisions=list(self._decisions),
+            )
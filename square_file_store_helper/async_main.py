@@ -0,0 +1,528 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import mimetypes
+import os
+import uuid
+from typing import (
+    TYPE_CHECKING,
+    Tuple,
+    IO,
+    overload,
+    Literal,
+    Any,
+    AsyncIterator,
+    Dict,
+)
+
+from square_file_store_helper.download_stream import (
+    AsyncDownloadStream,
+    get_sink_writer,
+)
+from square_file_store_helper.main import (
+    DEFAULT_DOWNLOAD_CHUNK_SIZE,
+    _get_file_name_from_response,
+    _get_identity_content_length,
+)
+from square_file_store_helper.multipart import (
+    DEFAULT_UPLOAD_CHUNK_SIZE,
+    MultipartEncoder,
+)
+from square_file_store_helper.response_decoding import (
+    StandardResult,
+    UploadFileV0Result,
+    DeleteFilesV0Result,
+    decode_delete_files_v0_response,
+    decode_upload_file_v0_response,
+    get_standard_response_model,
+)
+
+if TYPE_CHECKING:
+    from square_commons.api_utils import StandardResponse
+
+    from square_file_store_helper.rate_limiting import RateLimiter
+
+    from square_file_store_helper.pydantic_models import (
+        UploadFileV0Response,
+        DeleteFilesV0Response,
+        DownloadToSinkV0Output,
+    )
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+__all__ = ["AsyncSquareFileStoreHelper"]
+
+
+class AsyncSquareFileStoreHelper:
+    """
+    asyncio twin of SquareFileStoreHelper, backed by a pooled httpx.AsyncClient.
+    file contents are streamed and all disk i/o runs in worker threads, so many
+    transfers can be in flight from a single event loop.
+    """
+
+    def __init__(
+        self,
+        param_str_square_file_store_protocol: str = "http",
+        param_str_square_file_store_ip: str = "localhost",
+        param_int_square_file_store_port: int = 10100,
+        param_int_connection_pool_size: int = 20,
+        param_int_max_connections_per_host: int = 100,
+        param_float_connection_idle_timeout: float | None = 60.0,
+        param_bool_trust_responses: bool = False,
+        param_rate_limiter: RateLimiter | None = None,
+    ):
+        """
+        :param param_int_connection_pool_size: number of kept-alive connections.
+        :param param_int_max_connections_per_host: maximum concurrent connections,
+            further requests wait for a free connection.
+        :param param_float_connection_idle_timeout: seconds after which idle pooled
+            connections are dropped, None keeps them forever.
+        :param param_bool_trust_responses: skip the type checks when decoding
+            responses with response_as_result.
+        :param param_rate_limiter: see SquareFileStoreHelper, may be shared with
+            other helpers, sync or async.
+        """
+        try:
+            if httpx is None:
+                raise ImportError(
+                    "AsyncSquareFileStoreHelper requires httpx, "
+                    "install square_file_store_helper[async]."
+                )
+            self.global_str_square_file_store_url_base = (
+                f"{param_str_square_file_store_protocol}://"
+                f"{param_str_square_file_store_ip}:{param_int_square_file_store_port}"
+            )
+            self.global_object_client = httpx.AsyncClient(
+                base_url=self.global_str_square_file_store_url_base,
+                limits=httpx.Limits(
+                    max_connections=param_int_max_connections_per_host,
+                    max_keepalive_connections=param_int_connection_pool_size,
+                    keepalive_expiry=param_float_connection_idle_timeout,
+                ),
+                timeout=None,
+            )
+            self.global_bool_trust_responses = param_bool_trust_responses
+            self.global_object_rate_limiter = param_rate_limiter
+        except Exception:
+            raise
+
+    async def aclose(self):
+        """
+        closes all pooled connections, the helper should not be used afterwards.
+        """
+        try:
+            await self.global_object_client.aclose()
+        except Exception:
+            raise
+
+    async def __aenter__(self) -> "AsyncSquareFileStoreHelper":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def _acquire_request(self, endpoint: str):
+        if self.global_object_rate_limiter is not None:
+            await self.global_object_rate_limiter.async_acquire_request(endpoint)
+
+    async def _acquire_download_bytes(self, size: int):
+        if self.global_object_rate_limiter is not None:
+            await self.global_object_rate_limiter.async_acquire_bytes("download", size)
+
+    async def _aiter_limited_upload(
+        self, chunks: AsyncIterator[bytes]
+    ) -> AsyncIterator[bytes]:
+        rate_limiter = self.global_object_rate_limiter
+        async for chunk in chunks:
+            await rate_limiter.async_acquire_bytes("upload", len(chunk))
+            yield chunk
+
+    async def _upload_file(
+        self,
+        file_name: str,
+        file: IO,
+        content_type: str,
+        app_id: int | None,
+        system_relative_path: str,
+        chunk_size: int,
+    ) -> Dict[str, Any]:
+        endpoint = "upload_file/v0"
+        encoder = MultipartEncoder(
+            fields={
+                "app_id": app_id,
+                "system_relative_path": system_relative_path,
+            },
+            file_field_name="file",
+            file_name=file_name,
+            file=file,
+            content_type=content_type,
+            chunk_size=chunk_size,
+        )
+        headers = {"Content-Type": encoder.content_type}
+        content_length = await asyncio.to_thread(encoder.get_content_length)
+        if content_length is not None:
+            headers["Content-Length"] = str(content_length)
+        body = encoder.aiter_body()
+        if self.global_object_rate_limiter is not None:
+            body = self._aiter_limited_upload(body)
+        await self._acquire_request(endpoint)
+        response = await self.global_object_client.post(
+            endpoint,
+            content=body,
+            headers=headers,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    @overload
+    async def upload_file_using_file_path_v0(
+        self,
+        file_path: str,
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        response_as_pydantic: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        *,
+        response_as_result: Literal[True],
+    ) -> StandardResult[UploadFileV0Result]: ...
+
+    @overload
+    async def upload_file_using_file_path_v0(
+        self,
+        file_path: str,
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        response_as_pydantic: Literal[True] = ...,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        response_as_result: Literal[False] = ...,
+    ) -> StandardResponse[UploadFileV0Response]: ...
+
+    @overload
+    async def upload_file_using_file_path_v0(
+        self,
+        file_path: str,
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        response_as_pydantic: Literal[False] = ...,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        response_as_result: Literal[False] = ...,
+    ) -> Dict[str, Any]: ...
+
+    async def upload_file_using_file_path_v0(
+        self,
+        file_path: str,
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        response_as_pydantic: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        response_as_result: bool = False,
+    ) -> Any:
+        try:
+            file = await asyncio.to_thread(open, file_path, "rb")
+            try:
+                filename = os.path.basename(file_path)
+                content_type = (
+                    mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                )
+                response = await self._upload_file(
+                    filename,
+                    file,
+                    content_type,
+                    app_id,
+                    system_relative_path,
+                    chunk_size,
+                )
+            finally:
+                await asyncio.to_thread(file.close)
+            if response_as_result:
+                return decode_upload_file_v0_response(
+                    response, self.global_bool_trust_responses
+                )
+            elif response_as_pydantic:
+                from square_file_store_helper.pydantic_models import (
+                    UploadFileV0Response,
+                )
+
+                return get_standard_response_model(UploadFileV0Response)(**response)
+            else:
+                return response
+        except Exception:
+            raise
+
+    @overload
+    async def upload_file_using_tuple_v0(
+        self,
+        file: Tuple[str, IO, str],
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        response_as_pydantic: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        *,
+        response_as_result: Literal[True],
+    ) -> StandardResult[UploadFileV0Result]: ...
+
+    @overload
+    async def upload_file_using_tuple_v0(
+        self,
+        file: Tuple[str, IO, str],
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        response_as_pydantic: Literal[True] = ...,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        response_as_result: Literal[False] = ...,
+    ) -> StandardResponse[UploadFileV0Response]: ...
+
+    @overload
+    async def upload_file_using_tuple_v0(
+        self,
+        file: Tuple[str, IO, str],
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        response_as_pydantic: Literal[False] = ...,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        response_as_result: Literal[False] = ...,
+    ) -> Dict[str, Any]: ...
+
+    async def upload_file_using_tuple_v0(
+        self,
+        file: Tuple[str, IO, str],
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        response_as_pydantic: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        response_as_result: bool = False,
+    ) -> Any:
+        try:
+            file_name, file_io, content_type = file
+            response = await self._upload_file(
+                file_name,
+                file_io,
+                content_type,
+                app_id,
+                system_relative_path,
+                chunk_size,
+            )
+            if response_as_result:
+                return decode_upload_file_v0_response(
+                    response, self.global_bool_trust_responses
+                )
+            elif response_as_pydantic:
+                from square_file_store_helper.pydantic_models import (
+                    UploadFileV0Response,
+                )
+
+                return get_standard_response_model(UploadFileV0Response)(**response)
+            else:
+                return response
+        except Exception:
+            raise
+
+    async def download_file_v0(
+        self,
+        file_storage_token: str,
+        output_folder_path: str,
+        chunk_size: int = DEFAULT_DOWNLOAD_CHUNK_SIZE,
+    ) -> str:
+        """
+        streams the file into a temporary file in output_folder_path and atomically
+        renames it once complete.
+        :param file_storage_token:
+        :param output_folder_path:
+        :param chunk_size:
+        :return: filepath
+        """
+        try:
+            if chunk_size <= 0:
+                raise ValueError("chunk_size must be a positive integer.")
+            endpoint = "download_file/v0"
+            payload = {
+                "file_storage_token": file_storage_token,
+            }
+            await self._acquire_request(endpoint)
+            async with self.global_object_client.stream(
+                "GET", endpoint, params=payload
+            ) as response:
+                response.raise_for_status()
+                await asyncio.to_thread(os.makedirs, output_folder_path, exist_ok=True)
+                file_name = _get_file_name_from_response(response.headers)
+                downloaded_file_path = output_folder_path + os.sep + file_name
+                temp_file_path = (
+                    output_folder_path + os.sep + f".{file_name}.{uuid.uuid4().hex}.tmp"
+                )
+                try:
+                    file = await asyncio.to_thread(open, temp_file_path, "xb")
+                    try:
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            await asyncio.to_thread(file.write, chunk)
+                            await self._acquire_download_bytes(len(chunk))
+                    finally:
+                        await asyncio.to_thread(file.close)
+                    await asyncio.to_thread(
+                        os.replace, temp_file_path, downloaded_file_path
+                    )
+                except BaseException:
+                    if os.path.exists(temp_file_path):
+                        os.remove(temp_file_path)
+                    raise
+
+            return downloaded_file_path
+
+        except Exception:
+            raise
+
+    async def _aiter_download(
+        self, file_storage_token: str, chunk_size: int
+    ) -> AsyncIterator[Any]:
+        """
+        async generator yielding (file name, content length or None) once the
+        response headers are in, then the body in chunks of at most chunk_size bytes.
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer.")
+        client = self.global_object_client
+        await self._acquire_request("download_file/v0")
+        response = await client.send(
+            client.build_request(
+                "GET",
+                "download_file/v0",
+                params={"file_storage_token": file_storage_token},
+            ),
+            stream=True,
+        )
+        try:
+            response.raise_for_status()
+            yield (
+                _get_file_name_from_response(response.headers),
+                _get_identity_content_length(response),
+            )
+            async for chunk in response.aiter_bytes(chunk_size):
+                if chunk:
+                    await self._acquire_download_bytes(len(chunk))
+                    yield chunk
+        finally:
+            await response.aclose()
+
+    async def open_download_stream_v0(
+        self,
+        file_storage_token: str,
+        chunk_size: int = DEFAULT_DOWNLOAD_CHUNK_SIZE,
+    ) -> AsyncDownloadStream:
+        """
+        sends the download request and returns once the response headers are in,
+        the body is then read as the returned stream is iterated.
+        :param file_storage_token:
+        :param chunk_size: maximum size of the yielded chunks.
+        :return: AsyncDownloadStream with the file name from Content-Disposition,
+            close it (or use it as an async context manager) when not reading the
+            body to the end.
+        """
+        try:
+            chunks = self._aiter_download(file_storage_token, chunk_size)
+            try:
+                file_name, content_length = await anext(chunks)
+            except BaseException:
+                await chunks.aclose()
+                raise
+            return AsyncDownloadStream(file_name, content_length, chunks)
+        except Exception:
+            raise
+
+    async def download_file_to_sink_v0(
+        self,
+        file_storage_token: str,
+        sink: Any,
+        chunk_size: int = DEFAULT_DOWNLOAD_CHUNK_SIZE,
+    ) -> DownloadToSinkV0Output:
+        """
+        streams the file into sink, nothing is written to disk.
+        :param file_storage_token:
+        :param sink: see SquareFileStoreHelper.download_file_to_sink_v0, a write
+            method may also be a coroutine function (awaited per chunk). plain
+            writes run on the event loop, keep them non blocking.
+        :param chunk_size:
+        :return: DownloadToSinkV0Output with the file name from Content-Disposition.
+        """
+        from square_file_store_helper.pydantic_models import DownloadToSinkV0Output
+
+        try:
+            write = get_sink_writer(sink)
+            bytes_written = 0
+            async with await self.open_download_stream_v0(
+                file_storage_token, chunk_size
+            ) as stream:
+                async for chunk in stream:
+                    result = write(chunk)
+                    if inspect.isawaitable(result):
+                        await result
+                    bytes_written += len(chunk)
+            return DownloadToSinkV0Output(
+                file_name=stream.file_name, bytes_written=bytes_written
+            )
+        except Exception:
+            raise
+
+    @overload
+    async def delete_file_v0(
+        self,
+        list_file_storage_token: list,
+        response_as_pydantic: bool = False,
+        *,
+        response_as_result: Literal[True],
+    ) -> StandardResult[DeleteFilesV0Result]: ...
+
+    @overload
+    async def delete_file_v0(
+        self,
+        list_file_storage_token: list,
+        response_as_pydantic: Literal[True] = ...,
+        response_as_result: Literal[False] = ...,
+    ) -> StandardResponse[DeleteFilesV0Response]: ...
+
+    @overload
+    async def delete_file_v0(
+        self,
+        list_file_storage_token: list,
+        response_as_pydantic: Literal[False] = ...,
+        response_as_result: Literal[False] = ...,
+    ) -> Dict[str, Any]: ...
+
+    async def delete_file_v0(
+        self,
+        list_file_storage_token: list,
+        response_as_pydantic: bool = False,
+        response_as_result: bool = False,
+    ) -> Any:
+        """
+        :param response_as_pydantic:
+        :param list_file_storage_token:
+        :param response_as_result: return a StandardResult decoded without pydantic,
+            takes precedence over response_as_pydantic.
+        :return: filepath
+        """
+        try:
+            endpoint = "delete_files/v0"
+            params = {
+                "file_storage_tokens": list_file_storage_token,
+            }
+            await self._acquire_request(endpoint)
+            response = await self.global_object_client.delete(endpoint, params=params)
+            response.raise_for_status()
+            response = response.json()
+            if response_as_result:
+                return decode_delete_files_v0_response(
+                    response, self.global_bool_trust_responses
+                )
+            elif response_as_pydantic:
+                from square_file_store_helper.pydantic_models import (
+                    DeleteFilesV0Response,
+                )
+
+                return get_standard_response_model(DeleteFilesV0Response)(**response)
+            else:
+                return response
+        except Exception:
+            raise
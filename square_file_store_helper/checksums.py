@@ -0,0 +1,145 @@
+import base64
+import binascii
+import hashlib
+from typing import Any, Dict, Iterable, Mapping
+
+try:
+    import crc32c
+except ImportError:  # pragma: no cover - optional dependency
+    crc32c = None
+
+SUPPORTED_DIGEST_ALGORITHMS = ("sha256", "blake2b", "crc32c")
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# digest header algorithm names (RFC 9530 / RFC 3230 registries) -> our names.
+_HEADER_ALGORITHMS = {
+    "sha-256": "sha256",
+    "sha256": "sha256",
+    "blake2b": "blake2b",
+    "blake2b-512": "blake2b",
+    "crc32c": "crc32c",
+}
+
+
+class DigestMismatchError(Exception):
+    """
+    raised when a digest computed during a transfer differs from the one the server
+    sent, the downloaded file is discarded.
+    """
+
+    def __init__(self, algorithm: str, expected: str, actual: str):
+        super().__init__(
+            f"{algorithm} digest mismatch: server sent {expected}, received {actual}."
+        )
+        self.algorithm = algorithm
+        self.expected = expected
+        self.actual = actual
+
+
+def _create_hasher(algorithm: str) -> Any:
+    if algorithm == "crc32c":
+        return crc32c.CRC32CHash()
+    return hashlib.new(algorithm)
+
+
+class Digests:
+    """
+    digests of one transfer, fed the chunks on their way to the socket or to disk so
+    the file is never read a second time.
+    """
+
+    def __init__(self, algorithms: Iterable[str]):
+        """
+        :param algorithms: any of SUPPORTED_DIGEST_ALGORITHMS, crc32c needs
+            square_file_store_helper[crc32c].
+        """
+        self.algorithms = tuple(dict.fromkeys(algorithms))
+        for algorithm in self.algorithms:
+            if algorithm not in SUPPORTED_DIGEST_ALGORITHMS:
+                raise ValueError(
+                    f"unsupported digest algorithm {algorithm!r}, "
+                    f"expected one of {SUPPORTED_DIGEST_ALGORITHMS}."
+                )
+        if "crc32c" in self.algorithms and crc32c is None:
+            raise ImportError(
+                "crc32c digests require the crc32c package, "
+                "install square_file_store_helper[crc32c]."
+            )
+        self.reset()
+
+    def reset(self):
+        """
+        starts over, for a transfer restarted from its first byte.
+        """
+        self._hashers = {
+            algorithm: _create_hasher(algorithm) for algorithm in self.algorithms
+        }
+
+    def update(self, data: bytes):
+        for hasher in self._hashers.values():
+            hasher.update(data)
+
+    def update_from_file(self, file_path: str, size: int | None = None):
+        """
+        feeds the first size bytes of file_path (all of it by default), for bytes
+        that did not go through update, e.g. left by an earlier call.
+        """
+        remaining = size
+        with open(file_path, "rb") as file:
+            while remaining is None or remaining > 0:
+                chunk = file.read(
+                    _HASH_CHUNK_SIZE
+                    if remaining is None
+                    else min(_HASH_CHUNK_SIZE, remaining)
+                )
+                if not chunk:
+                    break
+                self.update(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+
+    def hexdigests(self) -> Dict[str, str]:
+        """
+        :return: algorithm -> hex digest of the bytes fed so far.
+        """
+        return {
+            algorithm: hasher.hexdigest() for algorithm, hasher in self._hashers.items()
+        }
+
+    def verify(self, expected_digests: Mapping[str, bytes]):
+        """
+        :param expected_digests: from get_expected_digests, algorithms that were not
+            computed are not checked.
+        :raises DigestMismatchError:
+        """
+        for algorithm, hasher in self._hashers.items():
+            expected = expected_digests.get(algorithm)
+            if expected is not None and expected != hasher.digest():
+                raise DigestMismatchError(algorithm, expected.hex(), hasher.hexdigest())
+
+
+def get_expected_digests(headers: Mapping[str, str]) -> Dict[str, bytes]:
+    """
+    :param headers: response headers.
+    :return: algorithm -> raw digest from the Repr-Digest (RFC 9530) or Digest
+        (RFC 3230) header, empty for content encoded responses since those digests
+        cover the encoded bytes.
+    """
+    if headers.get("Content-Encoding", "identity").lower() != "identity":
+        return {}
+    expected_digests = {}
+    # Repr-Digest comes last so it wins over the legacy Digest header.
+    for header in ("Digest", "Repr-Digest"):
+        for item in (headers.get(header) or "").split(","):
+            name, _, value = item.partition("=")
+            algorithm = _HEADER_ALGORITHMS.get(name.strip().lower())
+            if algorithm is None:
+                continue
+            # structured field byte sequences are wrapped in colons.
+            value = value.split(";")[0].strip().strip(":")
+            try:
+                expected_digests[algorithm] = base64.b64decode(value, validate=True)
+            except (binascii.Error, ValueError):
+                continue
+    return expected_digests
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable, Iterable, List, Tuple
+
+if TYPE_CHECKING:
+    from square_file_store_helper.adaptive_concurrency import (
+        AdaptiveConcurrencyLimiter,
+    )
+
+
+def run_in_parallel(
+    function: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int,
+    limiter: AdaptiveConcurrencyLimiter | None = None,
+) -> List[Tuple[Any, Exception | None]]:
+    """
+    calls function on every item using at most max_workers threads.
+    items are consumed lazily, so only a bounded number of them is in flight at once,
+    and a failing item does not stop the others. each call runs in a copy of the
+    caller's context (e.g. its rate limit priority).
+    :param limiter: runs at most its current limit of items at once (and never more
+        than max_workers), reporting the duration and error of every call to it.
+    :return: one (result, error) pair per item, in input order.
+    """
+    if max_workers <= 0:
+        raise ValueError("max_workers must be a positive integer.")
+    # without a limiter the pool is kept busy with up to twice its size queued.
+    max_pending = max_workers * 2 if limiter is None else max_workers
+    if limiter is not None:
+        function = _limited(function, limiter)
+    results: List[Tuple[Any, Exception | None]] = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        for index, item in enumerate(items):
+            results.append((None, None))
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = _get_outcome(future)
+            if limiter is not None:
+                limiter.acquire()
+            context = contextvars.copy_context()
+            pending[executor.submit(context.run, function, item)] = index
+        for future in list(pending):
+            results[pending.pop(future)] = _get_outcome(future)
+    return results
+
+
+def _limited(
+    function: Callable[[Any], Any], limiter: AdaptiveConcurrencyLimiter
+) -> Callable[[Any], Any]:
+    def call(item: Any) -> Any:
+        started_at = limiter.clock()
+        try:
+            result = function(item)
+        except Exception as error:
+            limiter.release(limiter.clock() - started_at, error)
+            raise
+        limiter.release(limiter.clock() - started_at)
+        return result
+
+    return call
+
+
+def _get_outcome(future) -> Tuple[Any, Exception | None]:
+    try:
+        return future.result(), None
+    except Exception as error:
+        return None, error
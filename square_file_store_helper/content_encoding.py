@@ -0,0 +1,221 @@
+import fnmatch
+import threading
+import zlib
+from typing import Iterable, Iterator, Literal, Sequence
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:  # pragma: no cover - optional dependency
+        zstd = None
+
+from square_file_store_helper.pydantic_models import CompressionStats
+
+# encodings this installation can produce and decode, zstd needs python 3.14 or
+# square_file_store_helper[zstd].
+SUPPORTED_ENCODINGS = ("zstd", "gzip") if zstd is not None else ("gzip",)
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/*",
+    "application/json",
+    "application/*+json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/*+xml",
+    "application/javascript",
+    "application/csv",
+    "application/sql",
+    "application/yaml",
+    "application/x-yaml",
+    "image/svg+xml",
+)
+# already compressed formats, never worth another pass even when a broader
+# compressible pattern matches them.
+INCOMPRESSIBLE_CONTENT_TYPES = (
+    "image/png",
+    "image/jpeg",
+    "image/gif",
+    "image/webp",
+    "image/avif",
+    "image/heic",
+    "audio/*",
+    "video/*",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zstd",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/x-7z-compressed",
+    "application/vnd.rar",
+    "application/x-rar-compressed",
+    "application/pdf",
+)
+
+
+def get_compressor(encoding: str, level: int | None = None):
+    """
+    :return: incremental compressor with compress(data) and flush() methods.
+    """
+    if encoding == "gzip":
+        return zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, 31
+        )
+    if encoding == "zstd" and zstd is not None:
+        return zstd.ZstdCompressor(level=level)
+    raise ValueError(f"unsupported content encoding: {encoding}.")
+
+
+def get_decompressor(encoding: str):
+    """
+    :return: incremental decompressor with a decompress(data) method.
+    """
+    if encoding == "gzip":
+        return zlib.decompressobj(31)
+    if encoding == "zstd" and zstd is not None:
+        return zstd.ZstdDecompressor()
+    raise ValueError(f"unsupported content encoding: {encoding}.")
+
+
+class CompressionPolicy:
+    """
+    opt-in content encoding of SquareFileStoreHelper transfers, with running stats.
+
+    with an upload_encoding, uploads whose content type matches
+    compressible_content_types but none of incompressible_content_types, and whose
+    size is unknown or at least min_size bytes, are sent with the whole multipart body
+    compressed on the fly (Content-Encoding request header). only set it for servers
+    that decode compressed request bodies, as the bundled stub server does.
+    downloads advertise download_encodings in Accept-Encoding and are decoded
+    incrementally while written to disk.
+    """
+
+    def __init__(
+        self,
+        upload_encoding: Literal["gzip", "zstd"] | None = None,
+        download_encodings: Sequence[str] = SUPPORTED_ENCODINGS,
+        level: int | None = None,
+        min_size: int = 1024,
+        compressible_content_types: Iterable[str] = COMPRESSIBLE_CONTENT_TYPES,
+        incompressible_content_types: Iterable[str] = INCOMPRESSIBLE_CONTENT_TYPES,
+    ):
+        """
+        :param upload_encoding: None (default) sends every upload uncompressed.
+        :param download_encodings: in order of preference, empty leaves the
+            Accept-Encoding of requests untouched.
+        :param level: compression level, None for the encoding's default.
+        :param compressible_content_types: fnmatch patterns, e.g. "text/*".
+        """
+        for encoding in (upload_encoding, *download_encodings):
+            if encoding is not None and encoding not in SUPPORTED_ENCODINGS:
+                raise ValueError(f"unsupported content encoding: {encoding}.")
+        if min_size < 0:
+            raise ValueError("min_size must not be negative.")
+        self.upload_encoding = upload_encoding
+        self.download_encodings = tuple(download_encodings)
+        self.level = level
+        self.min_size = min_size
+        self.compressible_content_types = tuple(compressible_content_types)
+        self.incompressible_content_types = tuple(incompressible_content_types)
+        self._lock = threading.Lock()
+        self._uploads_compressed = 0
+        self._uploads_skipped = 0
+        self._upload_bytes_uncompressed = 0
+        self._upload_bytes_sent = 0
+        self._downloads_compressed = 0
+        self._downloads_uncompressed = 0
+        self._download_bytes_received = 0
+        self._download_bytes_decoded = 0
+
+    @property
+    def accept_encoding(self) -> str | None:
+        """
+        Accept-Encoding header of downloads, None to keep the default one.
+        """
+        return ", ".join(self.download_encodings) or None
+
+    def should_compress(self, content_type: str, size: int | None) -> bool:
+        """
+        :param content_type: e.g. the mimetypes.guess_type result, parameters such as
+            "; charset=utf-8" are ignored.
+        :param size: bytes of file content, None when unknown (pipes, generators).
+        """
+        if self.upload_encoding is None:
+            return False
+        if size is not None and size < self.min_size:
+            return False
+        content_type = content_type.split(";", 1)[0].strip().lower()
+        if any(
+            fnmatch.fnmatchcase(content_type, pattern)
+            for pattern in self.incompressible_content_types
+        ):
+            return False
+        return any(
+            fnmatch.fnmatchcase(content_type, pattern)
+            for pattern in self.compressible_content_types
+        )
+
+    def compress(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        yields chunks compressed with upload_encoding, the upload stats are updated
+        once they are exhausted.
+        """
+        compressor = get_compressor(self.upload_encoding, self.level)
+        bytes_uncompressed = 0
+        bytes_sent = 0
+        for chunk in chunks:
+            bytes_uncompressed += len(chunk)
+            compressed = compressor.compress(chunk)
+            if compressed:
+                bytes_sent += len(compressed)
+                yield compressed
+        compressed = compressor.flush()
+        bytes_sent += len(compressed)
+        yield compressed
+        with self._lock:
+            self._uploads_compressed += 1
+            self._upload_bytes_uncompressed += bytes_uncompressed
+            self._upload_bytes_sent += bytes_sent
+
+    def record_skipped_upload(self):
+        with self._lock:
+            self._uploads_skipped += 1
+
+    def record_download(
+        self, content_encoding: str | None, bytes_received: int, bytes_decoded: int
+    ):
+        """
+        :param content_encoding: Content-Encoding of the response.
+        """
+        with self._lock:
+            if (content_encoding or "identity").lower() == "identity":
+                self._downloads_uncompressed += 1
+                return
+            self._downloads_compressed += 1
+            self._download_bytes_received += bytes_received
+            self._download_bytes_decoded += bytes_decoded
+
+    def get_stats(self) -> CompressionStats:
+        with self._lock:
+            return CompressionStats(
+                uploads_compressed=self._uploads_compressed,
+                uploads_skipped=self._uploads_skipped,
+                upload_bytes_uncompressed=self._upload_bytes_uncompressed,
+                upload_bytes_sent=self._upload_bytes_sent,
+                upload_compression_ratio=_get_ratio(
+                    self._upload_bytes_uncompressed, self._upload_bytes_sent
+                ),
+                downloads_compressed=self._downloads_compressed,
+                downloads_uncompressed=self._downloads_uncompressed,
+                download_bytes_received=self._download_bytes_received,
+                download_bytes_decoded=self._download_bytes_decoded,
+                download_compression_ratio=_get_ratio(
+                    self._download_bytes_decoded, self._download_bytes_received
+                ),
+            )
+
+
+def _get_ratio(uncompressed: int, compressed: int) -> float:
+    return uncompressed / compressed if compressed else 0.0
@@ -0,0 +1,248 @@
+import contextlib
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from typing import Iterable, Iterator, Tuple
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class DownloadCache:
+    """
+    on-disk cache of downloaded files keyed by file_storage_token.
+
+    file contents are stored once per sha256 digest under cache_folder_path/objects and
+    an sqlite index maps tokens to them, so the cache survives restarts and can be
+    shared by several processes. when the stored contents exceed max_size_bytes the
+    least recently used ones are evicted.
+    """
+
+    def __init__(self, cache_folder_path: str, max_size_bytes: int = 1024**3):
+        if max_size_bytes < 0:
+            raise ValueError("max_size_bytes must not be negative.")
+        self.cache_folder_path = os.path.abspath(cache_folder_path)
+        self.max_size_bytes = max_size_bytes
+        self.objects_folder_path = os.path.join(self.cache_folder_path, "objects")
+        self.index_file_path = os.path.join(self.cache_folder_path, "index.sqlite3")
+        os.makedirs(self.objects_folder_path, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    content_hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access);
+                CREATE TABLE IF NOT EXISTS tokens (
+                    file_storage_token TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    file_name TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS tokens_content_hash ON tokens (content_hash);
+                """
+            )
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # one short lived connection per operation keeps the cache usable from any
+        # thread or process, sqlite serializes the writers.
+        connection = sqlite3.connect(
+            self.index_file_path, timeout=30, isolation_level=None
+        )
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def _get_blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.objects_folder_path, content_hash[:2], content_hash)
+
+    def get(self, file_storage_token: str) -> Tuple[str, str] | None:
+        """
+        :return: (file name, path of the cached content) or None on a miss.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT content_hash, file_name FROM tokens WHERE file_storage_token = ?",
+                (file_storage_token,),
+            ).fetchone()
+            if row is None:
+                return None
+            content_hash, file_name = row
+            connection.execute(
+                "UPDATE blobs SET last_access = ? WHERE content_hash = ?",
+                (time.time(), content_hash),
+            )
+        blob_path = self._get_blob_path(content_hash)
+        if not os.path.exists(blob_path):
+            return None
+        return file_name, blob_path
+
+    def copy_to(
+        self, file_storage_token: str, destination_path: str, link: bool = False
+    ) -> str | None:
+        """
+        copies the cached content to destination_path, replacing it atomically.
+        :param link: hardlink instead of copying when on the same file system. the
+            linked file shares storage with the cache, writing to it corrupts the
+            cached content, so it must be treated as read only.
+        :return: the cached file name or None on a miss.
+        """
+        cached = self.get(file_storage_token)
+        if cached is None:
+            return None
+        file_name, blob_path = cached
+        temp_path = f"{destination_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            try:
+                if link:
+                    try:
+                        os.link(blob_path, temp_path)
+                    except OSError:
+                        # across file systems, copied instead.
+                        link = False
+                if not link:
+                    shutil.copyfile(blob_path, temp_path)
+            except FileNotFoundError:
+                # evicted by another process in the meantime.
+                return None
+            os.replace(temp_path, destination_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return file_name
+
+    def put(
+        self,
+        file_storage_token: str,
+        file_name: str,
+        file_path: str,
+        content_hash: str | None = None,
+    ):
+        """
+        stores a copy of file_path for file_storage_token and evicts least recently
+        used contents beyond max_size_bytes.
+        :param content_hash: sha256 hex digest of file_path when already known (e.g.
+            computed during the download), saves hashing the file again.
+        """
+        if content_hash is None:
+            sha256 = hashlib.sha256()
+            with open(file_path, "rb") as file:
+                while chunk := file.read(_HASH_CHUNK_SIZE):
+                    sha256.update(chunk)
+            content_hash = sha256.hexdigest()
+        size = os.path.getsize(file_path)
+        if size > self.max_size_bytes:
+            return
+        blob_path = self._get_blob_path(content_hash)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            temp_path = f"{blob_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                shutil.copyfile(file_path, temp_path)
+                os.replace(temp_path, blob_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO blobs (content_hash, size, last_access) "
+                    "VALUES (?, ?, ?)",
+                    (content_hash, size, time.time()),
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO tokens "
+                    "(file_storage_token, content_hash, file_name) VALUES (?, ?, ?)",
+                    (file_storage_token, content_hash, file_name),
+                )
+                self._evict(connection)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def invalidate(self, list_file_storage_token: Iterable[str]):
+        """
+        drops the entries of the given tokens, contents no other token refers to are
+        deleted.
+        """
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for file_storage_token in list_file_storage_token:
+                    row = connection.execute(
+                        "SELECT content_hash FROM tokens WHERE file_storage_token = ?",
+                        (file_storage_token,),
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    connection.execute(
+                        "DELETE FROM tokens WHERE file_storage_token = ?",
+                        (file_storage_token,),
+                    )
+                    self._delete_blob_if_unused(connection, row[0])
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def clear(self):
+        """
+        drops every entry and cached content.
+        """
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("DELETE FROM tokens")
+                for (content_hash,) in connection.execute(
+                    "SELECT content_hash FROM blobs"
+                ).fetchall():
+                    self._delete_blob_if_unused(connection, content_hash)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def get_size(self) -> int:
+        """
+        :return: total size in bytes of the cached contents.
+        """
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()[0]
+
+    def _evict(self, connection: sqlite3.Connection):
+        total_size = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM blobs"
+        ).fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+        for content_hash, size in connection.execute(
+            "SELECT content_hash, size FROM blobs ORDER BY last_access"
+        ).fetchall():
+            connection.execute(
+                "DELETE FROM tokens WHERE content_hash = ?", (content_hash,)
+            )
+            self._delete_blob_if_unused(connection, content_hash)
+            total_size -= size
+            if total_size <= self.max_size_bytes:
+                break
+
+    def _delete_blob_if_unused(self, connection: sqlite3.Connection, content_hash: str):
+        if connection.execute(
+            "SELECT 1 FROM tokens WHERE content_hash = ? LIMIT 1", (content_hash,)
+        ).fetchone():
+            return
+        connection.execute("DELETE FROM blobs WHERE content_hash = ?", (content_hash,))
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._get_blob_path(content_hash))
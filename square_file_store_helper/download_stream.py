@@ -0,0 +1,139 @@
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+)
+
+
+class DownloadStream:
+    """
+    body of a download as an iterator of bytes chunks, returned by
+    SquareFileStoreHelper.open_download_stream_v0 once the response headers are in.
+    the connection is released when the iterator is exhausted or closed, use it as a
+    context manager.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        content_length: int | None,
+        chunks: Generator[bytes, None, None],
+        from_cache: bool = False,
+        expected_digests: Dict[str, bytes] | None = None,
+    ):
+        """
+        :param file_name: from the filename* or filename parameter of
+            Content-Disposition.
+        :param content_length: decoded body size, None when not known up front (e.g.
+            compressed responses).
+        :param from_cache: the body is read from the download cache.
+        :param expected_digests: algorithm -> raw digest of the body sent by the
+            server, see checksums.get_expected_digests.
+        """
+        self.file_name = file_name
+        self.content_length = content_length
+        self.from_cache = from_cache
+        self.expected_digests = expected_digests or {}
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._chunks
+
+    def close(self):
+        self._chunks.close()
+
+    def __enter__(self) -> "DownloadStream":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class AsyncDownloadStream:
+    """
+    asyncio twin of DownloadStream, returned by
+    AsyncSquareFileStoreHelper.open_download_stream_v0.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        content_length: int | None,
+        chunks: AsyncGenerator[bytes, None],
+    ):
+        self.file_name = file_name
+        self.content_length = content_length
+        self._chunks = chunks
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._chunks
+
+    async def aclose(self):
+        await self._chunks.aclose()
+
+    async def __aenter__(self) -> "AsyncDownloadStream":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+
+def get_sink_writer(sink: Any) -> Callable[[bytes], Any]:
+    """
+    :param sink: a bytearray, appended to, an object with a write method (file,
+        subprocess stdin, socket file, ...), called until every byte is taken, or
+        any other writable buffer (memoryview, mmap, array, ...), filled from its
+        start.
+    :return: function storing one chunk into sink, returning what an asynchronous
+        write returned (to be awaited).
+    :raises TypeError: when sink is neither writable nor a writable buffer.
+    """
+    if isinstance(sink, bytearray):
+        return sink.extend
+    write = getattr(sink, "write", None)
+    if callable(write):
+
+        def write_all(data: bytes) -> Any:
+            result = write(data)
+            # raw (unbuffered) files and pipes may take part of the data only.
+            if isinstance(result, int) and 0 <= result < len(data):
+                view = memoryview(data)[result:]
+                while view:
+                    written = write(view)
+                    if written is None:
+                        break
+                    if written == 0:
+                        # it would be called forever otherwise.
+                        raise OSError(
+                            f"sink write() returned 0 with {len(view)} bytes left."
+                        )
+                    view = view[written:]
+                return None
+            return result
+
+        return write_all
+    try:
+        view = memoryview(sink).cast("B")
+    except TypeError:
+        raise TypeError(
+            f"sink must be writable or a writable buffer, got {type(sink).__name__}."
+        ) from None
+    if view.readonly:
+        raise TypeError("sink buffer is read only.")
+    offset = 0
+
+    def write_into(data: bytes):
+        nonlocal offset
+        end = offset + len(data)
+        if end > len(view):
+            raise ValueError(
+                f"sink buffer of {len(view)} bytes is too small for the download."
+            )
+        view[offset:end] = data
+        offset = end
+
+    return write_into
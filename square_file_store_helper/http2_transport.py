@@ -0,0 +1,351 @@
+import http.client
+import io
+import os
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, select_proxy
+from urllib3.exceptions import NewConnectionError
+from urllib3.response import HTTPResponse
+
+from square_file_store_helper.instrumentation import get_current_request_tracker
+from square_file_store_helper.multipart import FileRegion
+
+try:
+    import h2
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    h2 = None
+    httpx = None
+
+DEFAULT_PROBE_TIMEOUT = 5.0
+
+_H2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+# 9 byte frame header: length 0, type SETTINGS (0x4), no flags, stream 0.
+_EMPTY_SETTINGS_FRAME = b"\x00\x00\x00\x04\x00\x00\x00\x00\x00"
+_SETTINGS_FRAME_TYPE = 0x04
+# connection specific headers, not allowed in http/2 requests.
+_HOP_BY_HOP_HEADERS = frozenset(
+    {"connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"}
+)
+_BODY_BLOCK_SIZE = 64 * 1024
+
+
+def speaks_h2c(host: str, port: int, timeout: float | None = None) -> bool:
+    """
+    :return: True when the server answers the http/2 connection preface sent over
+        cleartext (prior knowledge h2c) with a SETTINGS frame, False when it answers
+        anything else, e.g. an HTTP/1.1 error response.
+    :raises OSError: when the server cannot be reached.
+    """
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(_H2_PREFACE + _EMPTY_SETTINGS_FRAME)
+        frame_header = b""
+        while len(frame_header) < 9:
+            data = sock.recv(9 - len(frame_header))
+            if not data:
+                break
+            frame_header += data
+    return len(frame_header) == 9 and frame_header[3] == _SETTINGS_FRAME_TYPE
+
+
+def _read_blocks(file: Any) -> Iterator[bytes]:
+    while block := file.read(_BODY_BLOCK_SIZE):
+        yield block
+
+
+def _iter_request_body(body: Any, tracker) -> Iterator[bytes]:
+    """
+    yields a prepared request body (bytes, a file like object or an iterable of bytes
+    and FileRegion) and reports every block to the tracker once it has been sent.
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if isinstance(body, (bytes, bytearray)):
+        chunks: Iterable[Any] = (bytes(body),)
+    elif hasattr(body, "read"):
+        chunks = _read_blocks(body)
+    else:
+        chunks = body
+    block_size = None if tracker is None else tracker.upload_progress_block_size
+    for chunk in chunks:
+        if isinstance(chunk, FileRegion):
+            blocks: Iterable[bytes] = _read_blocks(chunk)
+        elif block_size and len(chunk) > block_size:
+            blocks = (
+                chunk[offset : offset + block_size]
+                for offset in range(0, len(chunk), block_size)
+            )
+        else:
+            blocks = (chunk,)
+        for block in blocks:
+            yield block
+            if tracker is not None:
+                tracker.on_request_body(len(block))
+
+
+class _RequestTrace:
+    """
+    httpcore trace callback reporting connect and request sent times to the request
+    tracker, as the instrumented HTTP/1.1 connections of http_utils do.
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self._started_at = 0.0
+
+    def __call__(self, event_name: str, info: Dict[str, Any]):
+        if event_name in (
+            "connection.connect_tcp.started",
+            "connection.start_tls.started",
+        ):
+            self._started_at = time.perf_counter()
+        elif event_name in (
+            "connection.connect_tcp.complete",
+            "connection.start_tls.complete",
+        ):
+            self.tracker.on_connect(time.perf_counter() - self._started_at)
+        elif event_name.endswith(".send_request_body.complete"):
+            self.tracker.on_request_sent()
+
+
+class _ResponseBodyReader(io.RawIOBase):
+    """
+    raw (still content encoded) body of a streamed httpx response as the file object
+    of a urllib3 HTTPResponse. transport errors are raised as the socket /
+    http.client errors urllib3 turns into the requests exceptions of an interrupted
+    HTTP/1.1 response, so resumes and retries behave the same.
+    """
+
+    def __init__(self, response: "httpx.Response"):
+        self._response = response
+        self._chunks = response.iter_raw()
+        self._buffer = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._buffer:
+            try:
+                self._buffer = memoryview(next(self._chunks, b""))
+            except httpx.TimeoutException as error:
+                raise socket.timeout(str(error)) from error
+            except (httpx.TransportError, httpx.StreamError) as error:
+                raise http.client.IncompleteRead(b"") from error
+            if not self._buffer:
+                # urllib3 reads until its file object reports being closed.
+                self.close()
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._response.close()
+        super().close()
+
+
+def _get_httpx_timeout(timeout: Any) -> "httpx.Timeout":
+    if isinstance(timeout, tuple):
+        connect_timeout, read_timeout = timeout
+        return httpx.Timeout(read_timeout, connect=connect_timeout)
+    return httpx.Timeout(timeout)
+
+
+def _create_ssl_context(verify: Any, cert: Any) -> ssl.SSLContext:
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else:
+        ca_path = DEFAULT_CA_BUNDLE_PATH if verify is True else verify
+        if os.path.isdir(ca_path):
+            context = ssl.create_default_context(capath=ca_path)
+        else:
+            context = ssl.create_default_context(cafile=ca_path)
+    if cert:
+        context.load_cert_chain(*((cert,) if isinstance(cert, str) else cert))
+    return context
+
+
+class HTTP2Adapter(BaseAdapter):
+    """
+    requests transport adapter sending requests over http/2 connections of an httpx
+    client, so concurrent requests from any number of threads are multiplexed as
+    streams of one connection per host instead of holding a connection each.
+
+    https hosts negotiate the protocol with ALPN, cleartext hosts are probed once
+    for prior knowledge h2c. requests to hosts that only speak HTTP/1.1, and proxied
+    requests, go through fallback_adapter unchanged. request bodies are read into
+    buffers, including the FileRegion of zero copy uploads: http/2 frames cannot be
+    sent with sendfile.
+    """
+
+    def __init__(
+        self,
+        fallback_adapter: HTTPAdapter,
+        max_connections_per_host: int = 10,
+        idle_timeout: Optional[float] = 60.0,
+        probe_timeout: float = DEFAULT_PROBE_TIMEOUT,
+    ):
+        """
+        :param max_connections_per_host: kept-alive http/2 connections, a single one
+            carries up to the server's limit of concurrent streams.
+        :param idle_timeout: seconds after which idle connections are dropped.
+        :param probe_timeout: connect / read timeout of the h2c probe.
+        """
+        if httpx is None or h2 is None:
+            raise ImportError(
+                "http/2 requires httpx and h2, "
+                "install square_file_store_helper[http2]."
+            )
+        super().__init__()
+        self.fallback_adapter = fallback_adapter
+        self.max_connections_per_host = max_connections_per_host
+        self.idle_timeout = idle_timeout
+        self.probe_timeout = probe_timeout
+        self._h2c_origins: Dict[Tuple[str, int], bool] = {}
+        self._clients: Dict[Tuple[Any, ...], "httpx.Client"] = {}
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+
+    def uses_http2(self, url: str) -> bool:
+        """
+        :return: False when requests to url go over HTTP/1.1, probing cleartext hosts
+            on first use (unreachable hosts are probed again next time).
+        """
+        parsed_url = urllib.parse.urlsplit(url)
+        if parsed_url.scheme == "https":
+            return True
+        origin = (parsed_url.hostname, parsed_url.port or 80)
+        speaks_http2 = self._h2c_origins.get(origin)
+        if speaks_http2 is not None:
+            return speaks_http2
+        # threads starting together wait for a single probe.
+        with self._probe_lock:
+            speaks_http2 = self._h2c_origins.get(origin)
+            if speaks_http2 is None:
+                try:
+                    speaks_http2 = speaks_h2c(*origin, self.probe_timeout)
+                except OSError:
+                    # the fallback adapter then raises the usual ConnectionError.
+                    return False
+                self._h2c_origins[origin] = speaks_http2
+        return speaks_http2
+
+    def _get_client(self, scheme: str, verify: Any, cert: Any) -> "httpx.Client":
+        key = (scheme,) if scheme == "http" else (scheme, verify, cert)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = httpx.Client(
+                    # cleartext needs prior knowledge, https falls back with ALPN.
+                    http1=scheme != "http",
+                    http2=True,
+                    verify=(
+                        True if scheme == "http" else _create_ssl_context(verify, cert)
+                    ),
+                    limits=httpx.Limits(
+                        max_connections=None,
+                        max_keepalive_connections=self.max_connections_per_host,
+                        keepalive_expiry=self.idle_timeout,
+                    ),
+                    timeout=None,
+                    trust_env=False,
+                )
+        return client
+
+    def send(
+        self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None
+    ):
+        if select_proxy(request.url, proxies) is not None or not self.uses_http2(
+            request.url
+        ):
+            return self.fallback_adapter.send(
+                request,
+                stream=stream,
+                timeout=timeout,
+                verify=verify,
+                cert=cert,
+                proxies=proxies,
+            )
+        client = self._get_client(
+            urllib.parse.urlsplit(request.url).scheme, verify, cert
+        )
+        tracker = get_current_request_tracker()
+        extensions = {}
+        if tracker is not None:
+            extensions["trace"] = _RequestTrace(tracker)
+            content_length = request.headers.get("Content-Length")
+            tracker.on_request_start(
+                request.body is not None,
+                None if content_length is None else int(content_length),
+                False,
+            )
+        try:
+            response = client.send(
+                client.build_request(
+                    request.method,
+                    request.url,
+                    headers=[
+                        (key, value)
+                        for key, value in request.headers.items()
+                        if key.lower() not in _HOP_BY_HOP_HEADERS
+                    ],
+                    content=(
+                        None
+                        if request.body is None
+                        else _iter_request_body(request.body, tracker)
+                    ),
+                    timeout=_get_httpx_timeout(timeout),
+                    extensions=extensions,
+                ),
+                stream=True,
+            )
+        except httpx.ConnectTimeout as error:
+            raise requests.exceptions.ConnectTimeout(error, request=request) from error
+        except httpx.TimeoutException as error:
+            raise requests.exceptions.ReadTimeout(error, request=request) from error
+        except httpx.ConnectError as error:
+            # wrapped as urllib3 does, so retry.is_connect_error recognizes it.
+            raise requests.exceptions.ConnectionError(
+                NewConnectionError(None, str(error)), request=request
+            ) from error
+        except httpx.TransportError as error:
+            raise requests.exceptions.ConnectionError(error, request=request) from error
+        if tracker is not None:
+            content_length = response.headers.get("Content-Length")
+            tracker.on_response_headers(
+                response.status_code,
+                None if content_length is None else int(content_length),
+            )
+        raw = HTTPResponse(
+            body=_ResponseBodyReader(response),
+            headers=list(response.headers.multi_items()),
+            status=response.status_code,
+            version=20 if response.http_version == "HTTP/2" else 11,
+            reason=response.reason_phrase,
+            preload_content=False,
+            decode_content=True,
+            request_method=request.method,
+            request_url=request.url,
+        )
+        # Session.send reads the body right away unless stream is set.
+        return self.fallback_adapter.build_response(request, raw)
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+        self.fallback_adapter.close()
@@ -0,0 +1,228 @@
+import socket
+import threading
+import time
+from typing import Any, Literal, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from square_file_store_helper.instrumentation import get_current_request_tracker
+from square_file_store_helper.multipart import FileRegion
+
+
+class _InstrumentedConnectionMixin:
+    """
+    reports connect, request body and response header timings to the request
+    tracker of the current thread, a single thread local lookup when there is none.
+    """
+
+    def connect(self):
+        tracker = get_current_request_tracker()
+        if tracker is None:
+            return super().connect()
+        started_at = time.perf_counter()
+        super().connect()
+        tracker.on_connect(time.perf_counter() - started_at)
+
+    def request(self, method, url, body=None, headers=None, **kwargs):
+        tracker = get_current_request_tracker()
+        if tracker is None:
+            return super().request(method, url, body=body, headers=headers, **kwargs)
+        content_length = (headers or {}).get("Content-Length")
+        tracker.on_request_start(
+            body is not None,
+            None if content_length is None else int(content_length),
+            kwargs.get("chunked", False),
+        )
+        super().request(method, url, body=body, headers=headers, **kwargs)
+        tracker.on_request_sent()
+
+    def endheaders(self, *args, **kwargs):
+        super().endheaders(*args, **kwargs)
+        tracker = get_current_request_tracker()
+        if tracker is not None:
+            tracker.sending_body = True
+
+    def send(self, data):
+        tracker = get_current_request_tracker()
+        if isinstance(data, FileRegion) and isinstance(self.sock, socket.socket):
+            return self._send_file_region(data, tracker)
+        if (
+            tracker is None
+            or not tracker.sending_body
+            or not isinstance(data, (bytes, bytearray))
+        ):
+            return super().send(data)
+        if tracker.chunked:
+            super().send(data)
+            # strip the "<size>\r\n" ... "\r\n" chunk framing.
+            tracker.on_request_body(int(data[: data.index(b"\r\n")], 16))
+            return
+        block_size = tracker.upload_progress_block_size or len(data) or 1
+        view = memoryview(data)
+        for offset in range(0, len(data), block_size):
+            block = view[offset : offset + block_size]
+            super().send(block)
+            tracker.on_request_body(len(block))
+
+    def _send_file_region(self, region: FileRegion, tracker):
+        # socket.sendfile uses os.sendfile on plain sockets and falls back to
+        # reading the file itself on tls sockets and platforms without it.
+        if tracker is None or not tracker.sending_body:
+            self.sock.sendfile(region.file, region.offset, region.count)
+            return
+        block_size = tracker.upload_progress_block_size or region.count
+        for offset in range(region.offset, region.offset + region.count, block_size):
+            count = min(block_size, region.offset + region.count - offset)
+            self.sock.sendfile(region.file, offset, count)
+            tracker.on_request_body(count)
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        tracker = get_current_request_tracker()
+        if tracker is not None:
+            content_length = response.headers.get("Content-Length")
+            tracker.on_response_headers(
+                response.status,
+                None if content_length is None else int(content_length),
+            )
+        return response
+
+
+class InstrumentedHTTPConnection(_InstrumentedConnectionMixin, HTTPConnection):
+    pass
+
+
+class InstrumentedHTTPSConnection(_InstrumentedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class InstrumentedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = InstrumentedHTTPConnection
+
+
+class InstrumentedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = InstrumentedHTTPSConnection
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that drops its kept-alive connections once the pool has been idle
+    for longer than idle_timeout seconds, so stale sockets are not reused, and whose
+    connections report their timings to the instrumentation request tracker.
+    """
+
+    def __init__(self, idle_timeout: Optional[float] = None, **kwargs):
+        self.idle_timeout = idle_timeout
+        self._last_used = time.monotonic()
+        self._idle_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": InstrumentedHTTPConnectionPool,
+            "https": InstrumentedHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        if self.idle_timeout is not None:
+            with self._idle_lock:
+                now = time.monotonic()
+                if now - self._last_used > self.idle_timeout:
+                    self.poolmanager.clear()
+                self._last_used = now
+        return super().send(request, **kwargs)
+
+
+def create_session(
+    pool_size: int = 10,
+    max_connections_per_host: int = 10,
+    idle_timeout: Optional[float] = 60.0,
+    http2: bool = False,
+) -> requests.Session:
+    """
+    :param pool_size: number of per-host connection pools to keep.
+    :param max_connections_per_host: number of kept-alive connections per host.
+    :param idle_timeout: seconds of inactivity after which pooled connections are dropped,
+        None keeps them forever.
+    :param http2: multiplex requests over http/2 connections to the hosts speaking
+        it (http2_transport.HTTP2Adapter), HTTP/1.1 for the others.
+    :return: requests.Session that reuses connections for http and https.
+    """
+    session = requests.Session()
+    for prefix in ("http://", "https://"):
+        adapter = PooledHTTPAdapter(
+            idle_timeout=idle_timeout,
+            pool_connections=pool_size,
+            pool_maxsize=max_connections_per_host,
+        )
+        if http2:
+            from square_file_store_helper.http2_transport import HTTP2Adapter
+
+            adapter = HTTP2Adapter(
+                adapter,
+                max_connections_per_host=max_connections_per_host,
+                idle_timeout=idle_timeout,
+            )
+        session.mount(prefix, adapter)
+    return session
+
+
+def make_request(
+    method: str,
+    url: str,
+    *,
+    endpoint: Optional[str] = None,
+    data: Optional[Any] = None,
+    json: Optional[dict] = None,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+    files: Optional[dict] = None,
+    auth: Optional[Any] = None,
+    timeout: Optional[float] = None,
+    stream: bool = False,
+    session: Optional[requests.Session] = None,
+    return_type: Literal["json", "text", "bytes", "response"] = "text",
+) -> Any:
+    """
+    drop-in replacement for square_commons.api_utils.make_request that can also
+    stream the response body (stream=True, only meaningful with return_type="response")
+    and send it through a pooled session instead of opening a new connection.
+    """
+    if headers:
+        headers = {key.replace("_", "-"): value for key, value in headers.items()}
+
+    if endpoint:
+        url = f"{url.rstrip('/')}/{endpoint.lstrip('/')}"
+    try:
+        response = (session or requests).request(
+            method,
+            url,
+            json=json,
+            data=data,
+            params=params,
+            headers=headers,
+            files=files,
+            auth=auth,
+            timeout=timeout,
+            stream=stream,
+        )
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+
+        if return_type == "json":
+            return response.json()
+        elif return_type == "bytes":
+            return response.content
+        elif return_type == "response":
+            return response
+        else:
+            return response.text
+    except Exception:
+        raise
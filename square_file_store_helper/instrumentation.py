@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Sequence
+
+# the models are only built once a registry is active.
+if TYPE_CHECKING:
+    from square_file_store_helper.pydantic_models import (
+        EndpointMetrics,
+        LatencyHistogram,
+        RequestTimings,
+    )
+    from square_file_store_helper.rate_limiting import RateLimiter
+
+ProgressCallback = Callable[[int, int | None], None]
+"""called with (bytes done, bytes total or None when unknown)."""
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+_UPLOAD_PROGRESS_BLOCK_SIZE = 64 * 1024
+
+_local = threading.local()
+
+
+def get_current_request_tracker() -> "RequestTracker | None":
+    """
+    :return: the tracker of the request running in this thread, None when it is not
+        instrumented.
+    """
+    return getattr(_local, "request_tracker", None)
+
+
+class TransferProgress:
+    """
+    bytes done / total of one upload or download, shared by all the requests (resumes,
+    parallel ranges) that make up the transfer.
+    """
+
+    def __init__(self, callback: ProgressCallback):
+        self.callback = callback
+        self.bytes_done = 0
+        self.bytes_total: int | None = None
+        self._lock = threading.Lock()
+
+    def set_total(self, bytes_total: int | None):
+        self.bytes_total = bytes_total
+
+    def set_done(self, bytes_done: int):
+        with self._lock:
+            self.bytes_done = bytes_done
+            self.callback(bytes_done, self.bytes_total)
+
+    def advance(self, size: int):
+        with self._lock:
+            self.bytes_done += size
+            self.callback(self.bytes_done, self.bytes_total)
+
+
+class _Histogram:
+    def __init__(self, bucket_upper_bounds: Sequence[float]):
+        self.bucket_upper_bounds = list(bucket_upper_bounds)
+        self.bucket_counts = [0] * (len(self.bucket_upper_bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.bucket_upper_bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def export(self) -> LatencyHistogram:
+        from square_file_store_helper.pydantic_models import LatencyHistogram
+
+        return LatencyHistogram(
+            bucket_upper_bounds=self.bucket_upper_bounds + [float("inf")],
+            bucket_counts=list(self.bucket_counts),
+            count=self.count,
+            sum=self.sum,
+        )
+
+
+class _EndpointMetrics:
+    def __init__(self, bucket_upper_bounds: Sequence[float]):
+        self.request_count = 0
+        self.error_count = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.connect_seconds_sum = 0.0
+        self.disk_write_seconds_sum = 0.0
+        self.latency = _Histogram(bucket_upper_bounds)
+        self.time_to_first_byte = _Histogram(bucket_upper_bounds)
+
+    def observe(self, timings: RequestTimings):
+        self.request_count += 1
+        if timings.error is not None:
+            self.error_count += 1
+        self.bytes_sent += timings.bytes_sent
+        self.bytes_received += timings.bytes_received
+        self.connect_seconds_sum += timings.connect_seconds
+        self.disk_write_seconds_sum += timings.disk_write_seconds
+        self.latency.observe(timings.total_seconds)
+        if timings.time_to_first_byte_seconds is not None:
+            self.time_to_first_byte.observe(timings.time_to_first_byte_seconds)
+
+    def export(self) -> EndpointMetrics:
+        from square_file_store_helper.pydantic_models import EndpointMetrics
+
+        return EndpointMetrics(
+            request_count=self.request_count,
+            error_count=self.error_count,
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+            connect_seconds_sum=self.connect_seconds_sum,
+            disk_write_seconds_sum=self.disk_write_seconds_sum,
+            latency_histogram=self.latency.export(),
+            time_to_first_byte_histogram=self.time_to_first_byte.export(),
+        )
+
+
+class InstrumentationRegistry:
+    """
+    in-process hub for request timing events.
+
+    listeners subscribed with subscribe receive one RequestTimings per http request,
+    enable_metrics additionally aggregates counters and latency histograms per
+    endpoint. while neither is in use the helpers skip timing altogether.
+    listeners run on the thread that made the request and their errors propagate.
+    """
+
+    def __init__(self, latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.latency_buckets = sorted(latency_buckets)
+        self._listeners: tuple = ()
+        self._metrics_enabled = False
+        self._metrics: Dict[str, _EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def is_active(self) -> bool:
+        return self._metrics_enabled or bool(self._listeners)
+
+    def subscribe(
+        self, listener: Callable[[RequestTimings], Any]
+    ) -> Callable[[RequestTimings], Any]:
+        with self._lock:
+            self._listeners = self._listeners + (listener,)
+        return listener
+
+    def unsubscribe(self, listener: Callable[[RequestTimings], Any]):
+        with self._lock:
+            listeners = list(self._listeners)
+            listeners.remove(listener)
+            self._listeners = tuple(listeners)
+
+    def enable_metrics(self):
+        self._metrics_enabled = True
+
+    def disable_metrics(self):
+        self._metrics_enabled = False
+
+    def reset_metrics(self):
+        with self._lock:
+            self._metrics = {}
+
+    def export_metrics(self) -> Dict[str, EndpointMetrics]:
+        """
+        :return: aggregated metrics keyed by endpoint, e.g. "download_file/v0".
+        """
+        with self._lock:
+            return {
+                endpoint: metrics.export()
+                for endpoint, metrics in self._metrics.items()
+            }
+
+    def record(self, timings: RequestTimings):
+        if self._metrics_enabled:
+            with self._lock:
+                metrics = self._metrics.get(timings.endpoint)
+                if metrics is None:
+                    metrics = self._metrics[timings.endpoint] = _EndpointMetrics(
+                        self.latency_buckets
+                    )
+                metrics.observe(timings)
+        for listener in self._listeners:
+            listener(timings)
+
+
+default_registry = InstrumentationRegistry()
+
+
+class RequestTracker:
+    """
+    collects the timings of one http request made on the current thread, fed by the
+    helper (response body and disk writes) and by the pooled connections (connect,
+    request body, response headers), which also waits for the bytes of the rate
+    limiter.
+    """
+
+    def __init__(
+        self,
+        registry: InstrumentationRegistry,
+        endpoint: str,
+        method: str,
+        progress: TransferProgress | None = None,
+        rate_limiter: RateLimiter | None = None,
+    ):
+        self.registry = registry
+        self.endpoint = endpoint
+        self.method = method
+        self.progress = progress
+        self.rate_limiter = rate_limiter
+        self.status_code: int | None = None
+        self.connect_seconds = 0.0
+        self.disk_write_seconds = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.response_content_length: int | None = None
+        self.sending_body = False
+        self.chunked = False
+        self._started_at = 0.0
+        self._connected_at: float | None = None
+        self._request_started_at: float | None = None
+        self._request_sent_at: float | None = None
+        self._response_started_at: float | None = None
+        self._previous_tracker = None
+
+    def __enter__(self) -> "RequestTracker":
+        self._previous_tracker = get_current_request_tracker()
+        _local.request_tracker = self
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        finished_at = time.perf_counter()
+        _local.request_tracker = self._previous_tracker
+        if exc_type is not None and self.status_code is None:
+            response = getattr(exc_value, "response", None)
+            self.status_code = getattr(response, "status_code", None)
+        if self.registry.is_active:
+            self.registry.record(self._get_timings(finished_at, exc_type))
+
+    @contextlib.contextmanager
+    def suspended(self) -> Iterator[None]:
+        """
+        hands the thread back to the tracker this one replaced, for a generator to
+        yield in, so the requests made by its caller are not reported here.
+        """
+        _local.request_tracker = self._previous_tracker
+        try:
+            yield
+        finally:
+            self._previous_tracker = get_current_request_tracker()
+            _local.request_tracker = self
+
+    def _get_timings(self, finished_at: float, exc_type) -> RequestTimings:
+        from square_file_store_helper.pydantic_models import RequestTimings
+
+        send_seconds = None
+        time_to_first_byte_seconds = None
+        transfer_seconds = None
+        if self._request_sent_at is not None:
+            send_started_at = self._request_started_at
+            if self._connected_at is not None:
+                send_started_at = max(send_started_at, self._connected_at)
+            send_seconds = self._request_sent_at - send_started_at
+        if self._response_started_at is not None:
+            time_to_first_byte_seconds = (
+                self._response_started_at - self._request_sent_at
+            )
+            transfer_seconds = max(
+                0.0,
+                finished_at - self._response_started_at - self.disk_write_seconds,
+            )
+        return RequestTimings(
+            endpoint=self.endpoint,
+            method=self.method,
+            status_code=self.status_code,
+            error=None if exc_type is None else exc_type.__name__,
+            connection_reused=self._connected_at is None,
+            connect_seconds=self.connect_seconds,
+            send_seconds=send_seconds,
+            time_to_first_byte_seconds=time_to_first_byte_seconds,
+            transfer_seconds=transfer_seconds,
+            disk_write_seconds=self.disk_write_seconds,
+            total_seconds=finished_at - self._started_at,
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received or self.response_content_length or 0,
+        )
+
+    # called by the helper.
+
+    def write(self, data: bytes, function: Callable[..., Any], *args):
+        """
+        calls function(*args) to store data, timing it as disk write and counting
+        data as received.
+        """
+        started_at = time.perf_counter()
+        function(*args)
+        self.received(len(data), time.perf_counter() - started_at)
+
+    def received(self, size: int, write_seconds: float = 0.0):
+        """
+        counts size bytes of response body as received, handed on to the caller in
+        write_seconds (timed as disk write).
+        """
+        self.disk_write_seconds += write_seconds
+        self.bytes_received += size
+        if self.progress is not None:
+            self.progress.advance(size)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire_bytes("download", size)
+
+    # called by the pooled connections.
+
+    def on_connect(self, seconds: float):
+        self.connect_seconds += seconds
+        self._connected_at = time.perf_counter()
+
+    def on_request_start(
+        self, has_body: bool, content_length: int | None, chunked: bool
+    ):
+        self._request_started_at = time.perf_counter()
+        self.chunked = chunked
+        if has_body and self.progress is not None:
+            self.progress.set_total(content_length)
+
+    def on_request_body(self, size: int):
+        self.bytes_sent += size
+        if self.progress is not None and size:
+            self.progress.advance(size)
+        if self.rate_limiter is not None and size:
+            self.rate_limiter.acquire_bytes("upload", size)
+
+    def on_request_sent(self):
+        self.sending_body = False
+        self._request_sent_at = time.perf_counter()
+
+    def on_response_headers(self, status_code: int, content_length: int | None):
+        self._response_started_at = time.perf_counter()
+        self.status_code = status_code
+        self.response_content_length = content_length
+
+    @property
+    def upload_progress_block_size(self) -> int | None:
+        if self.progress is None and self.rate_limiter is None:
+            return None
+        return _UPLOAD_PROGRESS_BLOCK_SIZE
+
+
+class _NullRequestTracker:
+    """
+    stands in for RequestTracker when nothing listens, so call sites stay unconditional.
+    """
+
+    def __enter__(self) -> "_NullRequestTracker":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def suspended(self) -> contextlib.nullcontext:
+        return contextlib.nullcontext()
+
+    def write(self, data: bytes, function: Callable[..., Any], *args):
+        function(*args)
+
+    def received(self, size: int, write_seconds: float = 0.0):
+        pass
+
+
+NULL_REQUEST_TRACKER = _NullRequestTracker()
+
+
+def track_request(
+    registry: InstrumentationRegistry,
+    endpoint: str,
+    method: str,
+    progress: TransferProgress | None = None,
+    rate_limiter: RateLimiter | None = None,
+) -> RequestTracker | _NullRequestTracker:
+    """
+    :return: context manager tracking the request made inside it, a shared no-op
+        one when there is neither a progress, a rate limiter nor an active registry.
+    """
+    if progress is None and rate_limiter is None and not registry.is_active:
+        return NULL_REQUEST_TRACKER
+    return RequestTracker(registry, endpoint, method, progress, rate_limiter)
@@ -0,0 +1,195 @@
+import threading
+import time
+from typing import Callable, Iterable, List, Literal, Tuple, TypeVar
+
+from square_file_store_helper.pydantic_models import EndpointNodeStats
+from square_file_store_helper.retry import is_node_failure, is_unprocessed_error
+
+T = TypeVar("T")
+
+
+class _Node:
+    def __init__(self, url_base: str, weight: float):
+        self.url_base = url_base
+        self.weight = weight
+        self.outstanding_requests = 0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.consecutive_failures = 0
+        self.ejection_count = 0
+        self.ejected_until: float | None = None
+        self.current_weight = 0.0
+        self.last_picked = 0
+
+
+class EndpointPool:
+    """
+    spreads the requests of SquareFileStoreHelper over replicated file store nodes.
+
+    "least_outstanding_requests" picks the node with the fewest requests in flight
+    relative to its weight, "weighted_round_robin" cycles through the nodes in
+    proportion to their weights (smooth weighted round robin).
+
+    health is tracked passively: a node failing failure_threshold requests in a row
+    is ejected for ejection_seconds, doubled on every further ejection up to
+    max_ejection_seconds, and re-admitted afterwards. when every node is ejected the
+    one re-admitted first is still used rather than failing outright. a request
+    failing on a node is sent to the next untried node when it can be replayed, and
+    for non idempotent requests (uploads) only when the node cannot have processed
+    it (retry.is_unprocessed_error).
+    """
+
+    def __init__(
+        self,
+        list_url_base: Iterable[str | Tuple[str, float]],
+        strategy: Literal[
+            "least_outstanding_requests", "weighted_round_robin"
+        ] = "least_outstanding_requests",
+        failure_threshold: int = 3,
+        ejection_seconds: float = 10.0,
+        max_ejection_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param list_url_base: "protocol://ip:port" of every node, or
+            ("protocol://ip:port", weight) tuples.
+        """
+        if strategy not in ("least_outstanding_requests", "weighted_round_robin"):
+            raise ValueError(f"invalid strategy: {strategy}.")
+        if failure_threshold <= 0:
+            raise ValueError("failure_threshold must be a positive integer.")
+        self.nodes: List[_Node] = []
+        for item in list_url_base:
+            url_base, weight = (item, 1.0) if isinstance(item, str) else item
+            if weight <= 0:
+                raise ValueError("weights must be positive.")
+            self.nodes.append(_Node(url_base.rstrip("/"), weight))
+        if not self.nodes:
+            raise ValueError("at least one url base is required.")
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.ejection_seconds = ejection_seconds
+        self.max_ejection_seconds = max_ejection_seconds
+        self.clock = clock
+        self._pick_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def key(self) -> str:
+        """
+        identifies the pool as a whole, e.g. for the retry engine circuit breaker.
+        """
+        return ",".join(node.url_base for node in self.nodes)
+
+    def call(
+        self,
+        function: Callable[[str], T],
+        replayable: bool = True,
+        idempotent: bool = True,
+    ) -> T:
+        """
+        :param function: sends the request to the url base it is called with.
+        :param replayable: False when the request cannot be sent a second time.
+        :param idempotent: False when sending the request twice can duplicate it, it
+            is then failed over only on connect errors and 408 / 429 / 503.
+        :return: the result of the first node that did not fail, the last node
+            failure is raised when every node failed.
+        """
+        tried: List[_Node] = []
+        while True:
+            node = self._acquire(tried)
+            try:
+                result = function(node.url_base)
+            except Exception as error:
+                node_failed = is_node_failure(error)
+                self._release(node, node_failed)
+                tried.append(node)
+                if (
+                    not node_failed
+                    or not replayable
+                    or (not idempotent and not is_unprocessed_error(error))
+                    or len(tried) >= len(self.nodes)
+                ):
+                    raise
+                continue
+            self._release(node, False)
+            return result
+
+    def get_node_stats(self) -> List[EndpointNodeStats]:
+        with self._lock:
+            now = self.clock()
+            return [
+                EndpointNodeStats(
+                    url_base=node.url_base,
+                    weight=node.weight,
+                    outstanding_requests=node.outstanding_requests,
+                    total_requests=node.total_requests,
+                    total_failures=node.total_failures,
+                    consecutive_failures=node.consecutive_failures,
+                    ejected=node.ejected_until is not None and node.ejected_until > now,
+                    ejection_count=node.ejection_count,
+                )
+                for node in self.nodes
+            ]
+
+    def _acquire(self, tried: List[_Node]) -> _Node:
+        with self._lock:
+            now = self.clock()
+            candidates = [node for node in self.nodes if node not in tried]
+            healthy = []
+            for node in candidates:
+                if node.ejected_until is not None and node.ejected_until <= now:
+                    # re-admitted, it gets a fresh failure count.
+                    node.ejected_until = None
+                    node.consecutive_failures = 0
+                if node.ejected_until is None:
+                    healthy.append(node)
+            if healthy:
+                node = self._pick(healthy)
+            else:
+                node = min(candidates, key=lambda node: node.ejected_until)
+            self._pick_count += 1
+            node.last_picked = self._pick_count
+            node.outstanding_requests += 1
+            node.total_requests += 1
+            return node
+
+    def _pick(self, nodes: List[_Node]) -> _Node:
+        if self.strategy == "weighted_round_robin":
+            total_weight = 0.0
+            best = None
+            for node in nodes:
+                node.current_weight += node.weight
+                total_weight += node.weight
+                if best is None or node.current_weight > best.current_weight:
+                    best = node
+            best.current_weight -= total_weight
+            return best
+        # least recently picked first among equally loaded nodes.
+        return min(
+            nodes,
+            key=lambda node: (
+                node.outstanding_requests / node.weight,
+                node.last_picked,
+            ),
+        )
+
+    def _release(self, node: _Node, failed: bool):
+        with self._lock:
+            node.outstanding_requests -= 1
+            if not failed:
+                node.consecutive_failures = 0
+                # a success while every node was ejected re-admits the node early.
+                node.ejected_until = None
+                return
+            node.total_failures += 1
+            node.consecutive_failures += 1
+            if (
+                node.ejected_until is None
+                and node.consecutive_failures >= self.failure_threshold
+            ):
+                node.ejected_until = self.clock() + min(
+                    self.max_ejection_seconds,
+                    self.ejection_seconds * 2**node.ejection_count,
+                )
+                node.ejection_count += 1
@@ -1,18 +1,251 @@
+from __future__ import annotations
+
+import hashlib
 import mimetypes
 import os
+import re
+import threading
+import time
 import urllib.parse
-from typing import Tuple, IO, overload, Literal, Any, Dict
-
-from kiss_headers import parse_it
-from square_commons.api_utils import (
-    StandardResponse,
-    make_request,
+from typing import (
+    TYPE_CHECKING,
+    Tuple,
+    IO,
+    overload,
+    Literal,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Callable,
+    Sequence,
 )
 
-from square_file_store_helper.pydantic_models import (
-    UploadFileV0Response,
-    DeleteFilesV0Response,
+import requests
+
+from square_file_store_helper.checksums import (
+    DigestMismatchError,
+    Digests,
+    get_expected_digests,
+)
+from square_file_store_helper.concurrency import run_in_parallel
+from square_file_store_helper.download_stream import DownloadStream, get_sink_writer
+from square_file_store_helper.instrumentation import (
+    InstrumentationRegistry,
+    ProgressCallback,
+    TransferProgress,
+    default_registry,
+    track_request,
+)
+from square_file_store_helper.multipart import (
+    DEFAULT_UPLOAD_CHUNK_SIZE,
+    MultipartEncoder,
+    get_remaining_size,
+    is_regular_file,
 )
+from square_file_store_helper.http_utils import create_session, make_request
+from square_file_store_helper.rate_limiting import PRIORITY_BULK, rate_limit_priority
+from square_file_store_helper.response_decoding import (
+    StandardResult,
+    UploadFileV0Result,
+    DeleteFilesV0Result,
+    decode_delete_files_v0_response,
+    decode_upload_file_v0_response,
+    get_standard_response_model,
+)
+
+# pydantic, kiss_headers and square_commons are imported on first use, a helper
+# that only sends plain dict requests never pays for them.
+if TYPE_CHECKING:
+    from square_commons.api_utils import StandardResponse
+
+    from square_file_store_helper.adaptive_concurrency import (
+        AdaptiveConcurrencyLimiter,
+    )
+    from square_file_store_helper.content_encoding import CompressionPolicy
+    from square_file_store_helper.download_cache import DownloadCache
+    from square_file_store_helper.load_balancing import EndpointPool
+    from square_file_store_helper.rate_limiting import RateLimiter
+    from square_file_store_helper.retry import RetryEngine
+    from square_file_store_helper.upload_deduplication import (
+        UploadDeduplicationIndex,
+    )
+    from square_file_store_helper.pydantic_models import (
+        UploadFileV0Response,
+        DeleteFilesV0Response,
+        DownloadFileV0Output,
+        DownloadToSinkV0Output,
+        BulkUploadFileV0Input,
+        BulkUploadFileV0Output,
+        BulkDownloadFileV0Output,
+    )
+
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_RESUME_ATTEMPTS = 3
+DEFAULT_DELETE_MAX_BATCH_SIZE = 500
+DEFAULT_DELETE_MAX_URL_LENGTH = 8000
+
+
+def parse_it(response):
+    import kiss_headers
+
+    return kiss_headers.parse_it(response)
+
+
+def _get_file_name_from_response(response) -> str:
+    headers = parse_it(response)
+    if headers.content_disposition.has("filename*"):
+        return urllib.parse.unquote(headers.content_disposition["filename*"][7:])
+    elif headers.content_disposition.has("filename"):
+        return headers.content_disposition["filename"]
+    else:
+        raise Exception(
+            f"unable to download file - not able to get file name. headers: {headers}",
+        )
+
+
+class _ResumeMismatchError(Exception):
+    pass
+
+
+def _is_resumable(response) -> bool:
+    headers = response.headers
+    return (
+        headers.get("Accept-Ranges", "").lower() == "bytes"
+        and headers.get("Content-Encoding", "identity").lower() == "identity"
+        and _get_identity_content_length(response) is not None
+    )
+
+
+def _get_identity_content_length(response) -> int | None:
+    """
+    :return: Content-Length of an uncompressed response, None if unknown.
+    """
+    headers = response.headers
+    if headers.get("Content-Encoding", "identity").lower() != "identity":
+        return None
+    try:
+        return int(headers["Content-Length"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _is_matching_content_range(
+    response, start: int, end: int, total: int | None = None
+) -> bool:
+    """
+    checks that a 206 response carries "Content-Range: bytes start-(end - 1)/total"
+    with a consistent Content-Length, total defaults to end.
+    """
+    total = end if total is None else total
+    match = re.fullmatch(
+        r"bytes (\d+)-(\d+)/(\d+|\*)", response.headers.get("Content-Range", "")
+    )
+    if match is None:
+        return False
+    range_start, range_end, range_total = match.groups()
+    if int(range_start) != start or int(range_end) != end - 1:
+        return False
+    if range_total != "*" and int(range_total) != total:
+        return False
+    content_length = _get_identity_content_length(response)
+    return content_length is None or content_length == end - start
+
+
+_write_at_lock = threading.Lock()
+
+
+def _write_at(file_descriptor: int, data: bytes, offset: int):
+    if hasattr(os, "pwrite"):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(file_descriptor, view, offset)
+            view = view[written:]
+            offset += written
+    else:  # pragma: no cover - no pwrite on windows.
+        with _write_at_lock:
+            os.lseek(file_descriptor, offset, os.SEEK_SET)
+            os.write(file_descriptor, data)
+
+
+def _get_part_file_path(
+    output_folder_path: str, file_name: str, file_storage_token: str
+) -> str:
+    return (
+        output_folder_path
+        + os.sep
+        + f".{file_name}."
+        + hashlib.sha256(file_storage_token.encode()).hexdigest()[:16]
+        + ".part"
+    )
+
+
+def _is_seekable(file: IO) -> bool:
+    try:
+        return file.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def _report_complete(progress: TransferProgress | None, file_path: str):
+    if progress is not None:
+        size = os.path.getsize(file_path)
+        progress.set_total(size)
+        progress.set_done(size)
+
+
+def _discard_part_file(part_file_path: str | None, keep_for_resume: bool):
+    if part_file_path is None or not os.path.exists(part_file_path):
+        return
+    if keep_for_resume and os.path.getsize(part_file_path) > 0:
+        return
+    os.remove(part_file_path)
+
+
+def _write_decoded_response(
+    response,
+    file_path: str,
+    part_file_path: str,
+    compression_policy: CompressionPolicy,
+    tracker,
+    progress: TransferProgress | None,
+    chunk_size: int = DEFAULT_DOWNLOAD_CHUNK_SIZE,
+    digests: Digests | None = None,
+) -> int:
+    """
+    writes a streamed response to part_file_path chunk by chunk, decoding its
+    Content-Encoding on the way, and records the ratio in compression_policy.
+    digests are fed the decoded chunks and checked against the digest headers. the
+    .part file is moved to file_path once the whole body is in and verified, and
+    removed on any error since a compressed body cannot be resumed.
+    :return: number of decoded bytes written.
+    """
+    try:
+        if progress is not None:
+            progress.set_total(_get_identity_content_length(response))
+        bytes_decoded = 0
+        with open(part_file_path, "wb") as file:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    tracker.write(chunk, file.write, chunk)
+                    bytes_decoded += len(chunk)
+                    if digests is not None:
+                        digests.update(chunk)
+        compression_policy.record_download(
+            response.headers.get("Content-Encoding"),
+            response.raw.tell(),
+            bytes_decoded,
+        )
+        if digests is not None:
+            digests.verify(get_expected_digests(response.headers))
+        os.replace(part_file_path, file_path)
+        return bytes_decoded
+    except BaseException:
+        _discard_part_file(part_file_path, keep_for_resume=False)
+        raise
+    finally:
+        response.close()
 
 
 class SquareFileStoreHelper:
@@ -21,15 +254,303 @@ class SquareFileStoreHelper:
         param_str_square_file_store_protocol: str = "http",
         param_str_square_file_store_ip: str = "localhost",
         param_int_square_file_store_port: int = 10100,
+        param_int_connection_pool_size: int = 10,
+        param_int_max_connections_per_host: int = 10,
+        param_float_connection_idle_timeout: float | None = 60.0,
+        param_download_cache: DownloadCache | None = None,
+        param_upload_deduplication_index: UploadDeduplicationIndex | None = None,
+        param_instrumentation_registry: InstrumentationRegistry | None = None,
+        param_retry_engine: RetryEngine | None = None,
+        param_endpoint_pool: EndpointPool | None = None,
+        param_bool_zero_copy_upload: bool = True,
+        param_compression_policy: CompressionPolicy | None = None,
+        param_bool_trust_responses: bool = False,
+        param_rate_limiter: RateLimiter | None = None,
+        param_bool_http2: bool = False,
     ):
+        """
+        :param param_int_connection_pool_size: number of per-host connection pools kept.
+        :param param_int_max_connections_per_host: kept-alive connections per host,
+            raise it when sharing the helper between many threads.
+        :param param_float_connection_idle_timeout: seconds after which idle pooled
+            connections are dropped, None keeps them forever.
+        :param param_download_cache: serve repeated downloads of a token from this
+            on-disk cache instead of the server, delete_file_v0 invalidates the entries
+            of the tokens it deleted. hits are copied to the output folder, the files
+            returned never share storage with the cache.
+        :param param_upload_deduplication_index: skip uploads of content already uploaded
+            with the same file name, app_id and system_relative_path and return the
+            earlier file_storage_token instead (seekable files only),
+            delete_file_v0 invalidates the entries of the tokens it deleted.
+        :param param_instrumentation_registry: registry receiving the timing event of
+            every request, defaults to the process wide
+            instrumentation.default_registry.
+        :param param_retry_engine: retry transient failures (connection errors,
+            retryable statuses) with backoff according to its per endpoint policies,
+            None sends every request once.
+        :param param_endpoint_pool: balance requests over several replicated nodes
+            with failover, replaces protocol / ip / port (the url base attribute
+            then holds the first node).
+        :param param_bool_zero_copy_upload: upload regular files over plain http with
+            sendfile, the file content is never read into python buffers.
+        :param param_compression_policy: compress uploads of compressible content
+            types on the fly and negotiate compressed downloads, decoded while
+            written to disk, None transfers files as they are.
+        :param param_bool_trust_responses: skip the type checks when decoding
+            responses with response_as_result, for servers known to send well
+            formed responses.
+        :param param_rate_limiter: shape the bytes per second of uploads and
+            downloads and the requests per second per endpoint, may be shared with
+            other helpers.
+        :param param_bool_http2: multiplex the requests of all threads as streams
+            of one http/2 connection per node (prior knowledge h2c over http, ALPN
+            over https), falling back to HTTP/1.1 for nodes that do not speak it.
+            requires square_file_store_helper[http2], zero copy uploads are read
+            into buffers over http/2.
+        """
         try:
-            self.global_str_square_file_store_url_base = (
-                f"{param_str_square_file_store_protocol}://"
-                f"{param_str_square_file_store_ip}:{param_int_square_file_store_port}"
+            if param_endpoint_pool is None:
+                self.global_str_square_file_store_url_base = (
+                    f"{param_str_square_file_store_protocol}://"
+                    f"{param_str_square_file_store_ip}:{param_int_square_file_store_port}"
+                )
+            else:
+                self.global_str_square_file_store_url_base = param_endpoint_pool.nodes[
+                    0
+                ].url_base
+            self.global_object_session = create_session(
+                pool_size=param_int_connection_pool_size,
+                max_connections_per_host=param_int_max_connections_per_host,
+                idle_timeout=param_float_connection_idle_timeout,
+                http2=param_bool_http2,
+            )
+            self.global_bool_http2 = param_bool_http2
+            self.global_object_download_cache = param_download_cache
+            self.global_object_upload_deduplication_index = (
+                param_upload_deduplication_index
+            )
+            self.global_object_instrumentation_registry = (
+                param_instrumentation_registry or default_registry
             )
+            self.global_object_retry_engine = param_retry_engine
+            self.global_object_endpoint_pool = param_endpoint_pool
+            self.global_bool_zero_copy_upload = param_bool_zero_copy_upload
+            self.global_object_compression_policy = param_compression_policy
+            self.global_bool_trust_responses = param_bool_trust_responses
+            self.global_object_rate_limiter = param_rate_limiter
         except Exception:
             raise
 
+    def close(self):
+        """
+        closes all pooled connections, the helper should not be used afterwards.
+        """
+        try:
+            self.global_object_session.close()
+        except Exception:
+            raise
+
+    def __enter__(self) -> "SquareFileStoreHelper":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _track_request(
+        self, endpoint: str, method: str, progress: TransferProgress | None = None
+    ):
+        return track_request(
+            self.global_object_instrumentation_registry,
+            endpoint,
+            method,
+            progress,
+            self.global_object_rate_limiter,
+        )
+
+    def _send(
+        self,
+        endpoint: str,
+        function: Callable[[str, float | None], Any],
+        replayable: bool = True,
+        idempotent: bool = True,
+    ) -> Any:
+        """
+        calls function(url base, timeout) on the configured node, or on the nodes
+        picked by the endpoint pool (failing over between them), through the retry
+        engine when there is one. every call waits for the rate limiter first.
+        """
+        rate_limiter = self.global_object_rate_limiter
+        if rate_limiter is not None:
+            unlimited_function = function
+
+            def function(url_base: str, timeout: float | None) -> Any:
+                rate_limiter.acquire_request(endpoint)
+                return unlimited_function(url_base, timeout)
+
+        endpoint_pool = self.global_object_endpoint_pool
+        if endpoint_pool is None:
+            url_base = self.global_str_square_file_store_url_base
+
+            def attempt(timeout: float | None) -> Any:
+                return function(url_base, timeout)
+
+        else:
+            url_base = endpoint_pool.key
+
+            def attempt(timeout: float | None) -> Any:
+                return endpoint_pool.call(
+                    lambda node_url_base: function(node_url_base, timeout),
+                    replayable,
+                    idempotent,
+                )
+
+        if self.global_object_retry_engine is None:
+            return attempt(None)
+        return self.global_object_retry_engine.call(
+            url_base, endpoint, attempt, replayable
+        )
+
+    def _upload_file(
+        self,
+        file: Tuple[str, IO | Iterable[bytes], str],
+        app_id: int | None,
+        system_relative_path: str,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        progress: TransferProgress | None = None,
+        digests: Digests | None = None,
+    ) -> Dict[str, Any]:
+        """
+        :param digests: fed the file content, by the deduplication hashing pass when
+            there is one, else as the body is produced (no zero copy then). their hex
+            digests are added to the response as data.digests.
+        """
+        endpoint = "upload_file/v0"
+        data = {
+            "app_id": app_id,
+            "system_relative_path": system_relative_path,
+        }
+        upload_deduplication_index = self.global_object_upload_deduplication_index
+        content_hash = None
+        if upload_deduplication_index is not None and _is_seekable(file[1]):
+            content_hash, size = upload_deduplication_index.hash_file(file[1], digests)
+            file_storage_token = upload_deduplication_index.find(
+                content_hash, file[0], app_id, system_relative_path
+            )
+            if file_storage_token is not None:
+                upload_deduplication_index.record_hit(size)
+                if progress is not None:
+                    progress.set_total(size)
+                    progress.set_done(size)
+                data = {"main": file_storage_token}
+                if digests is not None:
+                    data["digests"] = digests.hexdigests()
+                return {
+                    "data": data,
+                    "message": "identical file already uploaded, upload skipped.",
+                    "log": None,
+                }
+
+        hash_while_sending = digests is not None and content_hash is None
+        # the body can only be sent again when the file can be rewound.
+        position = file[1].tell() if _is_seekable(file[1]) else None
+        # sendfile never hands the content to python, it cannot be hashed.
+        zero_copy = (
+            self.global_bool_zero_copy_upload
+            and is_regular_file(file[1])
+            and not hash_while_sending
+        )
+        compression_policy = self.global_object_compression_policy
+        compress = False
+        if compression_policy is not None:
+            compress = compression_policy.should_compress(
+                file[2], get_remaining_size(file[1])
+            )
+            if not compress:
+                compression_policy.record_skipped_upload()
+
+        def send(url_base: str, timeout: float | None) -> Dict[str, Any]:
+            if position is not None:
+                file[1].seek(position)
+            if progress is not None and progress.bytes_done:
+                progress.set_done(0)
+            if hash_while_sending:
+                digests.reset()
+            # sendfile cannot go through tls, https keeps the regular paths.
+            send_zero_copy = (
+                zero_copy and not compress and url_base.startswith("http://")
+            )
+            if stream or send_zero_copy or compress or hash_while_sending:
+                encoder = MultipartEncoder(
+                    fields=data,
+                    file_field_name="file",
+                    file_name=file[0],
+                    file=file[1],
+                    content_type=file[2],
+                    chunk_size=chunk_size,
+                    zero_copy=send_zero_copy,
+                    on_file_chunk=digests.update if hash_while_sending else None,
+                )
+                headers = {"Content-Type": encoder.content_type}
+                body = encoder
+                if compress:
+                    # the compressed size is unknown upfront, sent chunked.
+                    headers["Content-Encoding"] = compression_policy.upload_encoding
+                    body = compression_policy.compress(encoder)
+                return make_request(
+                    method="POST",
+                    url=url_base,
+                    endpoint=endpoint,
+                    session=self.global_object_session,
+                    data=body,
+                    headers=headers,
+                    timeout=timeout,
+                    return_type="json",
+                )
+            files = {"file": file}
+            return make_request(
+                method="POST",
+                url=url_base,
+                endpoint=endpoint,
+                session=self.global_object_session,
+                data=data,
+                files=files,
+                timeout=timeout,
+                return_type="json",
+            )
+
+        with self._track_request(endpoint, "POST", progress):
+            response = self._send(
+                endpoint, send, replayable=position is not None, idempotent=False
+            )
+        if digests is not None and isinstance(response.get("data"), dict):
+            response["data"]["digests"] = digests.hexdigests()
+        if content_hash is not None:
+            upload_deduplication_index.add(
+                content_hash,
+                file[0],
+                app_id,
+                system_relative_path,
+                response["data"]["main"],
+            )
+            upload_deduplication_index.record_miss()
+        return response
+
+    @overload
+    def upload_file_using_file_path_v0(
+        self,
+        file_path: str,
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        response_as_pydantic: bool = False,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        progress_callback: ProgressCallback | None = None,
+        *,
+        response_as_result: Literal[True],
+        digest_algorithms: Sequence[str] | None = None,
+    ) -> StandardResult[UploadFileV0Result]: ...
+
     @overload
     def upload_file_using_file_path_v0(
         self,
@@ -37,6 +558,11 @@ class SquareFileStoreHelper:
         app_id: int | None = None,
         system_relative_path: str = "others/misc",
         response_as_pydantic: Literal[True] = ...,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        progress_callback: ProgressCallback | None = None,
+        response_as_result: Literal[False] = ...,
+        digest_algorithms: Sequence[str] | None = None,
     ) -> StandardResponse[UploadFileV0Response]: ...
 
     @overload
@@ -46,6 +572,11 @@ class SquareFileStoreHelper:
         app_id: int | None = None,
         system_relative_path: str = "others/misc",
         response_as_pydantic: Literal[False] = ...,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        progress_callback: ProgressCallback | None = None,
+        response_as_result: Literal[False] = ...,
+        digest_algorithms: Sequence[str] | None = None,
     ) -> Dict[str, Any]: ...
 
     def upload_file_using_file_path_v0(
@@ -54,35 +585,72 @@ class SquareFileStoreHelper:
         app_id: int | None = None,
         system_relative_path: str = "others/misc",
         response_as_pydantic: bool = False,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        progress_callback: ProgressCallback | None = None,
+        response_as_result: bool = False,
+        digest_algorithms: Sequence[str] | None = None,
     ) -> Any:
+        """
+        :param stream: send a multipart body produced lazily from the file in
+            chunk_size pieces instead of building it in memory, so memory use does
+            not grow with the file size.
+        :param chunk_size: bytes read from the file at a time when streaming.
+        :param progress_callback: called with (bytes sent, total bytes or None) as the
+            request body goes out.
+        :param response_as_result: return a StandardResult decoded without pydantic,
+            cheaper than response_as_pydantic, which it takes precedence over.
+        :param digest_algorithms: compute these digests ("sha256", "blake2b",
+            "crc32c") over the file content as it is sent, returned as data.digests
+            (algorithm -> hex digest). the file is then read rather than sent with
+            sendfile.
+        """
         try:
-            endpoint = "upload_file/v0"
-            data = {
-                "app_id": app_id,
-                "system_relative_path": system_relative_path,
-            }
             with open(file_path, "rb") as file:
                 filename = os.path.basename(file_path)
                 content_type = (
                     mimetypes.guess_type(filename)[0] or "application/octet-stream"
                 )
-                files = {"file": (filename, file, content_type)}
-                response = make_request(
-                    method="POST",
-                    url=self.global_str_square_file_store_url_base,
-                    endpoint=endpoint,
-                    data=data,
-                    files=files,
-                    return_type="json",
+                response = self._upload_file(
+                    (filename, file, content_type),
+                    app_id,
+                    system_relative_path,
+                    stream,
+                    chunk_size,
+                    progress_callback and TransferProgress(progress_callback),
+                    None if digest_algorithms is None else Digests(digest_algorithms),
+                )
+            if response_as_result:
+                return decode_upload_file_v0_response(
+                    response, self.global_bool_trust_responses
                 )
-            if response_as_pydantic:
-                return StandardResponse[UploadFileV0Response](**response)
+            elif response_as_pydantic:
+                from square_file_store_helper.pydantic_models import (
+                    UploadFileV0Response,
+                )
+
+                return get_standard_response_model(UploadFileV0Response)(**response)
             else:
                 return response
 
         except Exception:
             raise
 
+    @overload
+    def upload_file_using_tuple_v0(
+        self,
+        file: Tuple[str, IO, str],
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        response_as_pydantic: bool = False,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        progress_callback: ProgressCallback | None = None,
+        *,
+        response_as_result: Literal[True],
+        digest_algorithms: Sequence[str] | None = None,
+    ) -> StandardResult[UploadFileV0Result]: ...
+
     @overload
     def upload_file_using_tuple_v0(
         self,
@@ -90,6 +658,11 @@ class SquareFileStoreHelper:
         app_id: int | None = None,
         system_relative_path: str = "others/misc",
         response_as_pydantic: Literal[True] = ...,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        progress_callback: ProgressCallback | None = None,
+        response_as_result: Literal[False] = ...,
+        digest_algorithms: Sequence[str] | None = None,
     ) -> StandardResponse[UploadFileV0Response]: ...
 
     @overload
@@ -99,6 +672,11 @@ class SquareFileStoreHelper:
         app_id: int | None = None,
         system_relative_path: str = "others/misc",
         response_as_pydantic: Literal[False] = ...,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        progress_callback: ProgressCallback | None = None,
+        response_as_result: Literal[False] = ...,
+        digest_algorithms: Sequence[str] | None = None,
     ) -> Dict[str, Any]: ...
 
     def upload_file_using_tuple_v0(
@@ -107,77 +685,1049 @@ class SquareFileStoreHelper:
         app_id: int | None = None,
         system_relative_path: str = "others/misc",
         response_as_pydantic: bool = False,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        progress_callback: ProgressCallback | None = None,
+        response_as_result: bool = False,
+        digest_algorithms: Sequence[str] | None = None,
     ) -> Any:
+        """
+        :param file: (filename, IO, content_type), with stream the IO may also be a
+            non seekable stream (pipe, socket) or an iterable of bytes.
+        :param stream: send a multipart body produced lazily from the file in
+            chunk_size pieces instead of building it in memory, so memory use does
+            not grow with the file size.
+        :param chunk_size: bytes read from the file at a time when streaming.
+        :param progress_callback: called with (bytes sent, total bytes or None) as the
+            request body goes out.
+        :param response_as_result: return a StandardResult decoded without pydantic,
+            cheaper than response_as_pydantic, which it takes precedence over.
+        :param digest_algorithms: see upload_file_using_file_path_v0.
+        """
         try:
-            endpoint = "upload_file/v0"
-            data = {
-                "app_id": app_id,
-                "system_relative_path": system_relative_path,
-            }
-
-            files = {"file": file}
-            response = make_request(
-                method="POST",
-                url=self.global_str_square_file_store_url_base,
-                endpoint=endpoint,
-                data=data,
-                files=files,
-                return_type="json",
+            response = self._upload_file(
+                file,
+                app_id,
+                system_relative_path,
+                stream,
+                chunk_size,
+                progress_callback and TransferProgress(progress_callback),
+                None if digest_algorithms is None else Digests(digest_algorithms),
             )
-            if response_as_pydantic:
-                return StandardResponse[UploadFileV0Response](**response)
+            if response_as_result:
+                return decode_upload_file_v0_response(
+                    response, self.global_bool_trust_responses
+                )
+            elif response_as_pydantic:
+                from square_file_store_helper.pydantic_models import (
+                    UploadFileV0Response,
+                )
+
+                return get_standard_response_model(UploadFileV0Response)(**response)
             else:
                 return response
         except Exception:
             raise
 
-    def download_file_v0(self, file_storage_token: str, output_folder_path: str) -> str:
+    def upload_files_in_bulk_v0(
+        self,
+        files: Iterable[str | Tuple[str, IO, str] | BulkUploadFileV0Input],
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        max_workers: int = 8,
+        response_as_pydantic: bool = False,
+        stream: bool = False,
+        response_as_result: bool = False,
+        digest_algorithms: Sequence[str] | None = None,
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
+    ) -> List[BulkUploadFileV0Output]:
+        """
+        uploads many files over a bounded pool of worker threads sharing the helper
+        session, keep max_workers <= param_int_max_connections_per_host so every worker
+        gets a kept-alive connection.
+        :param files: file paths, (filename, IO, content_type) tuples or
+            BulkUploadFileV0Input for per item app_id / system_relative_path overrides.
+        :param app_id: shared app_id.
+        :param system_relative_path: shared system_relative_path.
+        :param max_workers: number of concurrent uploads.
+        :param response_as_pydantic:
+        :param stream: stream every upload, see upload_file_using_file_path_v0.
+        :param response_as_result: see upload_file_using_file_path_v0.
+        :param digest_algorithms: see upload_file_using_file_path_v0.
+        :param concurrency_limiter: adapt the number of concurrent uploads, up to
+            max_workers, to the latency and errors of the store.
+        :return: one BulkUploadFileV0Output per input in input order, a failed upload
+            sets error instead of stopping the batch.
+        """
+        from square_file_store_helper.pydantic_models import (
+            BulkUploadFileV0Input,
+            BulkUploadFileV0Output,
+        )
+
+        try:
+
+            def upload(item):
+                item_app_id = app_id
+                item_system_relative_path = system_relative_path
+                if isinstance(item, BulkUploadFileV0Input):
+                    if "app_id" in item.model_fields_set:
+                        item_app_id = item.app_id
+                    if "system_relative_path" in item.model_fields_set:
+                        item_system_relative_path = item.system_relative_path
+                    item = item.file
+                if isinstance(item, str):
+                    return self.upload_file_using_file_path_v0(
+                        file_path=item,
+                        app_id=item_app_id,
+                        system_relative_path=item_system_relative_path,
+                        response_as_pydantic=response_as_pydantic,
+                        stream=stream,
+                        response_as_result=response_as_result,
+                        digest_algorithms=digest_algorithms,
+                    )
+                return self.upload_file_using_tuple_v0(
+                    file=item,
+                    app_id=item_app_id,
+                    system_relative_path=item_system_relative_path,
+                    response_as_pydantic=response_as_pydantic,
+                    stream=stream,
+                    response_as_result=response_as_result,
+                    digest_algorithms=digest_algorithms,
+                )
+
+            with rate_limit_priority(PRIORITY_BULK):
+                outcomes = run_in_parallel(
+                    upload, files, max_workers, concurrency_limiter
+                )
+            return [
+                BulkUploadFileV0Output(index=index, response=response, error=error)
+                for index, (response, error) in enumerate(outcomes)
+            ]
+        except Exception:
+            raise
+
+    @overload
+    def download_file_v0(
+        self,
+        file_storage_token: str,
+        output_folder_path: str,
+        progress_callback: ProgressCallback | None = None,
+        *,
+        digest_algorithms: Sequence[str],
+    ) -> DownloadFileV0Output: ...
+
+    @overload
+    def download_file_v0(
+        self,
+        file_storage_token: str,
+        output_folder_path: str,
+        progress_callback: ProgressCallback | None = None,
+        digest_algorithms: None = None,
+    ) -> str: ...
+
+    def download_file_v0(
+        self,
+        file_storage_token: str,
+        output_folder_path: str,
+        progress_callback: ProgressCallback | None = None,
+        digest_algorithms: Sequence[str] | None = None,
+    ) -> Any:
         """
         :param file_storage_token:
         :param output_folder_path:
-        :return: filepath
+        :param progress_callback: called with (bytes written, total bytes), once the
+            body has been received since it is buffered in memory, or per chunk
+            written with a compression policy.
+        :param digest_algorithms: compute these digests ("sha256", "blake2b",
+            "crc32c") over the body as it is received and check them against the
+            Repr-Digest / Digest header, a mismatching body is not kept.
+        :return: filepath, DownloadFileV0Output with digests when digest_algorithms
+            are given.
+        :raises DigestMismatchError:
         """
+        from square_file_store_helper.pydantic_models import DownloadFileV0Output
+
         try:
+            progress = progress_callback and TransferProgress(progress_callback)
+            digests = None if digest_algorithms is None else Digests(digest_algorithms)
+            download_cache = self.global_object_download_cache
+            if download_cache is not None:
+                cached = download_cache.get(file_storage_token)
+                if cached is not None:
+                    if not os.path.exists(output_folder_path):
+                        os.mkdir(output_folder_path)
+                    downloaded_file_path = output_folder_path + os.sep + cached[0]
+                    if download_cache.copy_to(file_storage_token, downloaded_file_path):
+                        _report_complete(progress, downloaded_file_path)
+                        if digests is None:
+                            return downloaded_file_path
+                        # nothing was transferred to hash on the way.
+                        digests.update_from_file(downloaded_file_path)
+                        return DownloadFileV0Output(
+                            file_path=downloaded_file_path,
+                            file_name=cached[0],
+                            bytes_written=os.path.getsize(downloaded_file_path),
+                            from_cache=True,
+                            digests=digests.hexdigests(),
+                        )
+
             endpoint = "download_file/v0"
             payload = {
                 "file_storage_token": file_storage_token,
             }
-            response = make_request(
-                method="GET",
-                url=self.global_str_square_file_store_url_base,
-                endpoint=endpoint,
-                params=payload,
-                return_type="response",
+            compression_policy = self.global_object_compression_policy
+            accept_encoding = (
+                None
+                if compression_policy is None
+                else compression_policy.accept_encoding
             )
-            if not os.path.exists(output_folder_path):
-                os.mkdir(output_folder_path)
+            with self._track_request(endpoint, "GET", progress) as tracker:
+                response = self._send(
+                    endpoint,
+                    lambda url_base, timeout: make_request(
+                        method="GET",
+                        url=url_base,
+                        endpoint=endpoint,
+                        session=self.global_object_session,
+                        params=payload,
+                        headers=accept_encoding
+                        and {"Accept-Encoding": accept_encoding},
+                        stream=accept_encoding is not None,
+                        timeout=timeout,
+                        return_type="response",
+                    ),
+                )
+                if not os.path.exists(output_folder_path):
+                    os.mkdir(output_folder_path)
+
+                file_name = _get_file_name_from_response(response)
 
-            headers = parse_it(response)
-            if headers.content_disposition.has("filename*"):
-                file_name = urllib.parse.unquote(
-                    headers.content_disposition["filename*"][7:]
+                downloaded_file_path = output_folder_path + os.sep + file_name
+                if accept_encoding is not None:
+                    bytes_written = _write_decoded_response(
+                        response,
+                        downloaded_file_path,
+                        _get_part_file_path(
+                            output_folder_path, file_name, file_storage_token
+                        ),
+                        compression_policy,
+                        tracker,
+                        progress,
+                        digests=digests,
+                    )
+                else:
+                    content = response.content
+                    if digests is not None:
+                        # the body is in memory, checked before anything is written.
+                        digests.update(content)
+                        digests.verify(get_expected_digests(response.headers))
+                    with open(downloaded_file_path, "wb") as file:
+                        if progress is not None:
+                            progress.set_total(len(content))
+                        tracker.write(content, file.write, content)
+                    bytes_written = len(content)
+
+            hexdigests = None if digests is None else digests.hexdigests()
+            if download_cache is not None:
+                download_cache.put(
+                    file_storage_token,
+                    file_name,
+                    downloaded_file_path,
+                    hexdigests and hexdigests.get("sha256"),
                 )
-            elif headers.content_disposition.has("filename"):
-                file_name = headers.content_disposition["filename"]
+
+            if digests is None:
+                return downloaded_file_path
+            return DownloadFileV0Output(
+                file_path=downloaded_file_path,
+                file_name=file_name,
+                bytes_written=bytes_written,
+                digests=hexdigests,
+            )
+
+        except Exception:
+            raise
+
+    def _download_to_temporary_file(
+        self,
+        file_storage_token: str,
+        output_folder_path: str,
+        chunk_size: int,
+        max_resume_attempts: int = DEFAULT_MAX_RESUME_ATTEMPTS,
+        progress: TransferProgress | None = None,
+        digests: Digests | None = None,
+    ) -> Tuple[str, str, int]:
+        """
+        streams the file into a .part file in output_folder_path. when the server
+        advertises "Accept-Ranges: bytes", an interrupted transfer is resumed with a
+        "Range: bytes=N-" request (up to max_resume_attempts times) and the .part file
+        is kept on failure so a later call for the same token picks up where it stopped.
+        digests are fed the chunks as they are written (only bytes left by an earlier
+        call are read back) and checked against the digest headers, the .part file is
+        removed on a mismatch.
+        :return: (file name from content disposition, .part file path, file size)
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer.")
+        endpoint = "download_file/v0"
+        payload = {
+            "file_storage_token": file_storage_token,
+        }
+        os.makedirs(output_folder_path, exist_ok=True)
+        file_name = None
+        part_file_path = None
+        expected_size = None
+        resumable = False
+        resume_attempts = 0
+        bytes_written = 0
+        bytes_hashed = 0
+        expected_digests = {}
+        compression_policy = self.global_object_compression_policy
+        accept_encoding = (
+            None if compression_policy is None else compression_policy.accept_encoding
+        )
+        while True:
+            if bytes_written:
+                headers = {"Range": f"bytes={bytes_written}-"}
             else:
-                raise Exception(
-                    f"unable to download file - not able to get file name. headers: {headers}",
+                # a compressed response cannot be resumed, ranges stay uncompressed.
+                headers = accept_encoding and {"Accept-Encoding": accept_encoding}
+            try:
+                with self._track_request(endpoint, "GET", progress) as tracker:
+                    response = self._send(
+                        endpoint,
+                        lambda url_base, timeout: make_request(
+                            method="GET",
+                            url=url_base,
+                            endpoint=endpoint,
+                            session=self.global_object_session,
+                            params=payload,
+                            headers=headers,
+                            stream=True,
+                            timeout=timeout,
+                            return_type="response",
+                        ),
+                    )
+                    try:
+                        if file_name is None:
+                            file_name = _get_file_name_from_response(response)
+                            part_file_path = _get_part_file_path(
+                                output_folder_path, file_name, file_storage_token
+                            )
+                            resumable = _is_resumable(response)
+                            expected_size = _get_identity_content_length(response)
+                            expected_digests = get_expected_digests(response.headers)
+                            if progress is not None:
+                                progress.set_total(expected_size)
+                            if resumable and os.path.exists(part_file_path):
+                                existing_size = os.path.getsize(part_file_path)
+                                if 0 < existing_size < expected_size:
+                                    # left over by an earlier call, ask for the rest only.
+                                    bytes_written = existing_size
+                                    continue
+                            bytes_written = 0
+                        elif response.status_code == 206:
+                            if not _is_matching_content_range(
+                                response, bytes_written, expected_size
+                            ):
+                                raise _ResumeMismatchError(
+                                    f"unexpected Content-Range "
+                                    f"{response.headers.get('Content-Range')} "
+                                    f"for a download resumed at byte {bytes_written}."
+                                )
+                        else:
+                            # the range was ignored, the full body follows.
+                            bytes_written = 0
+
+                        if (
+                            progress is not None
+                            and progress.bytes_done != bytes_written
+                        ):
+                            progress.set_done(bytes_written)
+                        if digests is not None and bytes_hashed != bytes_written:
+                            digests.reset()
+                            digests.update_from_file(part_file_path, bytes_written)
+                            bytes_hashed = bytes_written
+                        with open(
+                            part_file_path, "r+b" if bytes_written else "wb"
+                        ) as file:
+                            file.seek(bytes_written)
+                            file.truncate()
+                            for chunk in response.iter_content(chunk_size=chunk_size):
+                                if chunk:
+                                    tracker.write(chunk, file.write, chunk)
+                                    bytes_written += len(chunk)
+                                    if digests is not None:
+                                        digests.update(chunk)
+                                        bytes_hashed += len(chunk)
+                        if expected_size is not None and bytes_written != expected_size:
+                            raise requests.exceptions.ChunkedEncodingError(
+                                f"download ended after {bytes_written} of "
+                                f"{expected_size} bytes."
+                            )
+                        if compression_policy is not None:
+                            compression_policy.record_download(
+                                response.headers.get("Content-Encoding"),
+                                response.raw.tell(),
+                                bytes_written,
+                            )
+                    finally:
+                        response.close()
+                break
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+                _ResumeMismatchError,
+            ) as e:
+                if not resumable or resume_attempts >= max_resume_attempts:
+                    _discard_part_file(part_file_path, resumable)
+                    raise
+                resume_attempts += 1
+                if isinstance(e, _ResumeMismatchError):
+                    bytes_written = 0
+            except BaseException:
+                _discard_part_file(part_file_path, resumable)
+                raise
+        if digests is not None:
+            try:
+                digests.verify(expected_digests)
+            except DigestMismatchError:
+                os.remove(part_file_path)
+                raise
+        return file_name, part_file_path, bytes_written
+
+    def _download_ranges_to_part_file(
+        self,
+        file_storage_token: str,
+        output_folder_path: str,
+        chunk_size: int,
+        connection_count: int,
+        max_resume_attempts: int,
+        progress: TransferProgress | None = None,
+        digests: Digests | None = None,
+    ) -> Tuple[str, str, int] | None:
+        """
+        probes the file with a one byte range request and, when ranges are supported,
+        downloads connection_count byte ranges at once, each written straight to its
+        offset of a preallocated .part file. the ranges arrive out of order, digests
+        are computed from the complete .part file.
+        :return: same as _download_to_temporary_file, None when the server does not
+            support range requests.
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer.")
+        endpoint = "download_file/v0"
+        payload = {
+            "file_storage_token": file_storage_token,
+        }
+
+        def request_range(start: int, end: int):
+            return self._send(
+                endpoint,
+                lambda url_base, timeout: make_request(
+                    method="GET",
+                    url=url_base,
+                    endpoint=endpoint,
+                    session=self.global_object_session,
+                    params=payload,
+                    headers={"Range": f"bytes={start}-{end}"},
+                    stream=True,
+                    timeout=timeout,
+                    return_type="response",
+                ),
+            )
+
+        try:
+            with self._track_request(endpoint, "GET"):
+                response = request_range(0, 0)
+                response.close()
+        except requests.HTTPError as e:
+            # empty files cannot satisfy a range request.
+            if e.response is not None and e.response.status_code == 416:
+                return None
+            raise
+        match = re.fullmatch(
+            r"bytes 0-0/(\d+)", response.headers.get("Content-Range", "")
+        )
+        if response.status_code != 206 or match is None:
+            return None
+        file_name = _get_file_name_from_response(response)
+        file_size = int(match.group(1))
+        if progress is not None:
+            progress.set_total(file_size)
+
+        os.makedirs(output_folder_path, exist_ok=True)
+        part_file_path = _get_part_file_path(
+            output_folder_path, file_name, file_storage_token
+        )
+        range_size = max(chunk_size, -(-file_size // connection_count))
+        ranges = [
+            (start, min(start + range_size, file_size) - 1)
+            for start in range(0, file_size, range_size)
+        ]
+
+        file_descriptor = os.open(part_file_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC)
+        try:
+            if file_size:
+                if hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(file_descriptor, 0, file_size)
+                else:
+                    os.ftruncate(file_descriptor, file_size)
+
+            def download_range(byte_range: Tuple[int, int]):
+                position, end = byte_range
+                resume_attempts = 0
+                while True:
+                    try:
+                        with self._track_request(endpoint, "GET", progress) as tracker:
+                            range_response = request_range(position, end)
+                            try:
+                                if range_response.status_code != 206 or not (
+                                    _is_matching_content_range(
+                                        range_response, position, end + 1, file_size
+                                    )
+                                ):
+                                    raise _ResumeMismatchError(
+                                        f"unexpected response for range {position}-{end}."
+                                    )
+                                for chunk in range_response.iter_content(
+                                    chunk_size=chunk_size
+                                ):
+                                    if chunk:
+                                        tracker.write(
+                                            chunk,
+                                            _write_at,
+                                            file_descriptor,
+                                            chunk,
+                                            position,
+                                        )
+                                        position += len(chunk)
+                                if position != end + 1:
+                                    raise requests.exceptions.ChunkedEncodingError(
+                                        f"range ended at byte {position} "
+                                        f"instead of {end + 1}."
+                                    )
+                            finally:
+                                range_response.close()
+                        return
+                    except (
+                        requests.exceptions.ConnectionError,
+                        requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.Timeout,
+                    ):
+                        if resume_attempts >= max_resume_attempts:
+                            raise
+                        resume_attempts += 1
+
+            for _, error in run_in_parallel(download_range, ranges, connection_count):
+                if error is not None:
+                    raise error
+        except BaseException:
+            os.close(file_descriptor)
+            os.remove(part_file_path)
+            raise
+        os.close(file_descriptor)
+        if digests is not None:
+            digests.reset()
+            digests.update_from_file(part_file_path)
+            try:
+                digests.verify(get_expected_digests(response.headers))
+            except DigestMismatchError:
+                os.remove(part_file_path)
+                raise
+        return file_name, part_file_path, file_size
+
+    def _fetch_to_part_file(
+        self,
+        file_storage_token: str,
+        output_folder_path: str,
+        chunk_size: int,
+        max_resume_attempts: int,
+        connection_count: int = 1,
+        progress: TransferProgress | None = None,
+        digests: Digests | None = None,
+    ) -> Tuple[str, str, int, bool]:
+        """
+        fills the .part file from the download cache when possible, from the network
+        otherwise (storing the result in the cache).
+        :param digests: fed the file content, read back from cache hits.
+        :return: (file name, .part file path, file size, served from cache)
+        """
+        if connection_count <= 0:
+            raise ValueError("connection_count must be a positive integer.")
+        download_cache = self.global_object_download_cache
+        if download_cache is not None:
+            cached = download_cache.get(file_storage_token)
+            if cached is not None:
+                os.makedirs(output_folder_path, exist_ok=True)
+                part_file_path = _get_part_file_path(
+                    output_folder_path, cached[0], file_storage_token
+                )
+                file_name = download_cache.copy_to(file_storage_token, part_file_path)
+                if file_name is not None:
+                    _report_complete(progress, part_file_path)
+                    if digests is not None:
+                        digests.update_from_file(part_file_path)
+                    return (
+                        file_name,
+                        part_file_path,
+                        os.path.getsize(part_file_path),
+                        True,
+                    )
+
+        download_output = None
+        if connection_count > 1:
+            download_output = self._download_ranges_to_part_file(
+                file_storage_token,
+                output_folder_path,
+                chunk_size,
+                connection_count,
+                max_resume_attempts,
+                progress,
+                digests,
+            )
+        if download_output is None:
+            download_output = self._download_to_temporary_file(
+                file_storage_token,
+                output_folder_path,
+                chunk_size,
+                max_resume_attempts,
+                progress,
+                digests,
+            )
+        file_name, part_file_path, file_size = download_output
+        if download_cache is not None:
+            try:
+                download_cache.put(
+                    file_storage_token,
+                    file_name,
+                    part_file_path,
+                    digests and digests.hexdigests().get("sha256"),
                 )
+            except BaseException:
+                os.remove(part_file_path)
+                raise
+        return file_name, part_file_path, file_size, False
+
+    def download_file_using_stream_v0(
+        self,
+        file_storage_token: str,
+        output_folder_path: str,
+        chunk_size: int = DEFAULT_DOWNLOAD_CHUNK_SIZE,
+        max_resume_attempts: int = DEFAULT_MAX_RESUME_ATTEMPTS,
+        connection_count: int = 1,
+        progress_callback: ProgressCallback | None = None,
+        digest_algorithms: Sequence[str] | None = None,
+    ) -> DownloadFileV0Output:
+        """
+        streams the file to disk chunk_size bytes at a time, so memory use does not
+        depend on the file size. the body is written to a .part file in
+        output_folder_path which is atomically renamed once the download is complete.
+        :param file_storage_token:
+        :param output_folder_path:
+        :param chunk_size: number of bytes read from the socket and written per chunk.
+        :param max_resume_attempts: number of times an interrupted transfer is resumed
+            with a range request, only used when the server advertises Accept-Ranges.
+        :param connection_count: when > 1 and the server supports range requests, the
+            file is split into that many byte ranges fetched over parallel connections
+            (keep it <= param_int_max_connections_per_host), otherwise a single stream
+            is used.
+        :param progress_callback: called with (bytes written, total bytes or None)
+            after every chunk written to disk.
+        :param digest_algorithms: see download_file_v0, a mismatching .part file is
+            removed instead of renamed.
+        :return: DownloadFileV0Output
+        :raises DigestMismatchError:
+        """
+        from square_file_store_helper.pydantic_models import DownloadFileV0Output
 
+        try:
+            digests = None if digest_algorithms is None else Digests(digest_algorithms)
+            file_name, temp_file_path, bytes_written, from_cache = (
+                self._fetch_to_part_file(
+                    file_storage_token,
+                    output_folder_path,
+                    chunk_size,
+                    max_resume_attempts,
+                    connection_count,
+                    progress_callback and TransferProgress(progress_callback),
+                    digests,
+                )
+            )
             downloaded_file_path = output_folder_path + os.sep + file_name
-            with open(downloaded_file_path, "wb") as file:
-                file.write(response.content)
+            try:
+                os.replace(temp_file_path, downloaded_file_path)
+            except BaseException:
+                os.remove(temp_file_path)
+                raise
 
-            return downloaded_file_path
+            return DownloadFileV0Output(
+                file_path=downloaded_file_path,
+                file_name=file_name,
+                bytes_written=bytes_written,
+                from_cache=from_cache,
+                digests={} if digests is None else digests.hexdigests(),
+            )
+        except Exception:
+            raise
 
+    def _iter_download(
+        self,
+        file_storage_token: str,
+        chunk_size: int,
+        max_resume_attempts: int = DEFAULT_MAX_RESUME_ATTEMPTS,
+        progress: TransferProgress | None = None,
+    ) -> Iterator[Any]:
+        """
+        generator yielding (file name, content length or None, served from cache,
+        expected digests) once the response headers are in, then the body in chunks
+        of at most chunk_size bytes, from the download cache when it holds the token. when the server advertises
+        "Accept-Ranges: bytes", an interrupted transfer is resumed with a
+        "Range: bytes=N-" request (up to max_resume_attempts times).
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer.")
+        download_cache = self.global_object_download_cache
+        cached = (
+            None if download_cache is None else download_cache.get(file_storage_token)
+        )
+        if cached is not None:
+            try:
+                file = open(cached[1], "rb")
+            except FileNotFoundError:
+                # evicted in between, downloaded below.
+                pass
+            else:
+                with file:
+                    size = os.fstat(file.fileno()).st_size
+                    if progress is not None:
+                        progress.set_total(size)
+                    yield cached[0], size, True, {}
+                    while chunk := file.read(chunk_size):
+                        yield chunk
+                        if progress is not None:
+                            progress.advance(len(chunk))
+                return
+
+        endpoint = "download_file/v0"
+        payload = {
+            "file_storage_token": file_storage_token,
+        }
+        compression_policy = self.global_object_compression_policy
+        accept_encoding = (
+            None if compression_policy is None else compression_policy.accept_encoding
+        )
+        headers = accept_encoding and {"Accept-Encoding": accept_encoding}
+        file_name = None
+        expected_size = None
+        resumable = False
+        resume_attempts = 0
+        bytes_yielded = 0
+        while True:
+            try:
+                with self._track_request(endpoint, "GET", progress) as tracker:
+                    response = self._send(
+                        endpoint,
+                        lambda url_base, timeout: make_request(
+                            method="GET",
+                            url=url_base,
+                            endpoint=endpoint,
+                            session=self.global_object_session,
+                            params=payload,
+                            headers=headers,
+                            stream=True,
+                            timeout=timeout,
+                            return_type="response",
+                        ),
+                    )
+                    try:
+                        if file_name is None:
+                            file_name = _get_file_name_from_response(response)
+                            resumable = _is_resumable(response)
+                            expected_size = _get_identity_content_length(response)
+                            if progress is not None:
+                                progress.set_total(expected_size)
+                            with tracker.suspended():
+                                yield (
+                                    file_name,
+                                    expected_size,
+                                    False,
+                                    get_expected_digests(response.headers),
+                                )
+                        elif response.status_code != 206 or not (
+                            _is_matching_content_range(
+                                response, bytes_yielded, expected_size
+                            )
+                        ):
+                            # the chunks handed out cannot be taken back, only the
+                            # exact rest of the body will do.
+                            raise _ResumeMismatchError(
+                                f"unexpected response {response.status_code} "
+                                f"{response.headers.get('Content-Range')} "
+                                f"for a download resumed at byte {bytes_yielded}."
+                            )
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            if chunk:
+                                started_at = time.perf_counter()
+                                with tracker.suspended():
+                                    yield chunk
+                                bytes_yielded += len(chunk)
+                                tracker.received(
+                                    len(chunk), time.perf_counter() - started_at
+                                )
+                        if expected_size is not None and bytes_yielded != expected_size:
+                            raise requests.exceptions.ChunkedEncodingError(
+                                f"download ended after {bytes_yielded} of "
+                                f"{expected_size} bytes."
+                            )
+                        if compression_policy is not None:
+                            compression_policy.record_download(
+                                response.headers.get("Content-Encoding"),
+                                response.raw.tell(),
+                                bytes_yielded,
+                            )
+                    finally:
+                        response.close()
+                return
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+            ):
+                if not resumable or resume_attempts >= max_resume_attempts:
+                    raise
+                resume_attempts += 1
+                headers = {"Range": f"bytes={bytes_yielded}-"}
+
+    def open_download_stream_v0(
+        self,
+        file_storage_token: str,
+        chunk_size: int = DEFAULT_DOWNLOAD_CHUNK_SIZE,
+        max_resume_attempts: int = DEFAULT_MAX_RESUME_ATTEMPTS,
+        progress_callback: ProgressCallback | None = None,
+    ) -> DownloadStream:
+        """
+        sends the download request and returns once the response headers are in,
+        the body is then read as the returned stream is iterated, nothing is written
+        to disk.
+        :param file_storage_token:
+        :param chunk_size: maximum size of the yielded chunks.
+        :param max_resume_attempts: number of times an interrupted transfer is resumed
+            with a range request, only used when the server advertises Accept-Ranges.
+        :param progress_callback: called with (bytes handed out, total bytes or None)
+            after every chunk.
+        :return: DownloadStream with the file name from Content-Disposition, close it
+            (or use it as a context manager) when not reading the body to the end.
+        """
+        try:
+            chunks = self._iter_download(
+                file_storage_token,
+                chunk_size,
+                max_resume_attempts,
+                progress_callback and TransferProgress(progress_callback),
+            )
+            file_name, content_length, from_cache, expected_digests = next(chunks)
+            return DownloadStream(
+                file_name, content_length, chunks, from_cache, expected_digests
+            )
+        except Exception:
+            raise
+
+    def download_file_to_sink_v0(
+        self,
+        file_storage_token: str,
+        sink: Any,
+        chunk_size: int = DEFAULT_DOWNLOAD_CHUNK_SIZE,
+        max_resume_attempts: int = DEFAULT_MAX_RESUME_ATTEMPTS,
+        progress_callback: ProgressCallback | None = None,
+        digest_algorithms: Sequence[str] | None = None,
+    ) -> DownloadToSinkV0Output:
+        """
+        streams the file into sink chunk_size bytes at a time, nothing is written to
+        disk.
+        :param file_storage_token:
+        :param sink: a bytearray the body is appended to, anything with a write method
+            (file, subprocess stdin, io.BytesIO, ...) or another writable buffer
+            (memoryview, mmap, ...) filled from its start.
+        :param chunk_size:
+        :param max_resume_attempts: see open_download_stream_v0.
+        :param progress_callback: called with (bytes written, total bytes or None)
+            after every chunk written to sink.
+        :param digest_algorithms: see download_file_v0, on a mismatch the bytes are
+            already in sink, it is up to the caller to drop them.
+        :return: DownloadToSinkV0Output with the file name from Content-Disposition.
+        :raises ValueError: when a fixed size buffer is too small for the body.
+        :raises DigestMismatchError:
+        """
+        from square_file_store_helper.pydantic_models import DownloadToSinkV0Output
+
+        try:
+            write = get_sink_writer(sink)
+            digests = None if digest_algorithms is None else Digests(digest_algorithms)
+            bytes_written = 0
+            with self.open_download_stream_v0(
+                file_storage_token, chunk_size, max_resume_attempts, progress_callback
+            ) as stream:
+                for chunk in stream:
+                    write(chunk)
+                    bytes_written += len(chunk)
+                    if digests is not None:
+                        digests.update(chunk)
+            if digests is not None:
+                digests.verify(stream.expected_digests)
+            return DownloadToSinkV0Output(
+                file_name=stream.file_name,
+                bytes_written=bytes_written,
+                from_cache=stream.from_cache,
+                digests={} if digests is None else digests.hexdigests(),
+            )
         except Exception:
             raise
 
+    def download_files_in_bulk_v0(
+        self,
+        list_file_storage_token: List[str],
+        output_folder_path: str,
+        max_workers: int = 8,
+        on_collision: Literal["suffix", "subdirectory", "fail"] = "suffix",
+        chunk_size: int = DEFAULT_DOWNLOAD_CHUNK_SIZE,
+        max_resume_attempts: int = DEFAULT_MAX_RESUME_ATTEMPTS,
+        digest_algorithms: Sequence[str] | None = None,
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
+    ) -> BulkDownloadFileV0Output:
+        """
+        streams many files to disk concurrently. files are first written to .part
+        files, final names are then assigned in input order, so the outcome of a name
+        collision does not depend on which download finishes first. existing files in
+        output_folder_path are never overwritten.
+        :param list_file_storage_token: duplicate tokens are downloaded once.
+        :param output_folder_path:
+        :param max_workers: number of concurrent downloads.
+        :param on_collision: when the server provided name is already taken,
+            "suffix" saves to "name (1).ext", "name (2).ext", ...,
+            "subdirectory" saves to output_folder_path/<file_storage_token>/name and
+            "fail" reports a FileExistsError for that token.
+        :param chunk_size:
+        :param max_resume_attempts:
+        :param digest_algorithms: see download_file_v0, a mismatch is reported as a
+            DigestMismatchError for that token.
+        :param concurrency_limiter: adapt the number of concurrent downloads, up to
+            max_workers, to the latency and errors of the store.
+        :return: BulkDownloadFileV0Output with token -> path, token -> error and
+            token -> digests mappings.
+        """
+        from square_file_store_helper.pydantic_models import BulkDownloadFileV0Output
+
+        try:
+            if on_collision not in ("suffix", "subdirectory", "fail"):
+                raise ValueError(f"invalid on_collision: {on_collision}.")
+            if digest_algorithms is not None:
+                # invalid algorithms fail the call rather than every token.
+                Digests(digest_algorithms)
+            list_file_storage_token = list(dict.fromkeys(list_file_storage_token))
+
+            def fetch(token: str):
+                digests = (
+                    None if digest_algorithms is None else Digests(digest_algorithms)
+                )
+                return (
+                    self._fetch_to_part_file(
+                        token,
+                        output_folder_path,
+                        chunk_size,
+                        max_resume_attempts,
+                        digests=digests,
+                    ),
+                    digests,
+                )
+
+            with rate_limit_priority(PRIORITY_BULK):
+                outcomes = run_in_parallel(
+                    fetch, list_file_storage_token, max_workers, concurrency_limiter
+                )
+
+            file_paths = {}
+            errors = {}
+            all_digests = {}
+            claimed_file_paths = set()
+            for token, (outcome, error) in zip(list_file_storage_token, outcomes):
+                if error is not None:
+                    errors[token] = error
+                    continue
+                (file_name, temp_file_path, _, _), digests = outcome
+                try:
+                    downloaded_file_path = output_folder_path + os.sep + file_name
+                    if downloaded_file_path in claimed_file_paths or os.path.exists(
+                        downloaded_file_path
+                    ):
+                        if on_collision == "fail":
+                            raise FileExistsError(
+                                f"{downloaded_file_path} already exists."
+                            )
+                        elif on_collision == "subdirectory":
+                            os.makedirs(
+                                output_folder_path + os.sep + token, exist_ok=True
+                            )
+                            downloaded_file_path = (
+                                output_folder_path + os.sep + token + os.sep + file_name
+                            )
+                            if os.path.exists(downloaded_file_path):
+                                raise FileExistsError(
+                                    f"{downloaded_file_path} already exists."
+                                )
+                        else:
+                            stem, extension = os.path.splitext(file_name)
+                            suffix_number = 1
+                            while (
+                                downloaded_file_path in claimed_file_paths
+                                or os.path.exists(downloaded_file_path)
+                            ):
+                                downloaded_file_path = (
+                                    output_folder_path
+                                    + os.sep
+                                    + f"{stem} ({suffix_number}){extension}"
+                                )
+                                suffix_number += 1
+                    os.replace(temp_file_path, downloaded_file_path)
+                except Exception as e:
+                    os.remove(temp_file_path)
+                    errors[token] = e
+                    continue
+                claimed_file_paths.add(downloaded_file_path)
+                file_paths[token] = downloaded_file_path
+                if digests is not None:
+                    all_digests[token] = digests.hexdigests()
+
+            return BulkDownloadFileV0Output(
+                file_paths=file_paths, errors=errors, digests=all_digests
+            )
+        except Exception:
+            raise
+
+    @overload
+    def delete_file_v0(
+        self,
+        list_file_storage_token: list,
+        response_as_pydantic: bool = False,
+        max_batch_size: int = DEFAULT_DELETE_MAX_BATCH_SIZE,
+        max_url_length: int = DEFAULT_DELETE_MAX_URL_LENGTH,
+        max_workers: int = 4,
+        *,
+        response_as_result: Literal[True],
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
+    ) -> StandardResult[DeleteFilesV0Result]: ...
+
     @overload
     def delete_file_v0(
         self,
         list_file_storage_token: list,
         response_as_pydantic: Literal[True] = ...,
+        max_batch_size: int = DEFAULT_DELETE_MAX_BATCH_SIZE,
+        max_url_length: int = DEFAULT_DELETE_MAX_URL_LENGTH,
+        max_workers: int = 4,
+        response_as_result: Literal[False] = ...,
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
     ) -> StandardResponse[DeleteFilesV0Response]: ...
 
     @overload
@@ -185,33 +1735,136 @@ class SquareFileStoreHelper:
         self,
         list_file_storage_token: list,
         response_as_pydantic: Literal[False] = ...,
+        max_batch_size: int = DEFAULT_DELETE_MAX_BATCH_SIZE,
+        max_url_length: int = DEFAULT_DELETE_MAX_URL_LENGTH,
+        max_workers: int = 4,
+        response_as_result: Literal[False] = ...,
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
     ) -> Dict[str, Any]: ...
 
     def delete_file_v0(
         self,
         list_file_storage_token: list,
         response_as_pydantic: bool = False,
+        max_batch_size: int = DEFAULT_DELETE_MAX_BATCH_SIZE,
+        max_url_length: int = DEFAULT_DELETE_MAX_URL_LENGTH,
+        max_workers: int = 4,
+        response_as_result: bool = False,
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
     ) -> Any:
         """
+        tokens are split into batches of at most max_batch_size tokens whose request url
+        stays within max_url_length characters. a list that fits in one batch is sent
+        as a single request exactly as before. otherwise batches are sent concurrently,
+        their data.main lists are merged in order and the tokens of failed batches are
+        returned in data.failed_file_storage_tokens (with the errors in log) instead of
+        raising.
         :param response_as_pydantic:
         :param list_file_storage_token:
+        :param max_batch_size: maximum number of tokens per request.
+        :param max_url_length: maximum length of a request url.
+        :param max_workers: number of batches sent concurrently.
+        :param response_as_result: return a StandardResult decoded without pydantic,
+            cheaper than response_as_pydantic, which it takes precedence over.
+        :param concurrency_limiter: adapt the number of batches sent concurrently,
+            up to max_workers, to the latency and errors of the store.
         :return: filepath
         """
         try:
             endpoint = "delete_files/v0"
-            params = {
-                "file_storage_tokens": list_file_storage_token,
-            }
-            response = make_request(
-                method="DELETE",
-                url=self.global_str_square_file_store_url_base,
-                endpoint=endpoint,
-                params=params,
-                return_type="json",
+            batches = self._split_into_delete_batches(
+                list_file_storage_token, endpoint, max_batch_size, max_url_length
             )
-            if response_as_pydantic:
-                return StandardResponse[DeleteFilesV0Response](**response)
+
+            def delete_batch(batch):
+                params = {
+                    "file_storage_tokens": batch,
+                }
+                with self._track_request(endpoint, "DELETE"):
+                    return self._send(
+                        endpoint,
+                        lambda url_base, timeout: make_request(
+                            method="DELETE",
+                            url=url_base,
+                            endpoint=endpoint,
+                            session=self.global_object_session,
+                            params=params,
+                            timeout=timeout,
+                            return_type="json",
+                        ),
+                    )
+
+            if len(batches) <= 1:
+                response = delete_batch(list_file_storage_token)
+            else:
+                response = {
+                    "data": {"main": [], "failed_file_storage_tokens": []},
+                    "message": None,
+                    "log": [],
+                }
+                for batch, (batch_response, error) in zip(
+                    batches,
+                    run_in_parallel(
+                        delete_batch, batches, max_workers, concurrency_limiter
+                    ),
+                ):
+                    if error is not None:
+                        response["data"]["failed_file_storage_tokens"].extend(batch)
+                        response["log"].append(
+                            {"file_storage_tokens": batch, "error": repr(error)}
+                        )
+                        continue
+                    response["data"]["main"].extend(batch_response["data"]["main"])
+                    if response["message"] is None:
+                        response["message"] = batch_response.get("message")
+            # entries of tokens that failed to delete stay valid.
+            deleted_tokens = (response.get("data") or {}).get("main") or []
+            if self.global_object_download_cache is not None:
+                self.global_object_download_cache.invalidate(deleted_tokens)
+            if self.global_object_upload_deduplication_index is not None:
+                self.global_object_upload_deduplication_index.invalidate(deleted_tokens)
+            if response_as_result:
+                return decode_delete_files_v0_response(
+                    response, self.global_bool_trust_responses
+                )
+            elif response_as_pydantic:
+                from square_file_store_helper.pydantic_models import (
+                    DeleteFilesV0Response,
+                )
+
+                return get_standard_response_model(DeleteFilesV0Response)(**response)
             else:
                 return response
         except Exception:
             raise
+
+    def _split_into_delete_batches(
+        self,
+        list_file_storage_token: list,
+        endpoint: str,
+        max_batch_size: int,
+        max_url_length: int,
+    ) -> List[list]:
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be a positive integer.")
+        base_url_length = len(
+            f"{self.global_str_square_file_store_url_base}/{endpoint}"
+        )
+        batches = []
+        batch = []
+        url_length = base_url_length
+        for token in list_file_storage_token:
+            # "?" or "&" + "file_storage_tokens=" + url encoded token.
+            parameter_length = 21 + len(urllib.parse.quote_plus(str(token)))
+            if batch and (
+                len(batch) >= max_batch_size
+                or url_length + parameter_length > max_url_length
+            ):
+                batches.append(batch)
+                batch = []
+                url_length = base_url_length
+            batch.append(token)
+            url_length += parameter_length
+        if batch:
+            batches.append(batch)
+        return batches
@@ -0,0 +1,195 @@
+import asyncio
+import io
+import os
+import stat
+import uuid
+from typing import IO, Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional
+
+DEFAULT_UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\r\n", " ")
+
+
+def is_regular_file(file: Any) -> bool:
+    """
+    :return: True when file is an open file object backed by a regular file on disk,
+        the only kind os.sendfile can read from.
+    """
+    if not isinstance(file, io.IOBase):
+        return False
+    try:
+        return stat.S_ISREG(os.fstat(file.fileno()).st_mode)
+    except (OSError, ValueError):
+        return False
+
+
+def get_remaining_size(file: IO | Iterable[bytes]) -> Optional[int]:
+    """
+    :return: bytes between the current position and the end of a regular or in
+        memory seekable file, None for anything else.
+    """
+    try:
+        return os.fstat(file.fileno()).st_size - file.tell()
+    except (AttributeError, OSError, ValueError):
+        try:
+            if not file.seekable():
+                return None
+            position = file.tell()
+            remaining = file.seek(0, os.SEEK_END) - position
+            file.seek(position)
+            return remaining
+        except (AttributeError, OSError, ValueError):
+            return None
+
+
+class FileRegion:
+    """
+    count bytes of a regular file starting at offset, yielded in place of the file
+    content by a zero copy MultipartEncoder.
+
+    connections of http_utils send it with socket.sendfile, so the kernel copies the
+    bytes from the page cache to the socket without them ever becoming python
+    objects. any other sender sees a file like object and reads it in blocks.
+    """
+
+    def __init__(self, file: IO, offset: int, count: int):
+        self.file = file
+        self.offset = offset
+        self.count = count
+        self._position = offset
+
+    def __len__(self) -> int:
+        return self.count
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self.offset + self.count - self._position
+        if size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return b""
+        self.file.seek(self._position)
+        data = self.file.read(size)
+        self._position += len(data)
+        return data
+
+
+class MultipartEncoder:
+    """
+    builds a multipart/form-data body made of plain form fields followed by a single
+    file part, without ever holding the file content in memory.
+
+    file is a binary file object (read in chunk_size pieces, pipes and sockets
+    included) or an iterable of bytes such as a generator. the encoder is itself an
+    iterable of bytes with a len attribute, so it can be passed as data to requests,
+    which then sends a Content-Length body when the size is known and a chunked one
+    otherwise. the body can only be produced once.
+
+    with zero_copy and a regular file, the file part is yielded as a single
+    FileRegion instead of chunks read into memory. otherwise on_file_chunk, when
+    given, is called with every chunk of the file as it is produced (e.g. to hash
+    it on the way).
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, Any],
+        file_field_name: str,
+        file_name: str,
+        file: IO | Iterable[bytes],
+        content_type: str,
+        chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE,
+        zero_copy: bool = False,
+        on_file_chunk: Callable[[bytes], Any] | None = None,
+    ):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer.")
+        self.boundary = uuid.uuid4().hex
+        self.file = file
+        self.chunk_size = chunk_size
+        self.zero_copy = zero_copy and is_regular_file(file)
+        self.on_file_chunk = on_file_chunk
+        preamble = []
+        for name, value in fields.items():
+            # requests drops None valued form fields, keep the same wire format.
+            if value is None:
+                continue
+            preamble.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+        preamble.append(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_quote(file_field_name)}"; '
+            f'filename="{_quote(file_name)}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        )
+        self.preamble = "".join(preamble).encode()
+        self.epilogue = f"\r\n--{self.boundary}--\r\n".encode()
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def get_content_length(self) -> Optional[int]:
+        """
+        :return: body size when the file is a regular or in memory seekable file,
+            else None.
+        """
+        remaining = get_remaining_size(self.file)
+        if remaining is None:
+            return None
+        return len(self.preamble) + remaining + len(self.epilogue)
+
+    @property
+    def len(self) -> Optional[int]:
+        # read by requests to decide between Content-Length and chunked encoding.
+        return self.get_content_length()
+
+    def _read_file(self) -> Iterator[bytes]:
+        if hasattr(self.file, "read"):
+            while chunk := self.file.read(self.chunk_size):
+                yield chunk
+        else:
+            for chunk in self.file:
+                if chunk:
+                    yield bytes(chunk)
+
+    def _iter_file(self) -> Iterator[bytes]:
+        if self.on_file_chunk is None:
+            yield from self._read_file()
+            return
+        for chunk in self._read_file():
+            self.on_file_chunk(chunk)
+            yield chunk
+
+    def iter_body(self) -> Iterator[bytes | FileRegion]:
+        """
+        yields the body, at most chunk_size bytes of the file at a time or a single
+        FileRegion with zero_copy.
+        """
+        yield self.preamble
+        if self.zero_copy:
+            offset = self.file.tell()
+            count = os.fstat(self.file.fileno()).st_size - offset
+            if count > 0:
+                yield FileRegion(self.file, offset, count)
+        else:
+            yield from self._iter_file()
+        yield self.epilogue
+
+    def __iter__(self) -> Iterator[bytes | FileRegion]:
+        return self.iter_body()
+
+    async def aiter_body(self) -> AsyncIterator[bytes]:
+        """
+        yields the body, reading the file in a worker thread so the event loop is
+        never blocked on disk i/o.
+        """
+        yield self.preamble
+        chunks = self._iter_file()
+        while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            yield chunk
+        yield self.epilogue
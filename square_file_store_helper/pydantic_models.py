@@ -1,11 +1,186 @@
-from typing import List
+from typing import Any, Dict, List, Tuple
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class UploadFileV0Response(BaseModel):
     main: str
+    # added by the helper when digest_algorithms are given: algorithm -> hex digest.
+    digests: Dict[str, str] | None = None
 
 
 class DeleteFilesV0Response(BaseModel):
     main: List[str]
+    failed_file_storage_tokens: List[str] = []
+
+
+class DownloadFileV0Output(BaseModel):
+    file_path: str
+    file_name: str
+    bytes_written: int
+    from_cache: bool = False
+    digests: Dict[str, str] = {}
+
+
+class DownloadToSinkV0Output(BaseModel):
+    file_name: str
+    bytes_written: int
+    from_cache: bool = False
+    digests: Dict[str, str] = {}
+
+
+class BulkUploadFileV0Input(BaseModel):
+    """
+    one entry of upload_files_in_bulk_v0, app_id and system_relative_path override the
+    shared values only when explicitly set.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    file: str | Tuple[str, Any, str]
+    app_id: int | None = None
+    system_relative_path: str = "others/misc"
+
+
+class BulkUploadFileV0Output(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: int
+    response: Any = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BulkDownloadFileV0Output(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    file_paths: Dict[str, str]
+    errors: Dict[str, Exception]
+    # token -> algorithm -> hex digest, with digest_algorithms.
+    digests: Dict[str, Dict[str, str]] = {}
+
+
+class UploadDeduplicationStats(BaseModel):
+    hits: int
+    misses: int
+    bytes_saved: int
+    hit_ratio: float
+
+
+class RequestTimings(BaseModel):
+    """
+    timing event of one http request, durations are in seconds and None when the
+    request failed before reaching that phase.
+    """
+
+    endpoint: str
+    method: str
+    status_code: int | None = None
+    error: str | None = None
+    connection_reused: bool = True
+    connect_seconds: float = 0.0
+    send_seconds: float | None = None
+    time_to_first_byte_seconds: float | None = None
+    transfer_seconds: float | None = None
+    disk_write_seconds: float = 0.0
+    total_seconds: float
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+
+class LatencyHistogram(BaseModel):
+    """
+    bucket_counts[i] counts the observations <= bucket_upper_bounds[i], the last
+    bucket is unbounded.
+    """
+
+    bucket_upper_bounds: List[float]
+    bucket_counts: List[int]
+    count: int
+    sum: float
+
+
+class EndpointMetrics(BaseModel):
+    request_count: int
+    error_count: int
+    bytes_sent: int
+    bytes_received: int
+    connect_seconds_sum: float
+    disk_write_seconds_sum: float
+    latency_histogram: LatencyHistogram
+    time_to_first_byte_histogram: LatencyHistogram
+
+
+class EndpointNodeStats(BaseModel):
+    url_base: str
+    weight: float
+    outstanding_requests: int
+    total_requests: int
+    total_failures: int
+    consecutive_failures: int
+    ejected: bool
+    ejection_count: int
+
+
+class CompressionStats(BaseModel):
+    """
+    compression ratios are uncompressed bytes / bytes on the wire, 0.0 until a
+    compressed transfer happened.
+    """
+
+    uploads_compressed: int
+    uploads_skipped: int
+    upload_bytes_uncompressed: int
+    upload_bytes_sent: int
+    upload_compression_ratio: float
+    downloads_compressed: int
+    downloads_uncompressed: int
+    download_bytes_received: int
+    download_bytes_decoded: int
+    download_compression_ratio: float
+
+
+class ConcurrencyLimitDecision(BaseModel):
+    """
+    one change of the limit of an AdaptiveConcurrencyLimiter, at is a clock value.
+    """
+
+    at: float
+    reason: str
+    previous_limit: int
+    limit: int
+    window_latency_seconds: float
+    baseline_latency_seconds: float
+    window_error_rate: float
+
+
+class ConcurrencyLimiterStats(BaseModel):
+    limit: int
+    in_flight: int
+    min_limit: int
+    max_limit: int
+    slow_start: bool
+    baseline_latency_seconds: float | None
+    last_window_latency_seconds: float | None
+    operation_count: int
+    error_count: int
+    decisions: List[ConcurrencyLimitDecision]
+
+
+class DirectorySyncOutput(BaseModel):
+    """
+    outcome of DirectorySync.run, paths are relative to the local folder and use
+    "/" separators.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    uploaded: List[str]
+    unchanged: int
+    deleted: List[str]
+    deleted_file_storage_tokens: List[str]
+    failed_file_storage_tokens: List[str]
+    errors: Dict[str, Exception]
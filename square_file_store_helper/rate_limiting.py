@@ -0,0 +1,219 @@
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, Literal, Tuple
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+
+Direction = Literal["upload", "download"]
+
+# a context variable rather than a thread local: asyncio tasks get their own copy
+# and run_in_parallel hands it on to its worker threads.
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "rate_limit_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+def get_rate_limit_priority() -> str:
+    """
+    :return: priority class of the requests made in the current context,
+        PRIORITY_INTERACTIVE unless set by rate_limit_priority.
+    """
+    return _priority.get()
+
+
+@contextlib.contextmanager
+def rate_limit_priority(priority: str) -> Iterator[None]:
+    """
+    sets the priority class of the requests made inside the block (in this thread or
+    asyncio task, and in the threads of the bulk helpers it starts).
+    :param priority: PRIORITY_INTERACTIVE or PRIORITY_BULK.
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {PRIORITIES}, got {priority!r}.")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """
+    rate tokens per second, holding at most capacity, starting full.
+
+    interactive takers reserve their tokens right away, the bucket going into debt,
+    and wait until the debt is paid back. bulk takers only take once the bucket is
+    out of debt, so interactive takers get ahead of every waiting bulk one (and
+    starve them while they use the whole rate).
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float]):
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def take(self, amount: float, priority: str) -> Tuple[bool, float]:
+        """
+        :return: (taken, seconds to wait). once taken, the caller proceeds after
+            waiting, otherwise it waits and tries again.
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            if priority == PRIORITY_BULK and self._tokens < 0:
+                return False, -self._tokens / self.rate
+            self._tokens -= amount
+            return True, max(0.0, -self._tokens / self.rate)
+
+
+class RateLimiter:
+    """
+    token buckets shaping the traffic of SquareFileStoreHelper and
+    AsyncSquareFileStoreHelper: bytes per second per direction and requests per
+    second per endpoint, shared by all threads and asyncio tasks using the helpers
+    it is given to.
+
+    requests of the interactive priority class skip ahead of waiting bulk ones, see
+    rate_limit_priority. upload_files_in_bulk_v0, download_files_in_bulk_v0 and
+    DirectorySync always run as bulk.
+
+    clock, sleep and async_sleep are injectable for deterministic tests.
+    """
+
+    def __init__(
+        self,
+        upload_bytes_per_second: float | None = None,
+        download_bytes_per_second: float | None = None,
+        requests_per_second: Dict[str, float] | None = None,
+        default_requests_per_second: float | None = None,
+        burst_seconds: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        async_sleep: Callable[[float], Awaitable[Any]] | None = None,
+    ):
+        """
+        :param upload_bytes_per_second: request body bytes, None for no limit.
+        :param download_bytes_per_second: response body bytes, None for no limit.
+        :param requests_per_second: endpoint (e.g. "delete_files/v0") -> requests
+            per second, every attempt counts.
+        :param default_requests_per_second: limit of the endpoints missing from
+            requests_per_second, None for no limit.
+        :param burst_seconds: the buckets hold this many seconds of their rate
+            (at least one request), sent at once after idling.
+        :param async_sleep: defaults to asyncio.sleep.
+        """
+        if burst_seconds < 0:
+            raise ValueError("burst_seconds must not be negative.")
+        self.burst_seconds = burst_seconds
+        self.clock = clock
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+        self._byte_buckets: Dict[str, TokenBucket | None] = {
+            "upload": self._create_bucket(upload_bytes_per_second, 0.0),
+            "download": self._create_bucket(download_bytes_per_second, 0.0),
+        }
+        self.requests_per_second = dict(requests_per_second or {})
+        self.default_requests_per_second = default_requests_per_second
+        self._request_buckets: Dict[str, TokenBucket | None] = {}
+        self._lock = threading.Lock()
+
+    def _create_bucket(
+        self, rate: float | None, minimum_capacity: float
+    ) -> TokenBucket | None:
+        if rate is None:
+            return None
+        return TokenBucket(
+            rate, max(minimum_capacity, rate * self.burst_seconds), self.clock
+        )
+
+    def get_request_bucket(self, endpoint: str) -> TokenBucket | None:
+        with self._lock:
+            try:
+                return self._request_buckets[endpoint]
+            except KeyError:
+                bucket = self._request_buckets[endpoint] = self._create_bucket(
+                    self.requests_per_second.get(
+                        endpoint, self.default_requests_per_second
+                    ),
+                    1.0,
+                )
+                return bucket
+
+    def get_byte_bucket(self, direction: Direction) -> TokenBucket | None:
+        try:
+            return self._byte_buckets[direction]
+        except KeyError:
+            raise ValueError(
+                f"direction must be upload or download, got {direction!r}."
+            ) from None
+
+    def _acquire(self, bucket: TokenBucket | None, amount: float, priority: str | None):
+        if bucket is None:
+            return
+        priority = priority or _priority.get()
+        while True:
+            taken, wait_seconds = bucket.take(amount, priority)
+            if wait_seconds > 0:
+                self.sleep(wait_seconds)
+            if taken:
+                return
+
+    async def _async_acquire(
+        self, bucket: TokenBucket | None, amount: float, priority: str | None
+    ):
+        if bucket is None:
+            return
+        async_sleep = self.async_sleep
+        if async_sleep is None:
+            import asyncio
+
+            async_sleep = asyncio.sleep
+        priority = priority or _priority.get()
+        while True:
+            taken, wait_seconds = bucket.take(amount, priority)
+            if wait_seconds > 0:
+                await async_sleep(wait_seconds)
+            if taken:
+                return
+
+    def acquire_request(self, endpoint: str, priority: str | None = None):
+        """
+        blocks until a request to endpoint may be sent.
+        :param priority: defaults to the one of the current context.
+        """
+        self._acquire(self.get_request_bucket(endpoint), 1, priority)
+
+    def acquire_bytes(
+        self, direction: Direction, size: int, priority: str | None = None
+    ):
+        """
+        blocks until size more bytes may be transferred in direction.
+        :param priority: defaults to the one of the current context.
+        """
+        self._acquire(self.get_byte_bucket(direction), size, priority)
+
+    async def async_acquire_request(self, endpoint: str, priority: str | None = None):
+        """
+        awaitable twin of acquire_request.
+        """
+        await self._async_acquire(self.get_request_bucket(endpoint), 1, priority)
+
+    async def async_acquire_bytes(
+        self, direction: Direction, size: int, priority: str | None = None
+    ):
+        """
+        awaitable twin of acquire_bytes.
+        """
+        await self._async_acquire(self.get_byte_bucket(direction), size, priority)
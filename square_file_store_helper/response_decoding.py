@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import dataclasses
+import functools
+from typing import TYPE_CHECKING, Any, Callable, Dict, Generic, List, TypeVar
+
+if TYPE_CHECKING:
+    from square_commons.api_utils import StandardResponse
+
+    from square_file_store_helper.pydantic_models import (
+        DeleteFilesV0Response,
+        UploadFileV0Response,
+    )
+
+T = TypeVar("T")
+
+_STR_TYPE = frozenset((str,))
+
+
+@functools.cache
+def get_standard_response_model(data_model: type) -> type:
+    """
+    StandardResponse[data_model], parameterized once per data model.
+    """
+    from square_commons.api_utils import StandardResponse
+
+    return StandardResponse[data_model]
+
+
+@dataclasses.dataclass(slots=True)
+class UploadFileV0Result:
+    main: str
+    digests: Dict[str, str] | None = None
+
+    @staticmethod
+    def get_pydantic_model() -> type:
+        from square_file_store_helper.pydantic_models import UploadFileV0Response
+
+        return UploadFileV0Response
+
+    def to_pydantic(self) -> UploadFileV0Response:
+        return self.get_pydantic_model().model_construct(
+            main=self.main, digests=self.digests
+        )
+
+
+@dataclasses.dataclass(slots=True)
+class DeleteFilesV0Result:
+    main: List[str]
+    failed_file_storage_tokens: List[str] = dataclasses.field(default_factory=list)
+
+    @staticmethod
+    def get_pydantic_model() -> type:
+        from square_file_store_helper.pydantic_models import DeleteFilesV0Response
+
+        return DeleteFilesV0Response
+
+    def to_pydantic(self) -> DeleteFilesV0Response:
+        return self.get_pydantic_model().model_construct(
+            main=self.main, failed_file_storage_tokens=self.failed_file_storage_tokens
+        )
+
+
+@dataclasses.dataclass(slots=True)
+class StandardResult(Generic[T]):
+    """
+    plain slotted twin of StandardResponse, built by decode_upload_file_v0_response
+    and decode_delete_files_v0_response.
+    """
+
+    data: T | None = None
+    message: str | None = None
+    log: Any = None
+    data_type: type | None = dataclasses.field(default=None, repr=False, compare=False)
+
+    def to_pydantic(self) -> StandardResponse:
+        """
+        :return: the equivalent StandardResponse[UploadFileV0Response] or
+            StandardResponse[DeleteFilesV0Response], without validating again.
+        """
+        return get_standard_response_model(
+            self.data_type.get_pydantic_model()
+        ).model_construct(
+            data=None if self.data is None else self.data.to_pydantic(),
+            message=self.message,
+            log=self.log,
+        )
+
+
+def _check_str(value, field: str) -> str:
+    if not isinstance(value, str):
+        raise ValueError(f"{field}: expected a string, got {value!r}.")
+    return value
+
+
+def _check_str_list(value, field: str) -> List[str]:
+    # json only produces exact str items, map(type, ...) keeps the loop in c.
+    if not isinstance(value, list) or not _STR_TYPE.issuperset(map(type, value)):
+        raise ValueError(f"{field}: expected a list of strings, got {value!r}.")
+    return value
+
+
+def _check_str_dict(value, field: str) -> Dict[str, str] | None:
+    if value is not None and not (
+        isinstance(value, dict)
+        and _STR_TYPE.issuperset(map(type, value))
+        and _STR_TYPE.issuperset(map(type, value.values()))
+    ):
+        raise ValueError(f"{field}: expected an object of strings, got {value!r}.")
+    return value
+
+
+def _decode(
+    response: Dict[str, Any],
+    data_type: type,
+    decode_data: Callable[[Dict[str, Any]], Any],
+    trusted: bool,
+) -> StandardResult:
+    if not trusted and not isinstance(response, dict):
+        raise ValueError(f"expected a json object, got {response!r}.")
+    data = response.get("data")
+    message = response.get("message")
+    if not trusted:
+        if data is not None and not isinstance(data, dict):
+            raise ValueError(f"data: expected a json object, got {data!r}.")
+        if message is not None:
+            _check_str(message, "message")
+    return StandardResult(
+        None if data is None else decode_data(data),
+        message,
+        response.get("log"),
+        data_type,
+    )
+
+
+def _decode_upload_file_v0_data(data: Dict[str, Any]) -> UploadFileV0Result:
+    return UploadFileV0Result(
+        _check_str(data.get("main"), "data.main"),
+        _check_str_dict(data.get("digests"), "data.digests"),
+    )
+
+
+def _decode_upload_file_v0_data_trusted(data: Dict[str, Any]) -> UploadFileV0Result:
+    return UploadFileV0Result(data["main"], data.get("digests"))
+
+
+def _decode_delete_files_v0_data(data: Dict[str, Any]) -> DeleteFilesV0Result:
+    return DeleteFilesV0Result(
+        _check_str_list(data.get("main"), "data.main"),
+        _check_str_list(
+            data.get("failed_file_storage_tokens", []),
+            "data.failed_file_storage_tokens",
+        ),
+    )
+
+
+def _decode_delete_files_v0_data_trusted(
+    data: Dict[str, Any],
+) -> DeleteFilesV0Result:
+    return DeleteFilesV0Result(data["main"], data.get("failed_file_storage_tokens", []))
+
+
+def decode_upload_file_v0_response(
+    response: Dict[str, Any], trusted: bool = False
+) -> StandardResult[UploadFileV0Result]:
+    """
+    decodes an upload_file/v0 json response without pydantic.
+    :param trusted: skip the type checks, for servers known to send well formed
+        responses.
+    :raises ValueError: when an untrusted response does not match the schema.
+    """
+    return _decode(
+        response,
+        UploadFileV0Result,
+        (
+            _decode_upload_file_v0_data_trusted
+            if trusted
+            else _decode_upload_file_v0_data
+        ),
+        trusted,
+    )
+
+
+def decode_delete_files_v0_response(
+    response: Dict[str, Any], trusted: bool = False
+) -> StandardResult[DeleteFilesV0Result]:
+    """
+    decodes a delete_files/v0 json response without pydantic.
+    :param trusted: skip the type checks, for servers known to send well formed
+        responses.
+    :raises ValueError: when an untrusted response does not match the schema.
+    """
+    return _decode(
+        response,
+        DeleteFilesV0Result,
+        (
+            _decode_delete_files_v0_data_trusted
+            if trusted
+            else _decode_delete_files_v0_data
+        ),
+        trusted,
+    )
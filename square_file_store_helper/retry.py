@@ -0,0 +1,330 @@
+import email.utils
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, TypeVar
+
+import requests
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+# statuses telling that the server did not process the request, so a non idempotent
+# upload can be sent again without risking a duplicate.
+UNPROCESSED_STATUS_CODES = (408, 429, 503)
+# statuses telling that a node, not the request, is at fault.
+NODE_FAILURE_STATUS_CODES = (500, 502, 503, 504)
+
+
+def is_node_failure(error: Exception) -> bool:
+    """
+    :return: True for errors that say the node is unhealthy (connection errors,
+        timeouts and 5xx responses) rather than that the request was wrong.
+    """
+    if isinstance(error, requests.HTTPError):
+        return (
+            error.response is not None
+            and error.response.status_code in NODE_FAILURE_STATUS_CODES
+        )
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def is_connect_error(error: Exception) -> bool:
+    """
+    :return: True when the request failed before reaching the server (connect
+        timeout, connection refused, unresolvable or unreachable host), so sending
+        it again cannot duplicate it.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError) or not error.args:
+        return False
+    reason = error.args[0]
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    # NewConnectionError, raised for refused and unreachable hosts, is a subclass.
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def is_unprocessed_error(error: Exception) -> bool:
+    """
+    :return: True for errors telling that the server did not process the request:
+        connect errors and UNPROCESSED_STATUS_CODES responses.
+    """
+    if isinstance(error, requests.HTTPError):
+        return (
+            error.response is not None
+            and error.response.status_code in UNPROCESSED_STATUS_CODES
+        )
+    return is_connect_error(error)
+
+
+class CircuitOpenError(Exception):
+    """
+    raised without contacting the server while the circuit breaker of its host is
+    open.
+    """
+
+
+class RetryPolicy:
+    """
+    how often and how fast one endpoint is retried.
+
+    the n-th retry waits a random duration between 0 and
+    min(max_backoff, initial_backoff * multiplier ** n) ("full jitter"), or exactly
+    that bound when jitter is False, and at least the Retry-After of the response.
+    no attempt starts once deadline seconds have passed since the call began.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        initial_backoff: float = 0.1,
+        max_backoff: float = 10.0,
+        multiplier: float = 2.0,
+        jitter: bool = True,
+        deadline: float | None = 60.0,
+        retry_on_status_codes: Iterable[int] = RETRYABLE_STATUS_CODES,
+        retry_on_connection_errors: bool = True,
+        retry_on_read_errors: bool = True,
+    ):
+        """
+        :param retry_on_read_errors: False to retry only the connection errors raised
+            before the request reached the server (is_connect_error), not timeouts or
+            resets after it was sent, which the server may have processed.
+        """
+        if max_attempts <= 0:
+            raise ValueError("max_attempts must be a positive integer.")
+        if initial_backoff < 0 or max_backoff < 0:
+            raise ValueError("backoff must not be negative.")
+        if deadline is not None and deadline <= 0:
+            raise ValueError("deadline must be positive.")
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.retry_on_status_codes = frozenset(retry_on_status_codes)
+        self.retry_on_connection_errors = retry_on_connection_errors
+        self.retry_on_read_errors = retry_on_read_errors
+
+    def get_backoff(self, retry_number: int, random_value: float) -> float:
+        """
+        :param retry_number: 0 for the first retry.
+        :param random_value: uniform in [0, 1).
+        """
+        backoff = min(
+            self.max_backoff, self.initial_backoff * self.multiplier**retry_number
+        )
+        return backoff * random_value if self.jitter else backoff
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, requests.HTTPError):
+            return (
+                error.response is not None
+                and error.response.status_code in self.retry_on_status_codes
+            )
+        if isinstance(error, requests.exceptions.SSLError):
+            return False
+        if not self.retry_on_connection_errors:
+            return False
+        if not self.retry_on_read_errors:
+            return is_connect_error(error)
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def get_default_retry_policies() -> Dict[str, RetryPolicy]:
+    """
+    downloads and deletes are idempotent and retried on any transient failure,
+    uploads only on failures meaning the server did not process them (connect errors
+    and UNPROCESSED_STATUS_CODES), and only when the body can be replayed.
+    """
+    return {
+        "download_file/v0": RetryPolicy(),
+        "delete_files/v0": RetryPolicy(),
+        "upload_file/v0": RetryPolicy(
+            retry_on_status_codes=UNPROCESSED_STATUS_CODES, retry_on_read_errors=False
+        ),
+    }
+
+
+class CircuitBreaker:
+    """
+    opens after failure_threshold consecutive host failures (is_node_failure),
+    rejecting requests for recovery_timeout seconds, then lets a single trial request
+    through (half open) which closes the circuit on success and reopens it on
+    failure. other errors are neutral, they neither count nor reset the failures.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if failure_threshold <= 0:
+            raise ValueError("failure_threshold must be a positive integer.")
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if self.clock() - self._opened_at < self.recovery_timeout:
+                    return False
+                self.state = "half_open"
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_neutral(self):
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if (
+                self.state == "half_open"
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = "open"
+                self._opened_at = self.clock()
+
+
+class RetryEngine:
+    """
+    retries the requests of SquareFileStoreHelper according to per endpoint
+    policies, guarded by one circuit breaker per host. an engine can be shared by
+    several helpers so they share their circuit breakers.
+
+    clock, sleep and random are injectable for deterministic tests.
+    """
+
+    def __init__(
+        self,
+        policies: Dict[str, RetryPolicy] | None = None,
+        default_policy: RetryPolicy | None = None,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        random: Callable[[], float] = random.random,
+    ):
+        """
+        :param policies: endpoint -> RetryPolicy, merged over
+            get_default_retry_policies().
+        :param default_policy: policy of endpoints without one, no retries by default.
+        """
+        self.policies = {**get_default_retry_policies(), **(policies or {})}
+        self.default_policy = default_policy or RetryPolicy(max_attempts=1)
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.sleep = sleep
+        self.random = random
+        self._circuit_breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get_policy(self, endpoint: str) -> RetryPolicy:
+        return self.policies.get(endpoint, self.default_policy)
+
+    def get_circuit_breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            circuit_breaker = self._circuit_breakers.get(host)
+            if circuit_breaker is None:
+                circuit_breaker = self._circuit_breakers[host] = CircuitBreaker(
+                    self.failure_threshold, self.recovery_timeout, self.clock
+                )
+            return circuit_breaker
+
+    def call(
+        self,
+        host: str,
+        endpoint: str,
+        function: Callable[[float | None], T],
+        replayable: bool = True,
+    ) -> T:
+        """
+        :param host: circuit breaker key, e.g. the url base.
+        :param function: performs one attempt, called with the seconds left before
+            the deadline (None without deadline) to use as request timeout.
+        :param replayable: False when the request cannot be sent again (a consumed
+            upload stream), it is then attempted once.
+        :return: the result of the first successful attempt, the error of the last
+            attempt is raised otherwise.
+        """
+        policy = self.get_policy(endpoint)
+        circuit_breaker = self.get_circuit_breaker(host)
+        started_at = self.clock()
+        retry_number = 0
+        while True:
+            remaining = None
+            if policy.deadline is not None:
+                remaining = policy.deadline - (self.clock() - started_at)
+            if not circuit_breaker.allow_request():
+                raise CircuitOpenError(f"circuit breaker open for {host}.")
+            try:
+                result = function(remaining)
+            except Exception as error:
+                # whether the host failed does not depend on the request being
+                # retried, an upload 502 is as much a failure as a download 502.
+                if is_node_failure(error):
+                    circuit_breaker.record_failure()
+                else:
+                    circuit_breaker.record_neutral()
+                if (
+                    not policy.is_retryable(error)
+                    or not replayable
+                    or retry_number + 1 >= policy.max_attempts
+                    or circuit_breaker.state == "open"
+                ):
+                    raise
+                delay = max(
+                    policy.get_backoff(retry_number, self.random()),
+                    _get_retry_after(error, policy.max_backoff),
+                )
+                if (
+                    policy.deadline is not None
+                    and self.clock() - started_at + delay >= policy.deadline
+                ):
+                    raise
+                self.sleep(delay)
+                retry_number += 1
+                continue
+            circuit_breaker.record_success()
+            return result
+
+
+def _get_retry_after(error: Exception, max_backoff: float) -> float:
+    response = getattr(error, "response", None)
+    value = None if response is None else response.headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return 0.0
+        seconds = retry_at.timestamp() - time.time()
+    return min(max(seconds, 0.0), max_backoff)
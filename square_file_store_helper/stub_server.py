@@ -0,0 +1,573 @@
+"""
+in-process stand-in for the square file store, used by the tests and benchmarks.
+
+it implements upload_file/v0, download_file/v0 and delete_files/v0 on top of the
+standard library http server and keeps every file in memory. with http2 it also
+serves prior knowledge h2c connections (needs the h2 package).
+"""
+
+import io
+import json
+import re
+import socket
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+from square_file_store_helper.content_encoding import (
+    get_compressor,
+    get_decompressor,
+)
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.errors
+    import h2.events
+    import h2.exceptions
+except ImportError:  # pragma: no cover - optional dependency
+    h2 = None
+
+
+class _StubFileStoreRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_StubFileStoreHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.stub.lock:
+            self.server.stub.connection_count += 1
+            self.server.stub.open_connections.add(self.connection)
+
+    def finish(self):
+        with self.server.stub.lock:
+            self.server.stub.open_connections.discard(self.connection)
+        super().finish()
+
+    def handle(self):
+        # no HTTP/1.1 request line starts like the http/2 connection preface.
+        if self.server.stub.http2 and self.rfile.peek(3)[:3] == b"PRI":
+            _HTTP2Connection(self).serve()
+            return
+        super().handle()
+
+    def _simulate_processing(self):
+        stub = self.server.stub
+        if not stub.response_delay_seconds:
+            return
+        processing_slots = stub.processing_slots
+        if processing_slots is None:
+            time.sleep(stub.response_delay_seconds)
+            return
+        with processing_slots:
+            time.sleep(stub.response_delay_seconds)
+
+    def _send_json(self, status: int, data=None, message: str = None):
+        body = json.dumps({"data": data, "message": message, "log": None}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_fault(self) -> bool:
+        """
+        :return: True when the request was answered with the next injected fault.
+        """
+        stub = self.server.stub
+        with stub.lock:
+            stub.request_count += 1
+            fault = stub.faults.pop(0) if stub.faults else None
+        if fault is None:
+            return False
+        if fault == "reset":
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return True
+        body = json.dumps({"data": None, "message": "injected fault.", "log": None})
+        self.send_response(fault)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if stub.fault_retry_after is not None:
+            self.send_header("Retry-After", stub.fault_retry_after)
+        self.end_headers()
+        self.wfile.write(body.encode())
+        return True
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _parse_multipart(self, body: bytes) -> Tuple[Dict[str, str], Dict]:
+        content_type = self.headers.get("Content-Type", "")
+        boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+        fields = {}
+        files = {}
+        for part in body.split(b"--" + boundary)[1:-1]:
+            raw_headers, _, content = part[2:-2].partition(b"\r\n\r\n")
+            part_headers = {}
+            for line in raw_headers.decode().split("\r\n"):
+                key, _, value = line.partition(":")
+                part_headers[key.strip().lower()] = value.strip()
+            disposition = {}
+            for item in part_headers.get("content-disposition", "").split(";")[1:]:
+                key, _, value = item.strip().partition("=")
+                disposition[key] = value.strip('"')
+            if "filename" in disposition:
+                files[disposition["name"]] = (
+                    disposition["filename"],
+                    content,
+                    part_headers.get("content-type", "application/octet-stream"),
+                )
+            else:
+                fields[disposition["name"]] = content.decode()
+        return fields, files
+
+    def do_POST(self):
+        parsed_url = urllib.parse.urlsplit(self.path)
+        body = self._read_body()
+        if self._inject_fault():
+            return
+        self._simulate_processing()
+        if parsed_url.path != "/upload_file/v0":
+            self._send_json(404, message="not found.")
+            return
+        content_encoding = self.headers.get("Content-Encoding", "identity").lower()
+        if content_encoding != "identity":
+            try:
+                body = get_decompressor(content_encoding).decompress(body)
+            except ValueError:
+                self._send_json(415, message="unsupported content encoding.")
+                return
+            with self.server.stub.lock:
+                self.server.stub.request_encodings.append(content_encoding)
+        fields, files = self._parse_multipart(body)
+        if "file" not in files:
+            self._send_json(422, message="file is required.")
+            return
+        file_name, content, content_type = files["file"]
+        token = uuid.uuid4().hex
+        with self.server.stub.lock:
+            self.server.stub.files[token] = (file_name, content, content_type)
+            self.server.stub.upload_fields[token] = fields
+        self._send_json(
+            201, data={"main": token}, message="file uploaded successfully."
+        )
+
+    def do_GET(self):
+        if self._inject_fault():
+            return
+        self._simulate_processing()
+        parsed_url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parsed_url.query)
+        if parsed_url.path != "/download_file/v0":
+            self._send_json(404, message="not found.")
+            return
+        token = query.get("file_storage_token", [""])[0]
+        with self.server.stub.lock:
+            stored_file = self.server.stub.files.get(token)
+        if stored_file is None:
+            self._send_json(404, message="file not found.")
+            return
+        file_name, content, content_type = stored_file
+        stub = self.server.stub
+        status = 200
+        start, end = 0, len(content) - 1
+        range_header = self.headers.get("Range")
+        with stub.lock:
+            stub.range_headers.append(range_header)
+        if range_header is not None and stub.support_ranges:
+            match = re.fullmatch(r"bytes=(\d+)-(\d*)", range_header)
+            if match is None or int(match.group(1)) >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(content)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), end)
+        body = content[start : end + 1]
+        content_encoding = None
+        if status == 200:
+            content_encoding = _negotiate_encoding(
+                self.headers.get("Accept-Encoding", ""), stub.response_encodings
+            )
+        if content_encoding is not None:
+            compressor = get_compressor(content_encoding)
+            body = compressor.compress(body) + compressor.flush()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header(
+            "Content-Disposition",
+            f"attachment; filename*=UTF-8''{urllib.parse.quote(file_name)}",
+        )
+        if stub.support_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(content)}")
+        if content_encoding is not None:
+            self.send_header("Content-Encoding", content_encoding)
+        if token in stub.repr_digests:
+            self.send_header("Repr-Digest", stub.repr_digests[token])
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        with stub.lock:
+            interrupt = stub.download_interruptions > 0
+            if interrupt:
+                stub.download_interruptions -= 1
+        if interrupt:
+            # advertise the full length but drop the connection part way through.
+            self.wfile.write(body[: stub.download_interruption_after_bytes])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        if stub.download_bytes_per_second is None:
+            self.wfile.write(body)
+            return
+        # pace every response independently to mimic a per connection bottleneck.
+        slice_size = 64 * 1024
+        started_at = time.monotonic()
+        for offset in range(0, len(body), slice_size):
+            self.wfile.write(body[offset : offset + slice_size])
+            delay = (
+                started_at
+                + (offset + slice_size) / stub.download_bytes_per_second
+                - time.monotonic()
+            )
+            if delay > 0:
+                time.sleep(delay)
+
+    def do_DELETE(self):
+        if self._inject_fault():
+            return
+        self._simulate_processing()
+        parsed_url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parsed_url.query)
+        if parsed_url.path != "/delete_files/v0":
+            self._send_json(404, message="not found.")
+            return
+        deleted_tokens = []
+        with self.server.stub.lock:
+            for token in query.get("file_storage_tokens", []):
+                if self.server.stub.files.pop(token, None) is not None:
+                    deleted_tokens.append(token)
+        self._send_json(
+            200, data={"main": deleted_tokens}, message="files deleted successfully."
+        )
+
+
+class _HTTP2ResponseStream:
+    """
+    wfile and connection of the handler answering one http/2 stream: the HTTP/1.1
+    response it writes is sent as HEADERS and DATA frames, within the flow control
+    window, and shutting the connection down resets the stream.
+    """
+
+    def __init__(self, connection: "_HTTP2Connection", stream_id: int):
+        self.connection = connection
+        self.stream_id = stream_id
+        self._head = b""
+        self._headers_sent = False
+        self._closed = False
+
+    def write(self, data: bytes):
+        data = bytes(data)
+        if not self._headers_sent:
+            self._head += data
+            head, separator, data = self._head.partition(b"\r\n\r\n")
+            if not separator:
+                return
+            self._send_headers(head)
+        if data:
+            self._send_data(data)
+
+    def flush(self):
+        pass
+
+    def _send_headers(self, head: bytes):
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        headers = [(":status", status_line.split(" ")[1])]
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            if name not in ("connection", "keep-alive", "transfer-encoding"):
+                headers.append((name, value.strip()))
+        with self.connection.condition:
+            self.connection.h2_connection.send_headers(self.stream_id, headers)
+            self.connection.send_pending()
+        self._headers_sent = True
+
+    def _send_data(self, data: bytes):
+        h2_connection = self.connection.h2_connection
+        view = memoryview(data)
+        while view:
+            with self.connection.condition:
+                while True:
+                    if (
+                        self.connection.closed
+                        or self.stream_id in self.connection.reset_streams
+                    ):
+                        raise ConnectionResetError("stream reset by the client.")
+                    window = min(
+                        h2_connection.local_flow_control_window(self.stream_id),
+                        h2_connection.max_outbound_frame_size,
+                    )
+                    if window > 0:
+                        break
+                    self.connection.condition.wait()
+                h2_connection.send_data(self.stream_id, view[:window].tobytes())
+                self.connection.send_pending()
+            view = view[window:]
+
+    def shutdown(self, how: int):
+        # the handler drops the connection (injected reset or interruption).
+        with self.connection.condition:
+            self.connection.h2_connection.reset_stream(
+                self.stream_id, h2.errors.ErrorCodes.INTERNAL_ERROR
+            )
+            self.connection.send_pending()
+        self._closed = True
+
+    def finish(self):
+        if self._closed:
+            return
+        with self.connection.condition:
+            if self._headers_sent:
+                self.connection.h2_connection.end_stream(self.stream_id)
+            else:
+                self.connection.h2_connection.reset_stream(self.stream_id)
+            self.connection.send_pending()
+
+
+class _HTTP2Connection:
+    """
+    serves a prior knowledge h2c connection. every stream is answered in its own
+    thread by a _StubFileStoreRequestHandler reading an HTTP/1.1 rendering of the
+    request, so both protocols share the endpoints, faults and delays.
+    """
+
+    def __init__(self, handler: _StubFileStoreRequestHandler):
+        self.handler = handler
+        self.condition = threading.Condition()
+        self.h2_connection = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding=None)
+        )
+        self.requests: Dict[int, Tuple[list, bytearray]] = {}
+        self.reset_streams = set()
+        self.closed = False
+
+    def send_pending(self):
+        # called with the condition held, so frames go out in order.
+        data = self.h2_connection.data_to_send()
+        if data:
+            self.handler.connection.sendall(data)
+
+    def serve(self):
+        with self.condition:
+            self.h2_connection.initiate_connection()
+            self.send_pending()
+        try:
+            while data := self.handler.rfile.read1(65536):
+                with self.condition:
+                    for event in self.h2_connection.receive_data(data):
+                        self._on_event(event)
+                    self.send_pending()
+                    self.condition.notify_all()
+        except (OSError, h2.exceptions.ProtocolError):
+            pass
+        finally:
+            with self.condition:
+                self.closed = True
+                self.condition.notify_all()
+
+    def _on_event(self, event):
+        if isinstance(event, h2.events.RequestReceived):
+            self.requests[event.stream_id] = (event.headers, bytearray())
+        elif isinstance(event, h2.events.DataReceived):
+            self.requests[event.stream_id][1].extend(event.data)
+            self.h2_connection.acknowledge_received_data(
+                event.flow_controlled_length, event.stream_id
+            )
+        elif isinstance(event, h2.events.StreamEnded):
+            headers, body = self.requests.pop(event.stream_id)
+            threading.Thread(
+                target=self._answer,
+                args=(event.stream_id, headers, bytes(body)),
+                daemon=True,
+            ).start()
+        elif isinstance(event, h2.events.StreamReset):
+            self.requests.pop(event.stream_id, None)
+            self.reset_streams.add(event.stream_id)
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            self.closed = True
+
+    def _answer(self, stream_id: int, headers: list, body: bytes):
+        headers = [(name.decode(), value.decode()) for name, value in headers]
+        pseudo_headers = dict(item for item in headers if item[0].startswith(":"))
+        lines = [
+            f"{pseudo_headers[':method']} {pseudo_headers[':path']} HTTP/1.1",
+            f"Host: {pseudo_headers.get(':authority', '')}",
+            f"Content-Length: {len(body)}",
+        ]
+        lines += [
+            f"{name}: {value}"
+            for name, value in headers
+            if not name.startswith(":") and name != "content-length"
+        ]
+        stream = _HTTP2ResponseStream(self, stream_id)
+        handler = _StubFileStoreRequestHandler.__new__(_StubFileStoreRequestHandler)
+        handler.server = self.handler.server
+        handler.client_address = self.handler.client_address
+        handler.connection = stream
+        handler.rfile = io.BytesIO(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        handler.wfile = stream
+        try:
+            handler.handle_one_request()
+            stream.finish()
+        except (OSError, h2.exceptions.ProtocolError):
+            pass
+
+
+def _negotiate_encoding(accept_encoding: str, encodings: List[str]) -> str | None:
+    accepted = {
+        item.split(";", 1)[0].strip().lower()
+        for item in accept_encoding.split(",")
+        if not item.replace(" ", "").endswith(";q=0")
+    }
+    for encoding in encodings:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+class _StubFileStoreHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+    stub: "StubFileStoreServer"
+
+
+class StubFileStoreServer:
+    """
+    usage:
+        with StubFileStoreServer() as server:
+            helper = SquareFileStoreHelper(param_int_square_file_store_port=server.port)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, http2: bool = False):
+        """
+        :param http2: also serve prior knowledge h2c connections, every stream
+            handled concurrently. plain HTTP/1.1 connections are still served.
+        """
+        if http2 and h2 is None:
+            raise ImportError(
+                "the http2 stub server requires h2, "
+                "install square_file_store_helper[http2]."
+            )
+        self.http2 = http2
+        self.lock = threading.Lock()
+        self.files: Dict[str, Tuple[str, bytes, str]] = {}
+        # form fields (app_id, system_relative_path) of every upload by token.
+        self.upload_fields: Dict[str, Dict[str, str]] = {}
+        self.connection_count = 0
+        self.support_ranges = True
+        self.range_headers = []
+        # the next download_interruptions downloads stop after
+        # download_interruption_after_bytes bytes of the body.
+        self.download_interruptions = 0
+        self.download_interruption_after_bytes = 0
+        # throughput limit of every single download response, None is unlimited.
+        self.download_bytes_per_second: float | None = None
+        # Repr-Digest header value sent with the downloads of a token.
+        self.repr_digests: Dict[str, str] = {}
+        # the next requests, whatever their endpoint, are answered in order with these
+        # faults: an http status code or "reset" to drop the connection unanswered.
+        self.faults: List[int | str] = []
+        # Retry-After header sent with injected status codes.
+        self.fault_retry_after: str | None = None
+        self.request_count = 0
+        # downloads are compressed with the first of these encodings the client
+        # accepts, full responses only. Content-Encoding of uploads is always decoded
+        # and recorded in request_encodings.
+        self.response_encodings: List[str] = []
+        self.request_encodings: List[str] = []
+        # every request waits response_delay_seconds while holding one of
+        # max_concurrent_requests processing slots, to model a node's capacity.
+        self.response_delay_seconds = 0.0
+        self.max_concurrent_requests = None
+        self.open_connections = set()
+        self._http_server = _StubFileStoreHTTPServer(
+            (host, port), _StubFileStoreRequestHandler
+        )
+        self._http_server.stub = self
+        self._thread = None
+
+    @property
+    def max_concurrent_requests(self) -> int | None:
+        return self._max_concurrent_requests
+
+    @max_concurrent_requests.setter
+    def max_concurrent_requests(self, value: int | None):
+        self._max_concurrent_requests = value
+        self.processing_slots = None if value is None else threading.Semaphore(value)
+
+    @property
+    def host(self) -> str:
+        return self._http_server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._http_server.server_address[1]
+
+    @property
+    def url_base(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "StubFileStoreServer":
+        self._thread = threading.Thread(
+            target=self._http_server.serve_forever, args=(0.05,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        stops accepting connections and drops the kept-alive ones, like a node going
+        down.
+        """
+        self._http_server.shutdown()
+        self._http_server.server_close()
+        with self.lock:
+            open_connections = list(self.open_connections)
+        for connection in open_connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubFileStoreServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,337 @@
+import contextlib
+import fnmatch
+import mimetypes
+import os
+import sqlite3
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from square_file_store_helper.concurrency import run_in_parallel
+from square_file_store_helper.pydantic_models import DirectorySyncOutput
+from square_file_store_helper.rate_limiting import PRIORITY_BULK, rate_limit_priority
+from square_file_store_helper.upload_deduplication import UploadDeduplicationIndex
+
+# relative path -> (size, mtime_ns, content_hash, file_storage_token)
+ManifestEntry = Tuple[int, int, str, str]
+
+
+class SyncManifest:
+    """
+    persistent relative path -> (size, mtime, sha256, file_storage_token) record of
+    the files a DirectorySync uploaded, plus the tokens still waiting to be deleted.
+    """
+
+    def __init__(self, manifest_file_path: str):
+        self.manifest_file_path = os.path.abspath(manifest_file_path)
+        os.makedirs(os.path.dirname(self.manifest_file_path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    relative_path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    file_storage_token TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS pending_deletions (
+                    file_storage_token TEXT PRIMARY KEY
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                """
+            )
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(
+            self.manifest_file_path, timeout=30, isolation_level=None
+        )
+        # WAL stays consistent without a sync per commit, a crash loses at most
+        # the last entries, whose files are then uploaded again.
+        connection.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def check_destination(self, destination: str):
+        """
+        binds the manifest to destination on first use.
+        :raises ValueError: when it already tracks another destination.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('destination', ?)",
+                (destination,),
+            )
+            (recorded,) = connection.execute(
+                "SELECT value FROM meta WHERE key = 'destination'"
+            ).fetchone()
+        if recorded != destination:
+            raise ValueError(
+                f"manifest {self.manifest_file_path} tracks {recorded}, "
+                f"not {destination}."
+            )
+
+    def get_entries(self) -> Dict[str, ManifestEntry]:
+        with self._connect() as connection:
+            return {
+                row[0]: row[1:]
+                for row in connection.execute(
+                    "SELECT relative_path, size, mtime_ns, content_hash, "
+                    "file_storage_token FROM files"
+                )
+            }
+
+    def put(self, relative_path: str, entry: ManifestEntry, replaced_token=None):
+        """
+        records entry, and replaced_token (the token of the previous version) as
+        pending deletion, in one transaction.
+        """
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO files (relative_path, size, mtime_ns, "
+                    "content_hash, file_storage_token) VALUES (?, ?, ?, ?, ?)",
+                    (relative_path, *entry),
+                )
+                if replaced_token is not None and replaced_token != entry[3]:
+                    connection.execute(
+                        "INSERT OR IGNORE INTO pending_deletions "
+                        "(file_storage_token) VALUES (?)",
+                        (replaced_token,),
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def remove(self, list_relative_path: Iterable[str]):
+        """
+        drops the entries, their tokens become pending deletions.
+        """
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for relative_path in list_relative_path:
+                    row = connection.execute(
+                        "SELECT file_storage_token FROM files WHERE relative_path = ?",
+                        (relative_path,),
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    connection.execute(
+                        "INSERT OR IGNORE INTO pending_deletions "
+                        "(file_storage_token) VALUES (?)",
+                        row,
+                    )
+                    connection.execute(
+                        "DELETE FROM files WHERE relative_path = ?", (relative_path,)
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def get_pending_deletions(self) -> List[str]:
+        with self._connect() as connection:
+            return [
+                row[0]
+                for row in connection.execute(
+                    "SELECT file_storage_token FROM pending_deletions"
+                )
+            ]
+
+    def clear_pending_deletions(self, list_file_storage_token: Iterable[str]):
+        with self._connect() as connection:
+            connection.executemany(
+                "DELETE FROM pending_deletions WHERE file_storage_token = ?",
+                ((token,) for token in list_file_storage_token),
+            )
+
+
+def _matches(relative_path: str, patterns: Tuple[str, ...]) -> bool:
+    name = relative_path.rsplit("/", 1)[-1]
+    return any(
+        fnmatch.fnmatchcase(relative_path, pattern)
+        or fnmatch.fnmatchcase(name, pattern)
+        for pattern in patterns
+    )
+
+
+class DirectorySync:
+    """
+    mirrors a local folder into the file store through a SquareFileStoreHelper.
+
+    every run walks local_folder_path, uploads new files and files whose size or
+    modification time changed (and whose sha256 really differs) over max_workers
+    threads, and deletes the tokens of removed or replaced files in batches through
+    delete_file_v0. a file in directory "a/b" of the tree is uploaded with
+    system_relative_path "<system_relative_path>/a/b".
+
+    what was uploaded is recorded in a SyncManifest at manifest_file_path, so an
+    unchanged tree costs one stat per file and no request. use one manifest per
+    local folder and destination.
+
+    include and exclude are fnmatch patterns matched against both the "/" separated
+    path relative to local_folder_path and the bare file or directory name, e.g.
+    "*.log", ".git" or "build/*". an excluded directory is not descended into.
+    """
+
+    def __init__(
+        self,
+        helper,
+        local_folder_path: str,
+        manifest_file_path: str,
+        app_id: int | None = None,
+        system_relative_path: str = "others/misc",
+        include: Iterable[str] = ("*",),
+        exclude: Iterable[str] = (),
+        max_workers: int = 8,
+    ):
+        """
+        :param helper: SquareFileStoreHelper used for uploads and deletions, keep
+            max_workers <= its param_int_max_connections_per_host.
+        """
+        if max_workers <= 0:
+            raise ValueError("max_workers must be a positive integer.")
+        if not os.path.isdir(local_folder_path):
+            raise NotADirectoryError(local_folder_path)
+        self.helper = helper
+        self.local_folder_path = os.path.abspath(local_folder_path)
+        self.app_id = app_id
+        self.system_relative_path = system_relative_path.strip("/")
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.max_workers = max_workers
+        self.manifest = SyncManifest(manifest_file_path)
+        self.manifest.check_destination(
+            f"{self.local_folder_path} -> app_id={app_id} "
+            f"system_relative_path={self.system_relative_path}"
+        )
+
+    def iter_files(self) -> Iterator[Tuple[str, os.stat_result]]:
+        """
+        yields (relative path, stat result) of every included file.
+        """
+        stack = [("", self.local_folder_path)]
+        while stack:
+            relative_folder_path, folder_path = stack.pop()
+            with os.scandir(folder_path) as entries:
+                for entry in entries:
+                    relative_path = f"{relative_folder_path}{entry.name}"
+                    if _matches(relative_path, self.exclude):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((f"{relative_path}/", entry.path))
+                    elif entry.is_file() and _matches(relative_path, self.include):
+                        yield relative_path, entry.stat()
+
+    def _get_system_relative_path(self, relative_path: str) -> str:
+        relative_folder_path = relative_path.rpartition("/")[0]
+        return "/".join(
+            part for part in (self.system_relative_path, relative_folder_path) if part
+        )
+
+    def _sync_file(
+        self, item: Tuple[str, os.stat_result, ManifestEntry | None]
+    ) -> bool:
+        """
+        :return: True when the file was uploaded, False when only its modification
+            time had changed.
+        """
+        relative_path, stat_result, previous = item
+        file_path = os.path.join(self.local_folder_path, *relative_path.split("/"))
+        with open(file_path, "rb") as file:
+            content_hash, size = UploadDeduplicationIndex.hash_file(file)
+            if previous is not None and previous[2] == content_hash:
+                self.manifest.put(
+                    relative_path,
+                    (size, stat_result.st_mtime_ns, content_hash, previous[3]),
+                )
+                return False
+            response = self.helper.upload_file_using_tuple_v0(
+                (
+                    os.path.basename(file_path),
+                    file,
+                    _guess_content_type(file_path),
+                ),
+                app_id=self.app_id,
+                system_relative_path=self._get_system_relative_path(relative_path),
+            )
+        self.manifest.put(
+            relative_path,
+            (size, stat_result.st_mtime_ns, content_hash, response["data"]["main"]),
+            None if previous is None else previous[3],
+        )
+        return True
+
+    def run(self) -> DirectorySyncOutput:
+        """
+        :return: DirectorySyncOutput, failed uploads are reported in errors and
+            retried by the next run, as are tokens that could not be deleted.
+        """
+        entries = self.manifest.get_entries()
+        seen = set()
+        unchanged = 0
+
+        def iter_changed():
+            nonlocal unchanged
+            for relative_path, stat_result in self.iter_files():
+                seen.add(relative_path)
+                previous = entries.get(relative_path)
+                if (
+                    previous is not None
+                    and previous[0] == stat_result.st_size
+                    and previous[1] == stat_result.st_mtime_ns
+                ):
+                    unchanged += 1
+                    continue
+                yield relative_path, stat_result, previous
+
+        changed = list(iter_changed())
+        uploaded = []
+        errors = {}
+        with rate_limit_priority(PRIORITY_BULK):
+            outcomes = run_in_parallel(self._sync_file, changed, self.max_workers)
+        for item, (was_uploaded, error) in zip(changed, outcomes):
+            relative_path = item[0]
+            if error is not None:
+                errors[relative_path] = error
+            elif was_uploaded:
+                uploaded.append(relative_path)
+            else:
+                unchanged += 1
+
+        deleted = sorted(set(entries) - seen)
+        self.manifest.remove(deleted)
+        deleted_file_storage_tokens, failed_file_storage_tokens = self._delete_pending()
+        return DirectorySyncOutput(
+            uploaded=sorted(uploaded),
+            unchanged=unchanged,
+            deleted=deleted,
+            deleted_file_storage_tokens=deleted_file_storage_tokens,
+            failed_file_storage_tokens=failed_file_storage_tokens,
+            errors=errors,
+        )
+
+    def _delete_pending(self) -> Tuple[List[str], List[str]]:
+        pending = self.manifest.get_pending_deletions()
+        if not pending:
+            return [], []
+        try:
+            response = self.helper.delete_file_v0(pending)
+        except Exception:
+            return [], pending
+        failed = set(response["data"].get("failed_file_storage_tokens", []))
+        done = [token for token in pending if token not in failed]
+        self.manifest.clear_pending_deletions(done)
+        return done, [token for token in pending if token in failed]
+
+
+def _guess_content_type(file_path: str) -> str:
+    return mimetypes.guess_type(file_path)[0] or "application/octet-stream"
@@ -0,0 +1,150 @@
+import contextlib
+import hashlib
+import os
+import sqlite3
+from typing import IO, Iterable, Iterator, Tuple
+
+from square_file_store_helper.checksums import Digests
+from square_file_store_helper.pydantic_models import UploadDeduplicationStats
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadDeduplicationIndex:
+    """
+    persistent sha256 -> file_storage_token index of uploaded files.
+
+    an upload is a duplicate when its content, file name, app_id and
+    system_relative_path match an earlier upload whose token has not been deleted
+    through delete_file_v0 since.
+    """
+
+    def __init__(self, index_file_path: str):
+        self.index_file_path = os.path.abspath(index_file_path)
+        os.makedirs(os.path.dirname(self.index_file_path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS uploads (
+                    content_hash TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    app_id TEXT NOT NULL,
+                    system_relative_path TEXT NOT NULL,
+                    file_storage_token TEXT NOT NULL,
+                    PRIMARY KEY (content_hash, file_name, app_id, system_relative_path)
+                );
+                CREATE INDEX IF NOT EXISTS uploads_file_storage_token
+                    ON uploads (file_storage_token);
+                CREATE TABLE IF NOT EXISTS stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    hits INTEGER NOT NULL,
+                    misses INTEGER NOT NULL,
+                    bytes_saved INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO stats (id, hits, misses, bytes_saved)
+                    VALUES (0, 0, 0, 0);
+                """
+            )
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(
+            self.index_file_path, timeout=30, isolation_level=None
+        )
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def hash_file(file: IO, digests: Digests | None = None) -> Tuple[str, int]:
+        """
+        hashes file from its current position in chunks, then seeks back there.
+        :param digests: also fed every chunk, so they need no pass of their own.
+        :return: (sha256 hex digest, number of bytes hashed)
+        """
+        position = file.tell()
+        sha256 = hashlib.sha256()
+        size = 0
+        while chunk := file.read(_HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+            if digests is not None:
+                digests.update(chunk)
+            size += len(chunk)
+        file.seek(position)
+        return sha256.hexdigest(), size
+
+    def find(
+        self,
+        content_hash: str,
+        file_name: str,
+        app_id: int | None,
+        system_relative_path: str,
+    ) -> str | None:
+        """
+        :return: file_storage_token of an earlier identical upload, None if there is
+            none.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT file_storage_token FROM uploads WHERE content_hash = ? "
+                "AND file_name = ? AND app_id = ? AND system_relative_path = ?",
+                (content_hash, file_name, _app_id_key(app_id), system_relative_path),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def add(
+        self,
+        content_hash: str,
+        file_name: str,
+        app_id: int | None,
+        system_relative_path: str,
+        file_storage_token: str,
+    ):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO uploads (content_hash, file_name, app_id, "
+                "system_relative_path, file_storage_token) VALUES (?, ?, ?, ?, ?)",
+                (
+                    content_hash,
+                    file_name,
+                    _app_id_key(app_id),
+                    system_relative_path,
+                    file_storage_token,
+                ),
+            )
+
+    def record_hit(self, size: int):
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE stats SET hits = hits + 1, bytes_saved = bytes_saved + ?",
+                (size,),
+            )
+
+    def record_miss(self):
+        with self._connect() as connection:
+            connection.execute("UPDATE stats SET misses = misses + 1")
+
+    def invalidate(self, list_file_storage_token: Iterable[str]):
+        with self._connect() as connection:
+            connection.executemany(
+                "DELETE FROM uploads WHERE file_storage_token = ?",
+                ((token,) for token in list_file_storage_token),
+            )
+
+    def get_stats(self) -> UploadDeduplicationStats:
+        with self._connect() as connection:
+            hits, misses, bytes_saved = connection.execute(
+                "SELECT hits, misses, bytes_saved FROM stats"
+            ).fetchone()
+        return UploadDeduplicationStats(
+            hits=hits,
+            misses=misses,
+            bytes_saved=bytes_saved,
+            hit_ratio=hits / (hits + misses) if hits + misses else 0.0,
+        )
+
+
+def _app_id_key(app_id: int | None) -> str:
+    return "" if app_id is None else str(app_id)
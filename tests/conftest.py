@@ -0,0 +1,59 @@
+import tempfile
+
+import pytest
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.stub_server import StubFileStoreServer
+
+
+class FakeClock:
+    """Manually advanced clock, also advanced by the sleeps it is given for"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds: float):
+        self.sleep(seconds)
+
+
+@pytest.fixture
+def clock():
+    """Fixture for a fake clock"""
+    return FakeClock()
+
+
+@pytest.fixture
+def stub_server():
+    """Fixture for a local stub file store server"""
+    with StubFileStoreServer() as server:
+        yield server
+
+
+@pytest.fixture
+def temp_dir():
+    """Fixture for temporary directory"""
+    with tempfile.TemporaryDirectory() as temp:
+        yield temp
+
+
+@pytest.fixture
+def make_helper(stub_server):
+    """Fixture for a factory of helpers talking to the stub server, or to server"""
+
+    def make_helper(server=None, **kwargs) -> SquareFileStoreHelper:
+        server = server or stub_server
+        return SquareFileStoreHelper(
+            param_str_square_file_store_ip=server.host,
+            param_int_square_file_store_port=server.port,
+            **kwargs,
+        )
+
+    return make_helper
@@ -0,0 +1,212 @@
+from io import BytesIO
+
+import pytest
+import requests
+
+from square_file_store_helper.adaptive_concurrency import (
+    DECISION_DECREASE_ERRORS,
+    DECISION_DECREASE_LATENCY,
+    DECISION_INCREASE,
+    DECISION_SLOW_START,
+    AdaptiveConcurrencyLimiter,
+    is_overload_error,
+)
+from square_file_store_helper.concurrency import run_in_parallel
+
+
+def _http_error(status_code: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(response=response)
+
+
+def _run_window(limiter, clock, latency: float, errors=()):
+    """runs limit operations at once, all taking latency seconds"""
+    operation_count = limiter.limit
+    for _ in range(operation_count):
+        limiter.acquire()
+    clock.now += latency
+    for index in range(operation_count):
+        limiter.release(latency, errors[index] if index < len(errors) else None)
+
+
+def _limiter(clock, **kwargs):
+    kwargs.setdefault("min_window_size", 1)
+    return AdaptiveConcurrencyLimiter(clock=clock, **kwargs)
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Tests for AdaptiveConcurrencyLimiter"""
+
+    def test_slow_start_then_additive_increase(self, clock):
+        """Test the limit doubles until the first decrease and then grows by one"""
+        limiter = _limiter(clock, initial_limit=2, max_limit=10)
+
+        for _ in range(4):
+            _run_window(limiter, clock, 0.1)
+        assert limiter.limit == 10
+        _run_window(limiter, clock, 0.5)
+        _run_window(limiter, clock, 0.1)
+
+        assert [decision.reason for decision in limiter.get_stats().decisions] == [
+            DECISION_SLOW_START,
+            DECISION_SLOW_START,
+            DECISION_SLOW_START,
+            DECISION_DECREASE_LATENCY,
+            DECISION_INCREASE,
+        ]
+        assert limiter.limit == 6
+
+    def test_latency_decrease(self, clock):
+        """Test a window slower than tolerance times the baseline halves the limit"""
+        limiter = _limiter(clock, initial_limit=8, latency_tolerance=1.5)
+
+        _run_window(limiter, clock, 0.1)
+        _run_window(limiter, clock, 0.2)
+
+        decision = limiter.get_stats().decisions[-1]
+        assert decision.reason == DECISION_DECREASE_LATENCY
+        assert (decision.previous_limit, decision.limit) == (16, 8)
+        assert decision.window_latency_seconds == pytest.approx(0.2)
+        # the baseline drifts up by baseline_drift per window.
+        assert decision.baseline_latency_seconds == pytest.approx(0.105)
+
+    def test_error_decrease(self, clock):
+        """Test overload errors above max_error_rate decrease the limit"""
+        limiter = _limiter(clock, initial_limit=4, max_error_rate=0.25)
+
+        _run_window(limiter, clock, 0.1, [_http_error(404), _http_error(404)])
+        assert limiter.limit == 8
+        _run_window(limiter, clock, 0.1, [_http_error(503)] * 3)
+
+        assert limiter.limit == 4
+        assert limiter.get_stats().decisions[-1].reason == DECISION_DECREASE_ERRORS
+        assert limiter.get_stats().error_count == 3
+
+    def test_operations_started_before_a_decrease_ignored(self, clock):
+        """Test the slow operations of the old limit do not decrease it again"""
+        limiter = _limiter(clock, initial_limit=4, min_limit=1)
+        _run_window(limiter, clock, 0.1)
+        for _ in range(8):
+            limiter.acquire()
+        clock.now += 1.0
+        for _ in range(8):
+            limiter.release(1.0)
+
+        assert limiter.limit == 4
+        assert limiter.get_stats().operation_count == 12
+
+    def test_unused_limit_held(self, clock):
+        """Test the limit does not grow while fewer operations are in flight"""
+        limiter = _limiter(clock, initial_limit=4)
+
+        for _ in range(20):
+            with limiter.slot():
+                clock.now += 0.1
+
+        assert limiter.limit == 4
+        assert limiter.get_stats().decisions == []
+
+    def test_baseline_follows_a_slower_store(self, clock):
+        """Test a store that stays slower is eventually taken as the new normal"""
+        limiter = _limiter(clock, initial_limit=8, max_limit=8, min_limit=2)
+        _run_window(limiter, clock, 0.1)
+
+        for _ in range(30):
+            _run_window(limiter, clock, 0.3)
+
+        assert limiter.get_stats().decisions[-1].reason == DECISION_INCREASE
+        assert limiter.limit == 8
+
+    def test_stats_and_on_decision(self, clock):
+        """Test the state and every decision are exposed"""
+        decisions = []
+        limiter = AdaptiveConcurrencyLimiter(
+            max_error_rate=0.5, on_decision=decisions.append, clock=clock
+        )
+
+        with pytest.raises(requests.ConnectionError):
+            with limiter.slot():
+                clock.now += 0.1
+                raise requests.ConnectionError()
+        _run_window(limiter, clock, 0.1)
+        limiter.acquire()
+        stats = limiter.get_stats()
+
+        assert decisions == stats.decisions
+        assert stats.limit == limiter.limit == 8
+        assert stats.in_flight == limiter.in_flight == 1
+        assert stats.operation_count == 5
+        assert stats.error_count == 1
+        assert stats.slow_start
+        assert stats.last_window_latency_seconds == pytest.approx(0.1)
+
+    def test_invalid_values(self):
+        """Test inconsistent limits and factors are rejected"""
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(initial_limit=8, max_limit=4)
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(backoff_ratio=1)
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(latency_tolerance=0.5)
+
+    def test_is_overload_error(self):
+        """Test only connection errors, timeouts, 429 and 5xx count"""
+        assert is_overload_error(_http_error(429))
+        assert is_overload_error(_http_error(503))
+        assert is_overload_error(requests.Timeout())
+        assert not is_overload_error(_http_error(404))
+        assert not is_overload_error(ValueError())
+
+
+class TestAdaptiveConcurrencyAgainstStub:
+    """Tests for the limiter driving requests to a stub server"""
+
+    def test_limit_follows_capacity(self, stub_server, make_helper):
+        """Test the limit grows past the node's capacity and is then cut back"""
+        stub_server.response_delay_seconds = 0.03
+        stub_server.max_concurrent_requests = 4
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=64)
+
+        with make_helper(param_int_max_connections_per_host=64) as helper:
+            outcomes = run_in_parallel(
+                lambda _: helper.delete_file_v0(["missing"]),
+                range(300),
+                64,
+                limiter,
+            )
+
+        stats = limiter.get_stats()
+        reasons = [decision.reason for decision in stats.decisions]
+        first_decrease = reasons.index(DECISION_DECREASE_LATENCY)
+        assert all(error is None for _, error in outcomes)
+        assert stats.operation_count == 300
+        assert stats.in_flight == 0
+        assert reasons[0] == DECISION_SLOW_START
+        # slow start overshoots the 4 slots before the queueing latency cuts it.
+        assert max(decision.limit for decision in stats.decisions) > 4
+        # the exact limit depends on timing, it stays well below max_workers.
+        assert all(decision.limit < 32 for decision in stats.decisions[first_decrease:])
+
+    def test_bulk_helpers_back_off_on_errors(self, stub_server, make_helper, temp_dir):
+        """Test the bulk helpers report their outcomes to concurrency_limiter"""
+        stub_server.files["token"] = ("a.bin", b"x" * 1000, "text/plain")
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_window_size=4)
+
+        with make_helper() as helper:
+            stub_server.faults = [503] * 4
+            outputs = helper.upload_files_in_bulk_v0(
+                [("a.txt", BytesIO(b"a"), "text/plain")] * 8,
+                max_workers=4,
+                concurrency_limiter=limiter,
+            )
+            helper.download_files_in_bulk_v0(
+                ["token"], temp_dir, concurrency_limiter=limiter
+            )
+
+        assert sum(output.error is not None for output in outputs) == 4
+        stats = limiter.get_stats()
+        assert stats.operation_count == 9
+        assert stats.error_count == 4
+        assert stats.decisions[0].reason == DECISION_DECREASE_ERRORS
+        assert stats.decisions[0].limit == 2
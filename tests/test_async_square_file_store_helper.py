@@ -0,0 +1,136 @@
+import asyncio
+import os
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip("httpx")
+
+import httpx
+
+from square_file_store_helper import AsyncSquareFileStoreHelper
+from square_file_store_helper.pydantic_models import (
+    UploadFileV0Response,
+    DeleteFilesV0Response,
+)
+from square_file_store_helper.response_decoding import UploadFileV0Result
+
+
+def _helper(stub_server):
+    return AsyncSquareFileStoreHelper(
+        param_str_square_file_store_ip=stub_server.host,
+        param_int_square_file_store_port=stub_server.port,
+    )
+
+
+class TestInitialization:
+    """Tests for AsyncSquareFileStoreHelper initialization"""
+
+    def test_default_params(self):
+        """Test initialization with default parameters"""
+        helper = AsyncSquareFileStoreHelper()
+        assert helper.global_str_square_file_store_url_base == "http://localhost:10100"
+        asyncio.run(helper.aclose())
+
+
+class TestUploadAndDownload:
+    """Tests for the async upload, download and delete round trip"""
+
+    def test_upload_file_using_file_path(self, stub_server, temp_dir):
+        """Test a file uploaded by path is stored with its name and content type"""
+        file_path = os.path.join(temp_dir, "notes.txt")
+        with open(file_path, "wb") as f:
+            f.write(b"async content")
+
+        async def run():
+            async with _helper(stub_server) as helper:
+                return await helper.upload_file_using_file_path_v0(
+                    file_path=file_path, app_id=3, response_as_pydantic=True
+                )
+
+        response = asyncio.run(run())
+
+        assert isinstance(response.data, UploadFileV0Response)
+        assert stub_server.files[response.data.main] == (
+            "notes.txt",
+            b"async content",
+            "text/plain",
+        )
+
+    def test_round_trip_using_tuple(self, stub_server, temp_dir):
+        """Test upload using tuple, download and delete"""
+
+        async def run():
+            async with _helper(stub_server) as helper:
+                upload_response = await helper.upload_file_using_tuple_v0(
+                    file=("report 1.pdf", BytesIO(b"%PDF" * 1000), "application/pdf"),
+                    chunk_size=512,
+                )
+                token = upload_response["data"]["main"]
+                downloaded_file_path = await helper.download_file_v0(
+                    token, temp_dir, chunk_size=100
+                )
+                delete_response = await helper.delete_file_v0(
+                    [token], response_as_pydantic=True
+                )
+                return token, downloaded_file_path, delete_response
+
+        token, downloaded_file_path, delete_response = asyncio.run(run())
+
+        assert downloaded_file_path == f"{temp_dir}{os.sep}report 1.pdf"
+        with open(downloaded_file_path, "rb") as f:
+            assert f.read() == b"%PDF" * 1000
+        assert os.listdir(temp_dir) == ["report 1.pdf"]
+        assert isinstance(delete_response.data, DeleteFilesV0Response)
+        assert delete_response.data.main == [token]
+        assert stub_server.files == {}
+
+    def test_response_as_result(self, stub_server):
+        """Test uploads and deletes can return StandardResult objects"""
+
+        async def run():
+            async with _helper(stub_server) as helper:
+                upload = await helper.upload_file_using_tuple_v0(
+                    file=("a.txt", BytesIO(b"a"), "text/plain"),
+                    response_as_result=True,
+                )
+                delete = await helper.delete_file_v0(
+                    [upload.data.main], response_as_result=True
+                )
+                return upload, delete
+
+        upload, delete = asyncio.run(run())
+
+        assert isinstance(upload.data, UploadFileV0Result)
+        assert delete.data.main == [upload.data.main]
+        assert stub_server.files == {}
+
+    def test_concurrent_uploads(self, stub_server):
+        """Test many uploads can be in flight at once"""
+
+        async def run():
+            async with _helper(stub_server) as helper:
+                return await asyncio.gather(
+                    *(
+                        helper.upload_file_using_tuple_v0(
+                            file=(f"{i}.txt", BytesIO(str(i).encode()), "text/plain")
+                        )
+                        for i in range(50)
+                    )
+                )
+
+        responses = asyncio.run(run())
+
+        assert len({response["data"]["main"] for response in responses}) == 50
+        assert len(stub_server.files) == 50
+
+    def test_download_missing_file(self, stub_server, temp_dir):
+        """Test downloading an unknown token raises and writes nothing"""
+
+        async def run():
+            async with _helper(stub_server) as helper:
+                await helper.download_file_v0("missing", temp_dir)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(run())
+        assert os.listdir(temp_dir) == []
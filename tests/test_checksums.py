@@ -0,0 +1,286 @@
+import base64
+import hashlib
+import io
+import os
+
+import pytest
+
+from square_file_store_helper.checksums import (
+    DigestMismatchError,
+    Digests,
+    get_expected_digests,
+)
+from square_file_store_helper.content_encoding import CompressionPolicy
+from square_file_store_helper.download_cache import DownloadCache
+from square_file_store_helper.response_decoding import UploadFileV0Result
+from square_file_store_helper.retry import RetryEngine, RetryPolicy
+from square_file_store_helper.upload_deduplication import UploadDeduplicationIndex
+
+CONTENT = bytes(range(256)) * 400
+ALGORITHMS = ["sha256", "blake2b", "crc32c"]
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+REPR_DIGEST = f"sha-256=:{base64.b64encode(hashlib.sha256(CONTENT).digest()).decode()}:"
+WRONG_REPR_DIGEST = f"sha-256=:{base64.b64encode(bytes(32)).decode()}:"
+
+
+@pytest.fixture
+def stub_server(stub_server):
+    """Fixture for a local stub file store server holding CONTENT"""
+    stub_server.files["token"] = ("a.bin", CONTENT, "application/octet-stream")
+    return stub_server
+
+
+def _expected_hexdigests(content: bytes = CONTENT):
+    digests = Digests(ALGORITHMS)
+    digests.update(content)
+    return digests.hexdigests()
+
+
+class TestDigests:
+    """Tests for Digests and get_expected_digests"""
+
+    def test_known_values(self):
+        """Test every algorithm against a reference value"""
+        digests = Digests(ALGORITHMS)
+        digests.update(b"1234")
+        digests.update(b"56789")
+
+        assert digests.hexdigests() == {
+            "sha256": hashlib.sha256(b"123456789").hexdigest(),
+            "blake2b": hashlib.blake2b(b"123456789").hexdigest(),
+            "crc32c": "e3069283",
+        }
+
+    def test_reset_and_update_from_file(self, temp_dir):
+        """Test digests start over and can read a prefix of a file"""
+        file_path = os.path.join(temp_dir, "file")
+        with open(file_path, "wb") as file:
+            file.write(b"123456789")
+        digests = Digests(["sha256"])
+        digests.update(b"garbage")
+        digests.reset()
+
+        digests.update_from_file(file_path, 4)
+        digests.update(b"56789")
+
+        assert (
+            digests.hexdigests()["sha256"] == hashlib.sha256(b"123456789").hexdigest()
+        )
+
+    def test_invalid_algorithm(self):
+        """Test unsupported algorithms are rejected"""
+        with pytest.raises(ValueError):
+            Digests(["md5"])
+
+    def test_expected_digests(self):
+        """Test Repr-Digest wins over Digest and unknown algorithms are skipped"""
+        sha256 = hashlib.sha256(b"a").digest()
+        headers = {
+            "Digest": "SHA-256=" + base64.b64encode(bytes(32)).decode() + ", MD5=xx",
+            "Repr-Digest": f"sha-256=:{base64.b64encode(sha256).decode()}:, "
+            "crc32c=:not base64!:",
+        }
+
+        assert get_expected_digests(headers) == {"sha256": sha256}
+        assert get_expected_digests({**headers, "Content-Encoding": "gzip"}) == {}
+
+    def test_verify(self):
+        """Test only the computed algorithms are checked"""
+        digests = Digests(["sha256"])
+        digests.update(b"a")
+
+        digests.verify({"sha256": hashlib.sha256(b"a").digest(), "crc32c": b"xxxx"})
+        with pytest.raises(DigestMismatchError) as error:
+            digests.verify({"sha256": bytes(32)})
+        assert error.value.algorithm == "sha256"
+
+
+class TestUploadDigests:
+    """Tests for digest_algorithms of the uploads"""
+
+    def test_file_path_upload(self, stub_server, make_helper, temp_dir):
+        """Test the digests of the sent content are added to data.digests"""
+        file_path = os.path.join(temp_dir, "a.bin")
+        with open(file_path, "wb") as file:
+            file.write(CONTENT)
+
+        with make_helper() as helper:
+            response = helper.upload_file_using_file_path_v0(
+                file_path, digest_algorithms=ALGORITHMS
+            )
+            result = helper.upload_file_using_tuple_v0(
+                ("a.bin", io.BytesIO(CONTENT), "application/octet-stream"),
+                response_as_result=True,
+                digest_algorithms=["sha256"],
+            )
+
+        assert response["data"]["digests"] == _expected_hexdigests()
+        assert stub_server.files[response["data"]["main"]][1] == CONTENT
+        assert isinstance(result.data, UploadFileV0Result)
+        assert result.data.digests == {"sha256": SHA256}
+        assert result.to_pydantic().data.digests == {"sha256": SHA256}
+
+    def test_replayed_upload(self, stub_server, make_helper):
+        """Test a replayed upload hashes the content once"""
+        stub_server.faults = [503]
+        engine = RetryEngine(
+            policies={"upload_file/v0": RetryPolicy(initial_backoff=0)},
+            sleep=lambda seconds: None,
+        )
+
+        with make_helper(param_retry_engine=engine) as helper:
+            response = helper.upload_file_using_tuple_v0(
+                ("a.bin", io.BytesIO(CONTENT), "text/plain"),
+                digest_algorithms=["sha256"],
+            )
+
+        assert stub_server.request_count == 2
+        assert response["data"]["digests"] == {"sha256": SHA256}
+
+    def test_deduplicated_upload(self, stub_server, make_helper, temp_dir):
+        """Test digests come from the deduplication hashing pass, hits included"""
+        index = UploadDeduplicationIndex(os.path.join(temp_dir, "index.sqlite3"))
+
+        with make_helper(param_upload_deduplication_index=index) as helper:
+            responses = [
+                helper.upload_file_using_tuple_v0(
+                    ("a.bin", io.BytesIO(CONTENT), "text/plain"),
+                    digest_algorithms=ALGORITHMS,
+                )
+                for _ in range(2)
+            ]
+
+        assert stub_server.request_count == 1
+        for response in responses:
+            assert response["data"]["digests"] == _expected_hexdigests()
+
+
+class TestDownloadDigests:
+    """Tests for digest_algorithms of the downloads"""
+
+    def test_download_file_v0(self, stub_server, make_helper, temp_dir):
+        """Test digests are returned and checked against Repr-Digest"""
+        stub_server.repr_digests["token"] = REPR_DIGEST
+
+        with make_helper() as helper:
+            output = helper.download_file_v0(
+                "token", temp_dir, digest_algorithms=ALGORITHMS
+            )
+
+        assert output.digests == _expected_hexdigests()
+        assert output.bytes_written == len(CONTENT)
+        with open(output.file_path, "rb") as file:
+            assert file.read() == CONTENT
+
+    @pytest.mark.parametrize(
+        "method", ["download_file_v0", "decoded", "stream", "ranges"]
+    )
+    def test_mismatch_discarded(self, stub_server, make_helper, temp_dir, method):
+        """Test a body not matching Repr-Digest is not left on disk"""
+        stub_server.repr_digests["token"] = WRONG_REPR_DIGEST
+        kwargs = {}
+        if method == "decoded":
+            kwargs["param_compression_policy"] = CompressionPolicy()
+
+        with make_helper(**kwargs) as helper:
+            with pytest.raises(DigestMismatchError):
+                if method in ("download_file_v0", "decoded"):
+                    helper.download_file_v0(
+                        "token", temp_dir, digest_algorithms=["sha256"]
+                    )
+                else:
+                    helper.download_file_using_stream_v0(
+                        "token",
+                        temp_dir,
+                        chunk_size=10000,
+                        connection_count=2 if method == "ranges" else 1,
+                        digest_algorithms=["sha256"],
+                    )
+
+        assert os.listdir(temp_dir) == []
+
+    def test_resumed_download(self, stub_server, make_helper, temp_dir):
+        """Test digests carry on over resumed transfers and earlier .part files"""
+        stub_server.repr_digests["token"] = REPR_DIGEST
+        # the second call drops its first response once it finds the .part file.
+        stub_server.download_interruptions = 3
+        stub_server.download_interruption_after_bytes = 30000
+
+        with make_helper() as helper:
+            with pytest.raises(Exception):
+                helper.download_file_using_stream_v0(
+                    "token",
+                    temp_dir,
+                    chunk_size=1000,
+                    max_resume_attempts=0,
+                    digest_algorithms=ALGORITHMS,
+                )
+            output = helper.download_file_using_stream_v0(
+                "token", temp_dir, chunk_size=1000, digest_algorithms=ALGORITHMS
+            )
+
+        assert stub_server.range_headers == [None, None, "bytes=30000-", "bytes=60000-"]
+        assert output.digests == _expected_hexdigests()
+
+    def test_ranged_download(self, stub_server, make_helper, temp_dir):
+        """Test parallel range downloads report the digests of the whole file"""
+        stub_server.repr_digests["token"] = REPR_DIGEST
+
+        with make_helper() as helper:
+            output = helper.download_file_using_stream_v0(
+                "token",
+                temp_dir,
+                chunk_size=10000,
+                connection_count=3,
+                digest_algorithms=ALGORITHMS,
+            )
+
+        assert output.digests == _expected_hexdigests()
+
+    def test_cached_download(self, make_helper, temp_dir):
+        """Test cache hits report digests and the cache reuses the sha256"""
+        cache = DownloadCache(os.path.join(temp_dir, "cache"))
+        output_folder_path = os.path.join(temp_dir, "out")
+
+        with make_helper(param_download_cache=cache) as helper:
+            outputs = [
+                helper.download_file_using_stream_v0(
+                    "token", output_folder_path, digest_algorithms=["sha256"]
+                )
+                for _ in range(2)
+            ]
+
+        assert [output.from_cache for output in outputs] == [False, True]
+        assert outputs[1].digests == {"sha256": SHA256}
+        assert cache.get("token")[1].endswith(SHA256)
+
+    def test_bulk_download(self, stub_server, make_helper, temp_dir):
+        """Test digests per token and mismatches reported as errors"""
+        stub_server.files["bad"] = ("b.bin", CONTENT, "application/octet-stream")
+        stub_server.repr_digests["token"] = REPR_DIGEST
+        stub_server.repr_digests["bad"] = WRONG_REPR_DIGEST
+
+        with make_helper() as helper:
+            output = helper.download_files_in_bulk_v0(
+                ["token", "bad"], temp_dir, digest_algorithms=["sha256"]
+            )
+
+        assert output.digests == {"token": {"sha256": SHA256}}
+        assert isinstance(output.errors["bad"], DigestMismatchError)
+        assert os.listdir(temp_dir) == ["a.bin"]
+
+    def test_sink(self, stub_server, make_helper):
+        """Test sink downloads return digests and raise on a mismatch"""
+        stub_server.repr_digests["token"] = REPR_DIGEST
+
+        with make_helper() as helper:
+            output = helper.download_file_to_sink_v0(
+                "token", bytearray(), digest_algorithms=["sha256"]
+            )
+            stub_server.repr_digests["token"] = WRONG_REPR_DIGEST
+            with pytest.raises(DigestMismatchError):
+                helper.download_file_to_sink_v0(
+                    "token", bytearray(), digest_algorithms=["sha256"]
+                )
+
+        assert output.digests == {"sha256": SHA256}
@@ -0,0 +1,241 @@
+import io
+import os
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from square_file_store_helper.content_encoding import (
+    SUPPORTED_ENCODINGS,
+    CompressionPolicy,
+    get_decompressor,
+)
+from square_file_store_helper.retry import RetryEngine
+
+CSV_CONTENT = b"".join(f"{i},name {i},{i * 3}\n".encode() for i in range(5000))
+
+
+class TestCompressionPolicy:
+    """Tests for CompressionPolicy"""
+
+    @pytest.mark.parametrize(
+        "content_type, size, expected",
+        [
+            ("text/csv", 10_000, True),
+            ("text/plain; charset=utf-8", 10_000, True),
+            ("application/json", None, True),
+            ("application/ld+json", 10_000, True),
+            ("text/csv", 100, False),
+            ("image/png", 10_000, False),
+            ("application/zip", 10_000, False),
+            ("application/octet-stream", 10_000, False),
+        ],
+    )
+    def test_should_compress(self, content_type, size, expected):
+        """Test content type and size decide whether an upload is compressed"""
+        policy = CompressionPolicy(upload_encoding="gzip")
+
+        assert policy.should_compress(content_type, size) is expected
+
+    def test_incompressible_types_win(self):
+        """Test already compressed types are skipped even when "*/*" is allowed"""
+        policy = CompressionPolicy(
+            upload_encoding="gzip", compressible_content_types=["*/*"]
+        )
+
+        assert policy.should_compress("application/octet-stream", 10_000)
+        assert not policy.should_compress("application/gzip", 10_000)
+        assert not policy.should_compress("video/mp4", 10_000)
+
+    def test_upload_encoding_none(self):
+        """Test uploads are not compressed unless upload_encoding is set"""
+        assert CompressionPolicy().upload_encoding is None
+        assert not CompressionPolicy(upload_encoding=None).should_compress(
+            "text/csv", 10_000
+        )
+
+    def test_invalid_arguments(self):
+        """Test unknown encodings and negative sizes are rejected"""
+        with pytest.raises(ValueError):
+            CompressionPolicy(upload_encoding="br")
+        with pytest.raises(ValueError):
+            CompressionPolicy(download_encodings=["br"])
+        with pytest.raises(ValueError):
+            CompressionPolicy(min_size=-1)
+
+    @pytest.mark.parametrize("encoding", SUPPORTED_ENCODINGS)
+    def test_compress_round_trip(self, encoding):
+        """Test compressed chunks decode to the input and update the stats"""
+        policy = CompressionPolicy(upload_encoding=encoding)
+        chunks = [CSV_CONTENT[i : i + 4096] for i in range(0, len(CSV_CONTENT), 4096)]
+
+        compressed = b"".join(policy.compress(chunks))
+
+        assert get_decompressor(encoding).decompress(compressed) == CSV_CONTENT
+        stats = policy.get_stats()
+        assert stats.uploads_compressed == 1
+        assert stats.upload_bytes_uncompressed == len(CSV_CONTENT)
+        assert stats.upload_bytes_sent == len(compressed)
+        assert stats.upload_compression_ratio == len(CSV_CONTENT) / len(compressed)
+
+    def test_accept_encoding(self):
+        """Test download encodings are advertised in order of preference"""
+        assert CompressionPolicy(download_encodings=["gzip"]).accept_encoding == "gzip"
+        assert CompressionPolicy(download_encodings=[]).accept_encoding is None
+
+
+class TestCompressedUpload:
+    """Tests for uploads through a CompressionPolicy"""
+
+    @pytest.mark.parametrize("encoding", SUPPORTED_ENCODINGS)
+    def test_tuple_upload(self, stub_server, make_helper, encoding):
+        """Test a compressible upload is sent encoded and stored decoded"""
+        policy = CompressionPolicy(upload_encoding=encoding)
+
+        with make_helper(param_compression_policy=policy) as helper:
+            token = helper.upload_file_using_tuple_v0(
+                ("data.csv", io.BytesIO(CSV_CONTENT), "text/csv")
+            )["data"]["main"]
+
+        assert stub_server.files[token] == ("data.csv", CSV_CONTENT, "text/csv")
+        assert stub_server.request_encodings == [encoding]
+        stats = policy.get_stats()
+        assert stats.uploads_compressed == 1
+        assert stats.upload_bytes_sent < len(CSV_CONTENT)
+        assert stats.upload_compression_ratio > 2
+
+    def test_default_policy_uploads_uncompressed(self, stub_server, make_helper):
+        """Test a policy set for downloads leaves uploads uncompressed"""
+        policy = CompressionPolicy()
+
+        with make_helper(param_compression_policy=policy) as helper:
+            token = helper.upload_file_using_tuple_v0(
+                ("data.csv", io.BytesIO(CSV_CONTENT), "text/csv")
+            )["data"]["main"]
+
+        assert stub_server.files[token][1] == CSV_CONTENT
+        assert stub_server.request_encodings == []
+        assert policy.get_stats().uploads_compressed == 0
+
+    def test_file_path_upload_skips_sendfile(self, stub_server, make_helper, temp_dir):
+        """Test compressed regular files are read instead of sent with sendfile"""
+        file_path = os.path.join(temp_dir, "data.json")
+        with open(file_path, "wb") as f:
+            f.write(CSV_CONTENT)
+
+        with patch("os.sendfile") as mock_sendfile:
+            with make_helper(
+                param_compression_policy=CompressionPolicy(upload_encoding="gzip")
+            ) as helper:
+                token = helper.upload_file_using_file_path_v0(file_path)["data"]["main"]
+
+        mock_sendfile.assert_not_called()
+        assert stub_server.files[token][1] == CSV_CONTENT
+        assert stub_server.request_encodings == ["gzip"]
+
+    def test_incompressible_upload_skipped(self, stub_server, make_helper):
+        """Test already compressed content is uploaded as is"""
+        policy = CompressionPolicy(upload_encoding="gzip")
+        content = os.urandom(10_000)
+
+        with make_helper(param_compression_policy=policy) as helper:
+            token = helper.upload_file_using_tuple_v0(
+                ("photo.png", io.BytesIO(content), "image/png")
+            )["data"]["main"]
+
+        assert stub_server.files[token][1] == content
+        assert stub_server.request_encodings == []
+        assert policy.get_stats().uploads_skipped == 1
+
+    def test_retried_upload_recompressed(self, stub_server, make_helper):
+        """Test a retried upload compresses the rewound file again"""
+        stub_server.faults = [503]
+
+        with make_helper(
+            param_compression_policy=CompressionPolicy(upload_encoding="gzip"),
+            param_retry_engine=RetryEngine(sleep=lambda _: None),
+        ) as helper:
+            token = helper.upload_file_using_tuple_v0(
+                ("data.csv", io.BytesIO(CSV_CONTENT), "text/csv")
+            )["data"]["main"]
+
+        assert stub_server.files[token][1] == CSV_CONTENT
+
+
+class TestCompressedDownload:
+    """Tests for downloads through a CompressionPolicy"""
+
+    @pytest.mark.parametrize("encoding", SUPPORTED_ENCODINGS)
+    def test_download_file_v0(self, stub_server, make_helper, temp_dir, encoding):
+        """Test a compressed response is decoded to disk and its ratio recorded"""
+        stub_server.files["token"] = ("data.csv", CSV_CONTENT, "text/csv")
+        stub_server.response_encodings = [encoding]
+        policy = CompressionPolicy()
+        progress = []
+
+        with make_helper(param_compression_policy=policy) as helper:
+            file_path = helper.download_file_v0(
+                "token",
+                temp_dir,
+                progress_callback=lambda done, total: progress.append(done),
+            )
+
+        with open(file_path, "rb") as f:
+            assert f.read() == CSV_CONTENT
+        assert progress[-1] == len(CSV_CONTENT)
+        stats = policy.get_stats()
+        assert stats.downloads_compressed == 1
+        assert stats.download_bytes_decoded == len(CSV_CONTENT)
+        assert stats.download_bytes_received < len(CSV_CONTENT)
+        assert stats.download_compression_ratio > 2
+
+    @pytest.mark.parametrize("encoding", [None, "gzip"])
+    def test_interrupted_download_not_kept(
+        self, stub_server, make_helper, temp_dir, encoding
+    ):
+        """Test a connection dropped mid-body leaves neither the file nor a part"""
+        stub_server.files["token"] = (
+            "a.txt",
+            os.urandom(4 * 1024 * 1024),
+            "text/plain",
+        )
+        stub_server.response_encodings = [encoding] if encoding else []
+        stub_server.download_interruptions = 1
+        stub_server.download_interruption_after_bytes = 2 * 1024 * 1024
+
+        with make_helper(param_compression_policy=CompressionPolicy()) as helper:
+            with pytest.raises(requests.exceptions.RequestException):
+                helper.download_file_v0("token", temp_dir)
+
+        assert os.listdir(temp_dir) == []
+
+    def test_download_file_using_stream_v0(self, stub_server, make_helper, temp_dir):
+        """Test streamed downloads decode the response while writing the part file"""
+        stub_server.files["token"] = ("data.csv", CSV_CONTENT, "text/csv")
+        stub_server.response_encodings = ["gzip"]
+        policy = CompressionPolicy()
+
+        with make_helper(param_compression_policy=policy) as helper:
+            output = helper.download_file_using_stream_v0(
+                "token", temp_dir, chunk_size=4096
+            )
+
+        with open(output.file_path, "rb") as f:
+            assert f.read() == CSV_CONTENT
+        assert output.bytes_written == len(CSV_CONTENT)
+        assert policy.get_stats().downloads_compressed == 1
+
+    def test_uncompressed_response(self, stub_server, make_helper, temp_dir):
+        """Test identity responses are written as is and counted apart"""
+        stub_server.files["token"] = ("data.csv", CSV_CONTENT, "text/csv")
+        policy = CompressionPolicy()
+
+        with make_helper(param_compression_policy=policy) as helper:
+            file_path = helper.download_file_v0("token", temp_dir)
+
+        with open(file_path, "rb") as f:
+            assert f.read() == CSV_CONTENT
+        stats = policy.get_stats()
+        assert stats.downloads_uncompressed == 1
+        assert stats.downloads_compressed == 0
+        assert stats.download_compression_ratio == 0.0
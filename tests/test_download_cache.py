@@ -0,0 +1,239 @@
+import multiprocessing
+import os
+
+import pytest
+
+from square_file_store_helper.download_cache import DownloadCache
+
+
+def _write(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _put_from_process(cache_folder_path, source_folder_path, index):
+    cache = DownloadCache(cache_folder_path)
+    for i in range(10):
+        file_path = _write(
+            os.path.join(source_folder_path, f"{index}-{i}.bin"),
+            f"{index}-{i}".encode(),
+        )
+        cache.put(f"token-{index}-{i}", f"{i}.bin", file_path)
+
+
+class TestDownloadCache:
+    """Tests for DownloadCache"""
+
+    def test_hit_survives_restart(self, temp_dir):
+        """Test cached contents are found again by a new cache instance"""
+        cache_folder_path = os.path.join(temp_dir, "cache")
+        source = _write(os.path.join(temp_dir, "source.txt"), b"cached content")
+        DownloadCache(cache_folder_path).put("token", "name.txt", source)
+        os.remove(source)
+
+        cache = DownloadCache(cache_folder_path)
+        destination = os.path.join(temp_dir, "copy.txt")
+
+        assert cache.copy_to("token", destination) == "name.txt"
+        assert _read(destination) == b"cached content"
+        assert cache.get("missing") is None
+        assert cache.copy_to("missing", destination) is None
+
+    def test_copy_unless_linked(self, temp_dir):
+        """Test copies are independent of the cache, links share its storage"""
+        cache = DownloadCache(os.path.join(temp_dir, "cache"))
+        cache.put("token", "a.txt", _write(os.path.join(temp_dir, "a.txt"), b"cached"))
+        blob_path = cache.get("token")[1]
+        copy_path = os.path.join(temp_dir, "copy.txt")
+        link_path = os.path.join(temp_dir, "link.txt")
+
+        cache.copy_to("token", copy_path)
+        cache.copy_to("token", link_path, link=True)
+        _write(copy_path, b"overwritten")
+
+        assert _read(blob_path) == b"cached"
+        assert os.path.samefile(link_path, blob_path)
+
+    def test_identical_contents_stored_once(self, temp_dir):
+        """Test tokens with identical contents share one stored copy"""
+        cache = DownloadCache(os.path.join(temp_dir, "cache"))
+        source = _write(os.path.join(temp_dir, "source.txt"), b"same")
+        cache.put("token1", "a.txt", source)
+        cache.put("token2", "b.txt", source)
+
+        assert cache.get_size() == 4
+        assert cache.get("token1")[1] == cache.get("token2")[1]
+
+        cache.invalidate(["token1"])
+        assert cache.get("token1") is None
+        assert cache.get("token2")[0] == "b.txt"
+
+        cache.invalidate(["token2"])
+        assert cache.get_size() == 0
+
+    def test_least_recently_used_evicted(self, temp_dir):
+        """Test the least recently used contents are evicted beyond max_size_bytes"""
+        cache = DownloadCache(os.path.join(temp_dir, "cache"), max_size_bytes=25)
+        for name in ("a", "b"):
+            cache.put(
+                name, name, _write(os.path.join(temp_dir, name), name.encode() * 10)
+            )
+        cache.get("a")
+        cache.put("c", "c", _write(os.path.join(temp_dir, "c"), b"c" * 10))
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+        assert cache.get_size() == 20
+
+    def test_too_large_file_not_cached(self, temp_dir):
+        """Test files bigger than the cache are not stored"""
+        cache = DownloadCache(os.path.join(temp_dir, "cache"), max_size_bytes=3)
+        cache.put("token", "big", _write(os.path.join(temp_dir, "big"), b"1234"))
+
+        assert cache.get("token") is None
+
+    def test_clear(self, temp_dir):
+        """Test clear drops everything"""
+        cache = DownloadCache(os.path.join(temp_dir, "cache"))
+        cache.put("token", "a", _write(os.path.join(temp_dir, "a"), b"a"))
+
+        cache.clear()
+
+        assert cache.get("token") is None
+        assert cache.get_size() == 0
+
+    def test_concurrent_processes(self, temp_dir):
+        """Test several processes can fill the same cache"""
+        cache_folder_path = os.path.join(temp_dir, "cache")
+        DownloadCache(cache_folder_path)
+        processes = [
+            multiprocessing.get_context("spawn").Process(
+                target=_put_from_process, args=(cache_folder_path, temp_dir, index)
+            )
+            for index in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        cache = DownloadCache(cache_folder_path)
+        for index in range(4):
+            for i in range(10):
+                _, blob_path = cache.get(f"token-{index}-{i}")
+                assert _read(blob_path) == f"{index}-{i}".encode()
+
+
+class TestHelperWithDownloadCache:
+    """Tests for SquareFileStoreHelper with a download cache"""
+
+    def _helper(self, make_helper, temp_dir):
+        return make_helper(
+            param_download_cache=DownloadCache(os.path.join(temp_dir, "cache"))
+        )
+
+    def test_stream_download_served_from_cache(
+        self, stub_server, make_helper, temp_dir
+    ):
+        """Test a second download does not contact the server"""
+        stub_server.files["token"] = ("model.bin", b"weights", "text/plain")
+        output_folder_path = os.path.join(temp_dir, "output")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            first = helper.download_file_using_stream_v0("token", output_folder_path)
+            os.remove(first.file_path)
+            second = helper.download_file_using_stream_v0("token", output_folder_path)
+
+        assert not first.from_cache
+        assert second.from_cache
+        assert second.file_path == first.file_path
+        assert _read(second.file_path) == b"weights"
+        assert stub_server.range_headers == [None]
+        assert os.listdir(output_folder_path) == ["model.bin"]
+
+    def test_buffered_download_served_from_cache(
+        self, stub_server, make_helper, temp_dir
+    ):
+        """Test download_file_v0 uses the cache as well"""
+        stub_server.files["token"] = ("template.txt", b"template", "text/plain")
+        output_folder_path = os.path.join(temp_dir, "output")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            helper.download_file_v0("token", output_folder_path)
+            stub_server.files.clear()
+            file_path = helper.download_file_v0("token", output_folder_path)
+
+        assert _read(file_path) == b"template"
+
+    def test_cache_hit_not_shared(self, stub_server, make_helper, temp_dir):
+        """Test writing to a file served from the cache leaves the cache intact"""
+        stub_server.files["token"] = ("a.txt", b"content", "text/plain")
+        output_folder_path = os.path.join(temp_dir, "output")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            helper.download_file_v0("token", output_folder_path)
+            _write(helper.download_file_v0("token", output_folder_path), b"changed")
+            stream_output = helper.download_file_using_stream_v0(
+                "token", output_folder_path
+            )
+            _write(stream_output.file_path, b"changed")
+            file_path = helper.download_file_v0("token", output_folder_path)
+
+        assert stream_output.from_cache
+        assert _read(file_path) == b"content"
+
+    def test_bulk_download_served_from_cache(self, stub_server, make_helper, temp_dir):
+        """Test bulk downloads use the cache and still resolve collisions"""
+        stub_server.files["t1"] = ("a.txt", b"1", "text/plain")
+        stub_server.files["t2"] = ("a.txt", b"2", "text/plain")
+        output_folder_path = os.path.join(temp_dir, "output")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            helper.download_files_in_bulk_v0(["t1", "t2"], output_folder_path)
+            stub_server.files.clear()
+            result = helper.download_files_in_bulk_v0(["t1", "t2"], output_folder_path)
+
+        assert result.errors == {}
+        assert _read(result.file_paths["t1"]) == b"1"
+        assert _read(result.file_paths["t2"]) == b"2"
+
+    def test_delete_invalidates_cache(self, stub_server, make_helper, temp_dir):
+        """Test delete_file_v0 drops the cached entries of the deleted tokens"""
+        stub_server.files["token"] = ("file.txt", b"old", "text/plain")
+        output_folder_path = os.path.join(temp_dir, "output")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            helper.download_file_using_stream_v0("token", output_folder_path)
+            helper.delete_file_v0(["token"])
+            assert helper.global_object_download_cache.get("token") is None
+            with pytest.raises(Exception):
+                helper.download_file_using_stream_v0("token", output_folder_path)
+
+    def test_failed_delete_keeps_cache(self, stub_server, make_helper, temp_dir):
+        """Test entries of tokens the store failed to delete stay cached"""
+        stub_server.files["t1"] = ("a.txt", b"1", "text/plain")
+        stub_server.files["t2"] = ("b.txt", b"2", "text/plain")
+        output_folder_path = os.path.join(temp_dir, "output")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            helper.download_files_in_bulk_v0(["t1", "t2"], output_folder_path)
+            cache = helper.global_object_download_cache
+            stub_server.faults = [503]
+            with pytest.raises(Exception):
+                helper.delete_file_v0(["t1"])
+            assert cache.get("t1") is not None
+            stub_server.faults = [503]
+            response = helper.delete_file_v0(
+                ["t1", "t2"], max_batch_size=1, max_workers=1
+            )
+
+        assert response["data"]["failed_file_storage_tokens"] == ["t1"]
+        assert cache.get("t1") is not None
+        assert cache.get("t2") is None
@@ -0,0 +1,217 @@
+import asyncio
+import io
+import os
+
+import pytest
+import requests
+
+from square_file_store_helper.download_cache import DownloadCache
+from square_file_store_helper.download_stream import get_sink_writer
+
+CONTENT = bytes(range(256)) * 400
+FILE_NAME = "données é.bin"
+
+
+@pytest.fixture
+def stub_server(stub_server):
+    """Fixture for a local stub file store server holding CONTENT"""
+    stub_server.files["token"] = (FILE_NAME, CONTENT, "application/octet-stream")
+    return stub_server
+
+
+class _PartialWriter:
+    """writable taking at most 3 bytes per call, like a raw pipe"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data[:3]
+        return min(3, len(data))
+
+
+class _FullWriter:
+    """writable that stopped taking bytes"""
+
+    def write(self, data):
+        return 0
+
+
+class TestGetSinkWriter:
+    """Tests for get_sink_writer"""
+
+    def test_bytearray_is_appended_to(self):
+        """Test a bytearray grows with every chunk"""
+        sink = bytearray(b"x")
+        write = get_sink_writer(sink)
+
+        write(b"ab")
+        write(b"cd")
+
+        assert sink == b"xabcd"
+
+    def test_partial_writes_completed(self):
+        """Test writes are repeated until the whole chunk is taken"""
+        sink = _PartialWriter()
+
+        get_sink_writer(sink)(b"0123456789")
+
+        assert sink.data == b"0123456789"
+
+    def test_stalled_writes_raise(self):
+        """Test a sink taking no bytes raises instead of being called forever"""
+        with pytest.raises(OSError):
+            get_sink_writer(_FullWriter())(b"0123456789")
+
+    def test_buffer_filled_from_start(self):
+        """Test writable buffers are filled in order and must be large enough"""
+        buffer = bytearray(5)
+        write = get_sink_writer(memoryview(buffer))
+
+        write(b"abc")
+        write(b"de")
+
+        assert buffer == b"abcde"
+        with pytest.raises(ValueError):
+            write(b"f")
+
+    @pytest.mark.parametrize("sink", [b"read only", 1])
+    def test_invalid_sink(self, sink):
+        """Test read only buffers and other objects are rejected"""
+        with pytest.raises(TypeError):
+            get_sink_writer(sink)
+
+
+class TestDownloadToSink:
+    """Tests for download_file_to_sink_v0"""
+
+    @pytest.mark.parametrize("sink_type", ["bytearray", "bytes_io", "memoryview"])
+    def test_sinks(self, make_helper, temp_dir, sink_type):
+        """Test the body reaches every kind of sink and nothing is written to disk"""
+        buffer = bytearray(len(CONTENT))
+        sinks = {
+            "bytearray": (bytearray(), lambda sink: sink),
+            "bytes_io": (io.BytesIO(), lambda sink: sink.getvalue()),
+            "memoryview": (memoryview(buffer), lambda sink: buffer),
+        }
+        sink, get_data = sinks[sink_type]
+
+        with make_helper() as helper:
+            output = helper.download_file_to_sink_v0("token", sink, chunk_size=4096)
+
+        assert get_data(sink) == CONTENT
+        assert output.file_name == FILE_NAME
+        assert output.bytes_written == len(CONTENT)
+        assert not output.from_cache
+        assert os.listdir(temp_dir) == []
+
+    def test_resumes_after_interruptions(self, stub_server, make_helper):
+        """Test interrupted transfers continue after the bytes already written"""
+        stub_server.download_interruptions = 2
+        stub_server.download_interruption_after_bytes = 30000
+        sink = bytearray()
+        progress = []
+
+        with make_helper() as helper:
+            helper.download_file_to_sink_v0(
+                "token",
+                sink,
+                chunk_size=1000,
+                progress_callback=lambda done, total: progress.append((done, total)),
+            )
+
+        assert sink == CONTENT
+        assert stub_server.range_headers == [None, "bytes=30000-", "bytes=60000-"]
+        assert progress[-1] == (len(CONTENT), len(CONTENT))
+
+    def test_no_resume_without_range_support(self, stub_server, make_helper):
+        """Test servers without Accept-Ranges fail the download"""
+        stub_server.support_ranges = False
+        stub_server.download_interruptions = 1
+        stub_server.download_interruption_after_bytes = 30000
+
+        with make_helper() as helper:
+            with pytest.raises(requests.exceptions.ChunkedEncodingError):
+                helper.download_file_to_sink_v0("token", bytearray())
+
+    def test_served_from_download_cache(self, stub_server, make_helper, temp_dir):
+        """Test cached tokens are read from the cache without a request"""
+        cache = DownloadCache(os.path.join(temp_dir, "cache"))
+        with make_helper(param_download_cache=cache) as helper:
+            helper.download_file_v0("token", os.path.join(temp_dir, "out"))
+            request_count = stub_server.request_count
+            sink = bytearray()
+
+            output = helper.download_file_to_sink_v0("token", sink)
+
+        assert sink == CONTENT
+        assert output.from_cache
+        assert output.file_name == FILE_NAME
+        assert stub_server.request_count == request_count
+
+
+class TestOpenDownloadStream:
+    """Tests for open_download_stream_v0"""
+
+    def test_iterate(self, make_helper):
+        """Test the file name is known before the body is read"""
+        with make_helper() as helper:
+            with helper.open_download_stream_v0("token", chunk_size=1000) as stream:
+                assert stream.file_name == FILE_NAME
+                assert stream.content_length == len(CONTENT)
+                chunks = list(stream)
+
+        assert b"".join(chunks) == CONTENT
+        assert max(map(len, chunks)) <= 1000
+
+    def test_close_early(self, make_helper):
+        """Test a stream closed before the end can be followed by other requests"""
+        with make_helper() as helper:
+            with helper.open_download_stream_v0("token", chunk_size=1000) as stream:
+                next(iter(stream))
+            output = helper.download_file_to_sink_v0("token", bytearray())
+
+        assert output.bytes_written == len(CONTENT)
+
+    def test_missing_token(self, make_helper):
+        """Test errors are raised when opening the stream"""
+        with make_helper() as helper:
+            with pytest.raises(requests.HTTPError):
+                helper.open_download_stream_v0("missing")
+
+
+class TestAsyncDownloadToSink:
+    """Tests for the async sink and stream downloads"""
+
+    def test_sink_and_stream(self, stub_server):
+        """Test async sinks may be awaited and streams expose the file name"""
+        httpx = pytest.importorskip("httpx")
+        from square_file_store_helper import AsyncSquareFileStoreHelper
+
+        class AsyncSink:
+            def __init__(self):
+                self.data = bytearray()
+
+            async def write(self, data):
+                self.data += data
+
+        async def run():
+            async with AsyncSquareFileStoreHelper(
+                param_str_square_file_store_ip=stub_server.host,
+                param_int_square_file_store_port=stub_server.port,
+            ) as helper:
+                sink = AsyncSink()
+                output = await helper.download_file_to_sink_v0("token", sink)
+                async with await helper.open_download_stream_v0("token") as stream:
+                    chunks = [chunk async for chunk in stream]
+                with pytest.raises(httpx.HTTPStatusError):
+                    await helper.open_download_stream_v0("missing")
+                return sink, output, stream, chunks
+
+        sink, output, stream, chunks = asyncio.run(run())
+
+        assert sink.data == CONTENT
+        assert output.file_name == FILE_NAME
+        assert output.bytes_written == len(CONTENT)
+        assert stream.file_name == FILE_NAME
+        assert b"".join(chunks) == CONTENT
@@ -0,0 +1,193 @@
+import functools
+import os
+import time
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip("h2")
+pytest.importorskip("httpx")
+
+from square_file_store_helper.concurrency import run_in_parallel
+from square_file_store_helper.content_encoding import CompressionPolicy
+from square_file_store_helper.http2_transport import HTTP2Adapter, speaks_h2c
+from square_file_store_helper.instrumentation import InstrumentationRegistry
+from square_file_store_helper.retry import RetryEngine, RetryPolicy
+from square_file_store_helper.stub_server import StubFileStoreServer
+
+CONTENT = bytes(range(256)) * 400
+
+
+@pytest.fixture
+def stub_server():
+    """Fixture for a local stub file store server speaking h2c"""
+    with StubFileStoreServer(http2=True) as server:
+        server.files["token"] = ("a.bin", CONTENT, "application/octet-stream")
+        yield server
+
+
+@pytest.fixture
+def make_helper(make_helper):
+    """Fixture for a factory of helpers with param_bool_http2"""
+    return functools.partial(make_helper, param_bool_http2=True)
+
+
+class TestSpeaksH2c:
+    """Tests for the h2c probe"""
+
+    def test_probe(self, stub_server):
+        """Test h2c servers are told apart from HTTP/1.1 only ones"""
+        with StubFileStoreServer() as http1_server:
+            assert not speaks_h2c(http1_server.host, http1_server.port, 5)
+
+        assert speaks_h2c(stub_server.host, stub_server.port, 5)
+
+    def test_unreachable(self, stub_server):
+        """Test unreachable servers raise instead of being marked HTTP/1.1"""
+        stub_server.stop()
+
+        with pytest.raises(OSError):
+            speaks_h2c(stub_server.host, stub_server.port, 5)
+
+
+class TestHTTP2Helper:
+    """Tests for param_bool_http2"""
+
+    def test_every_endpoint_on_one_connection(self, stub_server, make_helper, temp_dir):
+        """Test uploads, downloads and deletes share a single connection"""
+        file_path = os.path.join(temp_dir, "b.bin")
+        with open(file_path, "wb") as file:
+            file.write(CONTENT)
+        output_folder_path = os.path.join(temp_dir, "out")
+
+        with make_helper() as helper:
+            assert isinstance(
+                helper.global_object_session.get_adapter("http://"), HTTP2Adapter
+            )
+            tokens = [
+                helper.upload_file_using_tuple_v0(
+                    ("a.txt", BytesIO(b"x" * 1000), "text/plain")
+                )["data"]["main"],
+                # zero copy file regions are read into buffers.
+                helper.upload_file_using_file_path_v0(file_path)["data"]["main"],
+                helper.upload_file_using_file_path_v0(file_path, stream=True)["data"][
+                    "main"
+                ],
+            ]
+            downloaded_file_path = helper.download_file_v0(
+                tokens[1], output_folder_path
+            )
+            output = helper.download_file_using_stream_v0(
+                "token", output_folder_path, chunk_size=10000, connection_count=4
+            )
+            deleted = helper.delete_file_v0(tokens)
+
+        assert [stub_server.files.get(token) for token in tokens] == [None] * 3
+        assert deleted["data"]["main"] == tokens
+        with open(downloaded_file_path, "rb") as file:
+            assert file.read() == CONTENT
+        with open(output.file_path, "rb") as file:
+            assert file.read() == CONTENT
+        # the h2c probe and the multiplexed connection.
+        assert stub_server.connection_count == 2
+
+    def test_concurrent_requests_multiplexed(self, stub_server, make_helper):
+        """Test concurrent requests run as parallel streams of one connection"""
+        stub_server.response_delay_seconds = 0.2
+
+        with make_helper() as helper:
+            started_at = time.perf_counter()
+            outcomes = run_in_parallel(
+                lambda _: helper.delete_file_v0(["missing"]), range(20), 20
+            )
+            elapsed = time.perf_counter() - started_at
+
+        assert all(error is None for _, error in outcomes)
+        assert elapsed < 2.0
+        assert stub_server.connection_count == 2
+
+    def test_http1_fallback(self, make_helper, temp_dir):
+        """Test servers without h2c are used over HTTP/1.1"""
+        with StubFileStoreServer() as http1_server:
+            with make_helper(http1_server) as helper:
+                token = helper.upload_file_using_tuple_v0(
+                    ("a.txt", BytesIO(b"x" * 1000), "text/plain")
+                )["data"]["main"]
+                file_path = helper.download_file_v0(token, temp_dir)
+                adapter = helper.global_object_session.get_adapter("http://")
+
+        with open(file_path, "rb") as file:
+            assert file.read() == b"x" * 1000
+        assert not adapter.uses_http2(http1_server.url_base)
+
+    def test_resumed_download(self, stub_server, make_helper, temp_dir):
+        """Test reset streams are resumed with range requests"""
+        stub_server.download_interruptions = 2
+        stub_server.download_interruption_after_bytes = 30000
+
+        with make_helper() as helper:
+            output = helper.download_file_using_stream_v0(
+                "token", temp_dir, chunk_size=1000
+            )
+
+        with open(output.file_path, "rb") as file:
+            assert file.read() == CONTENT
+        assert stub_server.range_headers == [None, "bytes=30000-", "bytes=60000-"]
+
+    def test_reset_retried(self, stub_server, make_helper):
+        """Test reset streams are connection errors for the retry engine"""
+        stub_server.faults = ["reset", 503]
+        engine = RetryEngine(
+            policies={"delete_files/v0": RetryPolicy(initial_backoff=0)},
+            sleep=lambda seconds: None,
+        )
+
+        with make_helper(param_retry_engine=engine) as helper:
+            response = helper.delete_file_v0(["missing"])
+
+        assert response["data"]["main"] == []
+        assert stub_server.request_count == 3
+
+    def test_compressed_download(self, stub_server, make_helper, temp_dir):
+        """Test content encoded responses are decoded and their ratio recorded"""
+        stub_server.response_encodings = ["gzip"]
+        policy = CompressionPolicy(compressible_content_types=["*/*"])
+
+        with make_helper(param_compression_policy=policy) as helper:
+            file_path = helper.download_file_v0("token", temp_dir)
+
+        with open(file_path, "rb") as file:
+            assert file.read() == CONTENT
+        stats = policy.get_stats()
+        assert stats.downloads_compressed == 1
+        assert stats.download_bytes_received < len(CONTENT)
+
+    def test_instrumentation_and_progress(self, make_helper):
+        """Test timings and upload progress are reported as over HTTP/1.1"""
+        registry = InstrumentationRegistry()
+        registry.events = []
+        registry.subscribe(registry.events.append)
+        progress = []
+
+        with make_helper(param_instrumentation_registry=registry) as helper:
+            for _ in range(2):
+                helper.upload_file_using_tuple_v0(
+                    ("a.bin", BytesIO(CONTENT), "application/octet-stream"),
+                    progress_callback=lambda done, total: progress.append(
+                        (done, total)
+                    ),
+                )
+
+        first, second = registry.events
+        assert [event.status_code for event in registry.events] == [201, 201]
+        assert not first.connection_reused
+        assert first.connect_seconds > 0
+        assert second.connection_reused
+        for event in registry.events:
+            assert event.bytes_sent > len(CONTENT)
+            assert event.send_seconds >= 0
+            assert event.time_to_first_byte_seconds >= 0
+        total = progress[-1][1]
+        assert total > len(CONTENT)
+        assert progress[-1] == (total, total)
+        assert len(progress) > 2
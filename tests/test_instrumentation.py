@@ -0,0 +1,257 @@
+import os
+from io import BytesIO
+
+import pytest
+
+from square_file_store_helper.instrumentation import (
+    NULL_REQUEST_TRACKER,
+    InstrumentationRegistry,
+    get_current_request_tracker,
+    track_request,
+)
+from square_file_store_helper.pydantic_models import RequestTimings
+
+
+@pytest.fixture
+def registry():
+    """Fixture for a registry with metrics enabled and a recording listener"""
+    registry = InstrumentationRegistry()
+    registry.enable_metrics()
+    registry.events = []
+    registry.subscribe(registry.events.append)
+    return registry
+
+
+class TestInstrumentationRegistry:
+    """Tests for InstrumentationRegistry"""
+
+    def test_inactive_registry_skips_tracking(self):
+        """Test nothing is tracked while nothing is subscribed"""
+        registry = InstrumentationRegistry()
+
+        assert not registry.is_active
+        with track_request(registry, "delete_files/v0", "DELETE") as tracker:
+            assert tracker is NULL_REQUEST_TRACKER
+            assert get_current_request_tracker() is None
+
+    def test_subscribe_and_unsubscribe(self):
+        """Test listeners receive events until unsubscribed"""
+        registry = InstrumentationRegistry()
+        events = []
+        registry.subscribe(events.append)
+        with track_request(registry, "delete_files/v0", "DELETE") as tracker:
+            assert get_current_request_tracker() is tracker
+        registry.unsubscribe(events.append)
+
+        assert not registry.is_active
+        assert len(events) == 1
+        assert events[0].endpoint == "delete_files/v0"
+        assert get_current_request_tracker() is None
+
+    def test_histogram_buckets(self):
+        """Test latencies land in the first bucket whose upper bound covers them"""
+        registry = InstrumentationRegistry(latency_buckets=[0.1, 1.0])
+        registry.enable_metrics()
+        for total_seconds in (0.05, 0.1, 0.5, 2.0):
+            registry.record(
+                RequestTimings(
+                    endpoint="download_file/v0",
+                    method="GET",
+                    total_seconds=total_seconds,
+                )
+            )
+
+        histogram = registry.export_metrics()["download_file/v0"].latency_histogram
+        assert histogram.bucket_upper_bounds == [0.1, 1.0, float("inf")]
+        assert histogram.bucket_counts == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(2.65)
+
+        registry.reset_metrics()
+        assert registry.export_metrics() == {}
+
+
+class TestTimingEvents:
+    """Tests for per request timing events"""
+
+    def test_events_per_endpoint(self, make_helper, temp_dir, registry):
+        """Test upload, download and delete each emit a timing event"""
+        with make_helper(param_instrumentation_registry=registry) as helper:
+            token = helper.upload_file_using_tuple_v0(
+                ("a.txt", BytesIO(b"x" * 1000), "text/plain")
+            )["data"]["main"]
+            helper.download_file_using_stream_v0(token, temp_dir)
+            helper.delete_file_v0([token])
+
+        upload, download, delete = registry.events
+        assert [event.endpoint for event in registry.events] == [
+            "upload_file/v0",
+            "download_file/v0",
+            "delete_files/v0",
+        ]
+        assert [event.status_code for event in registry.events] == [201, 200, 200]
+        assert not upload.connection_reused
+        assert upload.connect_seconds > 0
+        assert download.connection_reused
+        assert download.connect_seconds == 0
+        assert upload.bytes_sent > 1000
+        assert download.bytes_received == 1000
+        assert download.disk_write_seconds > 0
+        for event in registry.events:
+            assert event.error is None
+            assert event.send_seconds >= 0
+            assert event.time_to_first_byte_seconds >= 0
+            assert event.transfer_seconds >= 0
+            assert event.total_seconds >= event.time_to_first_byte_seconds
+
+        metrics = registry.export_metrics()
+        assert metrics["download_file/v0"].request_count == 1
+        assert metrics["download_file/v0"].bytes_received == 1000
+        assert metrics["upload_file/v0"].latency_histogram.count == 1
+        assert metrics["delete_files/v0"].error_count == 0
+
+    def test_failed_request_event(self, make_helper, temp_dir, registry):
+        """Test a failed request is reported with its status and error"""
+        with make_helper(param_instrumentation_registry=registry) as helper:
+            with pytest.raises(Exception):
+                helper.download_file_v0("missing", temp_dir)
+
+        (event,) = registry.events
+        assert event.status_code == 404
+        assert event.error == "HTTPError"
+        assert registry.export_metrics()["download_file/v0"].error_count == 1
+
+    def test_every_range_request_reported(
+        self, stub_server, make_helper, temp_dir, registry
+    ):
+        """Test ranged downloads emit one event per request"""
+        stub_server.files["token"] = ("big.bin", os.urandom(4000), "text/plain")
+
+        with make_helper(param_instrumentation_registry=registry) as helper:
+            helper.download_file_using_stream_v0(
+                "token", temp_dir, chunk_size=1000, connection_count=4
+            )
+
+        assert len(registry.events) == 5
+        assert sum(event.bytes_received for event in registry.events[1:]) == 4000
+
+
+class TestProgressCallbacks:
+    """Tests for upload and download progress callbacks"""
+
+    def test_upload_progress(self, make_helper):
+        """Test upload progress counts request body bytes up to the total"""
+        progress = []
+
+        with make_helper() as helper:
+            helper.upload_file_using_tuple_v0(
+                ("a.bin", BytesIO(os.urandom(200_000)), "application/octet-stream"),
+                progress_callback=lambda done, total: progress.append((done, total)),
+            )
+
+        total = progress[-1][1]
+        assert total > 200_000
+        assert progress[-1] == (total, total)
+        assert len(progress) > 1
+        assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+
+    def test_streamed_generator_upload_progress(self, make_helper):
+        """Test chunked uploads report progress with an unknown total"""
+        progress = []
+
+        with make_helper() as helper:
+            helper.upload_file_using_tuple_v0(
+                ("a.txt", (b"x" * 100 for _ in range(10)), "text/plain"),
+                stream=True,
+                progress_callback=lambda done, total: progress.append((done, total)),
+            )
+
+        assert all(total is None for _, total in progress)
+        assert progress[-1][0] > 1000
+
+    def test_stream_download_progress(self, stub_server, make_helper, temp_dir):
+        """Test stream download progress reaches the file size"""
+        stub_server.files["token"] = ("a.bin", os.urandom(5000), "text/plain")
+        progress = []
+
+        with make_helper() as helper:
+            helper.download_file_using_stream_v0(
+                "token",
+                temp_dir,
+                chunk_size=1000,
+                progress_callback=lambda done, total: progress.append((done, total)),
+            )
+
+        assert progress == [(1000 * i, 5000) for i in range(1, 6)]
+
+    def test_open_stream_progress_isolated(self, stub_server, make_helper):
+        """Test requests made while a stream is open are not reported to it"""
+        stub_server.files["token"] = ("a.bin", os.urandom(5000), "text/plain")
+        progress = []
+
+        with make_helper() as helper:
+            with helper.open_download_stream_v0(
+                "token",
+                chunk_size=1000,
+                progress_callback=lambda done, total: progress.append((done, total)),
+            ) as stream:
+                chunks = iter(stream)
+                next(chunks)
+                assert get_current_request_tracker() is None
+                helper.upload_file_using_tuple_v0(
+                    ("a.bin", BytesIO(os.urandom(200_000)), "text/plain")
+                )
+                list(chunks)
+
+        assert progress == [(1000 * i, 5000) for i in range(1, 6)]
+
+    def test_streams_closed_out_of_order(self, stub_server, make_helper, registry):
+        """Test no tracker is left installed whichever stream is closed first"""
+        stub_server.files["token"] = ("a.bin", os.urandom(5000), "text/plain")
+
+        with make_helper(param_instrumentation_registry=registry) as helper:
+            first = helper.open_download_stream_v0("token", chunk_size=1000)
+            second = helper.open_download_stream_v0("token", chunk_size=1000)
+            next(iter(first))
+            next(iter(second))
+            first.close()
+            second.close()
+            assert get_current_request_tracker() is None
+            helper.delete_file_v0(["token"])
+
+        assert [event.endpoint for event in registry.events] == [
+            "download_file/v0",
+            "download_file/v0",
+            "delete_files/v0",
+        ]
+
+    def test_ranged_download_progress(self, stub_server, make_helper, temp_dir):
+        """Test parallel ranges share one progress"""
+        stub_server.files["token"] = ("a.bin", os.urandom(4000), "text/plain")
+        progress = []
+
+        with make_helper() as helper:
+            helper.download_file_using_stream_v0(
+                "token",
+                temp_dir,
+                chunk_size=500,
+                connection_count=4,
+                progress_callback=lambda done, total: progress.append((done, total)),
+            )
+
+        assert progress[-1] == (4000, 4000)
+        assert len(progress) == 8
+
+    def test_buffered_download_progress(self, stub_server, make_helper, temp_dir):
+        """Test download_file_v0 reports completion"""
+        stub_server.files["token"] = ("a.txt", b"content", "text/plain")
+        progress = []
+
+        with make_helper() as helper:
+            helper.download_file_v0(
+                "token",
+                temp_dir,
+                progress_callback=lambda done, total: progress.append((done, total)),
+            )
+
+        assert progress == [(7, 7)]
@@ -0,0 +1,249 @@
+from io import BytesIO
+
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.load_balancing import EndpointPool
+from square_file_store_helper.stub_server import StubFileStoreServer
+
+
+@pytest.fixture
+def stub_servers():
+    """Fixture for three local stub file store servers holding the same files"""
+    servers = [StubFileStoreServer().start() for _ in range(3)]
+    for server in servers:
+        server.files["token"] = ("a.txt", b"replicated", "text/plain")
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def _connection_error(url_base):
+    raise requests.ConnectionError(f"{url_base} is down.")
+
+
+class TestEndpointPool:
+    """Tests for EndpointPool"""
+
+    def test_weighted_round_robin(self):
+        """Test nodes are picked smoothly in proportion to their weights"""
+        pool = EndpointPool(
+            [("http://a", 3), ("http://b", 1)], strategy="weighted_round_robin"
+        )
+
+        picks = [pool.call(lambda url_base: url_base) for _ in range(8)]
+
+        assert picks == ["http://a", "http://a", "http://b", "http://a"] * 2
+
+    def test_least_outstanding_requests(self):
+        """Test a busy node is avoided while idle nodes are spread evenly"""
+        pool = EndpointPool(["http://a", "http://b", "http://c"])
+
+        nested = pool.call(lambda outer: (outer, pool.call(lambda inner: inner)))
+        picks = [pool.call(lambda url_base: url_base) for _ in range(3)]
+
+        assert nested[0] != nested[1]
+        assert sorted(picks) == ["http://a", "http://b", "http://c"]
+
+    def test_failover_ejection_and_readmission(self, clock):
+        """Test failing nodes are skipped, ejected and re-admitted later"""
+        down = {"http://a"}
+        pool = EndpointPool(
+            ["http://a", "http://b"],
+            failure_threshold=2,
+            ejection_seconds=10,
+            clock=clock,
+        )
+
+        def send(url_base):
+            if url_base in down:
+                _connection_error(url_base)
+            return url_base
+
+        picks = [pool.call(send) for _ in range(6)]
+
+        assert picks == ["http://b"] * 6
+        node_stats = {stats.url_base: stats for stats in pool.get_node_stats()}
+        assert node_stats["http://a"].ejected
+        assert node_stats["http://a"].total_failures == 2
+        assert node_stats["http://b"].total_failures == 0
+
+        down.clear()
+        clock.now = 10
+        picks = [pool.call(send) for _ in range(4)]
+        assert picks.count("http://a") == 2
+        assert not pool.get_node_stats()[0].ejected
+
+    def test_ejection_time_doubles(self, clock):
+        """Test repeated ejections last longer"""
+        pool = EndpointPool(
+            ["http://a", "http://b"],
+            failure_threshold=1,
+            ejection_seconds=10,
+            clock=clock,
+        )
+
+        def send(url_base):
+            if url_base == "http://a":
+                _connection_error(url_base)
+            return url_base
+
+        pool.call(send)
+        clock.now = 10
+        pool.call(send)
+        pool.call(send)
+        clock.now = 29
+        assert pool.get_node_stats()[0].ejected
+        clock.now = 30
+        assert not pool.get_node_stats()[0].ejected
+        assert pool.get_node_stats()[0].ejection_count == 2
+
+    def test_request_errors_not_failed_over(self):
+        """Test 4xx responses are not a node failure"""
+        pool = EndpointPool(["http://a", "http://b"])
+        response = requests.Response()
+        response.status_code = 404
+        calls = []
+
+        def send(url_base):
+            calls.append(url_base)
+            raise requests.HTTPError(response=response)
+
+        with pytest.raises(requests.HTTPError):
+            pool.call(send)
+
+        assert len(calls) == 1
+        assert all(stats.total_failures == 0 for stats in pool.get_node_stats())
+
+    def test_unreplayable_not_failed_over(self):
+        """Test a request that cannot be replayed is sent once"""
+        pool = EndpointPool(["http://a", "http://b"])
+
+        with pytest.raises(requests.ConnectionError):
+            pool.call(_connection_error, replayable=False)
+
+        assert sum(stats.total_requests for stats in pool.get_node_stats()) == 1
+
+    @pytest.mark.parametrize(
+        "error, failed_over",
+        [
+            (requests.ReadTimeout(), False),
+            (requests.ConnectionError("reset"), False),
+            (500, False),
+            (503, True),
+            (requests.ConnectionError(NewConnectionError(None, "refused")), True),
+        ],
+    )
+    def test_non_idempotent_failed_over_when_unprocessed(self, error, failed_over):
+        """Test uploads fail over only when the first node cannot have stored them"""
+        if isinstance(error, int):
+            response = requests.Response()
+            response.status_code = error
+            error = requests.HTTPError(response=response)
+        pool = EndpointPool(["http://a", "http://b"])
+        calls = []
+
+        def send(url_base):
+            calls.append(url_base)
+            if len(calls) == 1:
+                raise error
+            return "ok"
+
+        if failed_over:
+            assert pool.call(send, idempotent=False) == "ok"
+        else:
+            with pytest.raises(type(error)):
+                pool.call(send, idempotent=False)
+
+        assert len(calls) == (2 if failed_over else 1)
+        assert pool.get_node_stats()[0].total_failures == 1
+
+    def test_all_nodes_down(self):
+        """Test the last failure is raised once every node was tried"""
+        pool = EndpointPool(["http://a", "http://b"], failure_threshold=1)
+
+        with pytest.raises(requests.ConnectionError):
+            pool.call(_connection_error)
+        # every node is ejected, requests are still attempted.
+        with pytest.raises(requests.ConnectionError):
+            pool.call(_connection_error)
+
+        assert [stats.total_requests for stats in pool.get_node_stats()] == [2, 2]
+
+    def test_invalid_values(self):
+        """Test invalid settings are rejected"""
+        with pytest.raises(ValueError):
+            EndpointPool([])
+        with pytest.raises(ValueError):
+            EndpointPool([("http://a", 0)])
+        with pytest.raises(ValueError):
+            EndpointPool(["http://a"], strategy="random")
+
+
+class TestHelperWithEndpointPool:
+    """Tests for SquareFileStoreHelper balancing over several stub servers"""
+
+    def _helper(self, stub_servers, **kwargs):
+        return SquareFileStoreHelper(
+            param_endpoint_pool=EndpointPool(
+                [server.url_base for server in stub_servers], **kwargs
+            )
+        )
+
+    def test_requests_spread(self, stub_servers, temp_dir):
+        """Test sequential requests reach every node"""
+        with self._helper(stub_servers) as helper:
+            assert (
+                helper.global_str_square_file_store_url_base == stub_servers[0].url_base
+            )
+            for _ in range(6):
+                helper.download_file_v0("token", temp_dir)
+
+        assert [server.request_count for server in stub_servers] == [2, 2, 2]
+
+    def test_failover_when_node_killed(self, stub_servers, temp_dir):
+        """Test requests keep succeeding when a node goes down"""
+        with self._helper(stub_servers, failure_threshold=1) as helper:
+            for _ in range(3):
+                helper.download_file_using_stream_v0("token", temp_dir)
+            stub_servers[1].stop()
+            for _ in range(6):
+                result = helper.download_file_using_stream_v0("token", temp_dir)
+                with open(result.file_path, "rb") as f:
+                    assert f.read() == b"replicated"
+            node_stats = helper.global_object_endpoint_pool.get_node_stats()
+
+        assert node_stats[1].ejected
+        assert node_stats[1].total_failures == 1
+
+    def test_failover_on_server_error(self, stub_servers):
+        """Test a 503 from one node is retried on another"""
+        stub_servers[0].faults = [503]
+
+        with self._helper(stub_servers) as helper:
+            response = helper.delete_file_v0(["token"])
+
+        assert response["data"]["main"] == ["token"]
+        assert sum(server.request_count for server in stub_servers) == 2
+
+    @pytest.mark.parametrize("fault, failed_over", [(503, True), (500, False)])
+    def test_upload_failover(self, stub_servers, fault, failed_over):
+        """Test an upload is sent to another node only after an unprocessed status"""
+        stub_servers[0].faults = [fault]
+
+        with self._helper(stub_servers) as helper:
+            if failed_over:
+                helper.upload_file_using_tuple_v0(
+                    ("a.txt", BytesIO(b"content"), "text/plain")
+                )
+            else:
+                with pytest.raises(requests.HTTPError):
+                    helper.upload_file_using_tuple_v0(
+                        ("a.txt", BytesIO(b"content"), "text/plain")
+                    )
+
+        assert sum(server.request_count for server in stub_servers) == (
+            2 if failed_over else 1
+        )
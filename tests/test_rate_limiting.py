@@ -0,0 +1,199 @@
+import asyncio
+import io
+
+import pytest
+
+from square_file_store_helper.concurrency import run_in_parallel
+from square_file_store_helper.rate_limiting import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    RateLimiter,
+    TokenBucket,
+    get_rate_limit_priority,
+    rate_limit_priority,
+)
+
+CONTENT = bytes(range(256)) * 400
+
+
+@pytest.fixture
+def stub_server(stub_server):
+    """Fixture for a local stub file store server holding CONTENT"""
+    stub_server.files["token"] = ("a.bin", CONTENT, "application/octet-stream")
+    return stub_server
+
+
+def _limiter(clock, **kwargs):
+    return RateLimiter(
+        clock=clock, sleep=clock.sleep, async_sleep=clock.async_sleep, **kwargs
+    )
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket"""
+
+    def test_interactive_skips_ahead_of_bulk(self, clock):
+        """Test bulk takers wait for the debt of interactive ones taken later"""
+        bucket = TokenBucket(10, 0, clock)
+
+        assert bucket.take(10, PRIORITY_BULK) == (True, 1.0)
+        assert bucket.take(10, PRIORITY_BULK) == (False, 1.0)
+        assert bucket.take(5, PRIORITY_INTERACTIVE) == (True, 1.5)
+        clock.now = 1.0
+        assert bucket.take(10, PRIORITY_BULK) == (False, 0.5)
+        clock.now = 1.5
+        assert bucket.take(10, PRIORITY_BULK) == (True, 1.0)
+
+    def test_capacity(self, clock):
+        """Test idle time accumulates at most capacity tokens"""
+        bucket = TokenBucket(10, 20, clock)
+        clock.now = 100.0
+
+        assert bucket.take(20, PRIORITY_INTERACTIVE) == (True, 0.0)
+        assert bucket.take(5, PRIORITY_INTERACTIVE) == (True, 0.5)
+
+    def test_invalid_rate(self, clock):
+        """Test rates must be positive"""
+        with pytest.raises(ValueError):
+            TokenBucket(0, 1, clock)
+
+
+class TestRateLimiter:
+    """Tests for RateLimiter"""
+
+    def test_byte_rate(self, clock):
+        """Test transfers are shaped to the rate after the initial burst"""
+        limiter = _limiter(clock, upload_bytes_per_second=1000)
+
+        for _ in range(50):
+            limiter.acquire_bytes("upload", 100)
+        limiter.acquire_bytes("download", 10**9)
+
+        assert clock.now == pytest.approx(4.0)
+
+    def test_request_rate_per_endpoint(self, clock):
+        """Test every endpoint has its own bucket"""
+        limiter = _limiter(
+            clock,
+            requests_per_second={"delete_files/v0": 2},
+            default_requests_per_second=10,
+            burst_seconds=0,
+        )
+
+        for _ in range(10):
+            limiter.acquire_request("delete_files/v0")
+        assert clock.now == pytest.approx(4.5)
+        for _ in range(10):
+            limiter.acquire_request("upload_file/v0")
+        assert clock.now == pytest.approx(5.4)
+
+    def test_async_acquire(self, clock):
+        """Test asyncio tasks share the buckets of the limiter"""
+        limiter = _limiter(clock, download_bytes_per_second=100, burst_seconds=0)
+
+        async def run():
+            await asyncio.gather(
+                *(limiter.async_acquire_bytes("download", 50) for _ in range(4))
+            )
+
+        asyncio.run(run())
+
+        assert clock.now == pytest.approx(2.0)
+
+    def test_invalid_values(self, clock):
+        """Test invalid directions and priorities are rejected"""
+        limiter = _limiter(clock)
+
+        with pytest.raises(ValueError):
+            limiter.acquire_bytes("sideways", 1)
+        with pytest.raises(ValueError):
+            with rate_limit_priority("urgent"):
+                pass
+        with pytest.raises(ValueError):
+            RateLimiter(burst_seconds=-1)
+
+    def test_priority_context(self):
+        """Test the priority is restored and handed on to run_in_parallel threads"""
+        with rate_limit_priority(PRIORITY_BULK):
+            outcomes = run_in_parallel(lambda _: get_rate_limit_priority(), [1, 2], 2)
+
+        assert outcomes == [(PRIORITY_BULK, None), (PRIORITY_BULK, None)]
+        assert get_rate_limit_priority() == PRIORITY_INTERACTIVE
+
+
+class TestHelperRateLimiting:
+    """Tests for param_rate_limiter"""
+
+    def test_upload_shaped(self, make_helper, clock):
+        """Test uploads are sent at the upload rate"""
+        limiter = _limiter(clock, upload_bytes_per_second=20000, burst_seconds=0.5)
+
+        with make_helper(param_rate_limiter=limiter) as helper:
+            for index in range(10):
+                helper.upload_file_using_tuple_v0(
+                    (f"{index}.bin", io.BytesIO(CONTENT[:10000]), "text/plain")
+                )
+
+        # 10 x 10000 bytes minus the 10000 bytes burst, plus the multipart framing.
+        assert 4.5 <= clock.now <= 4.8
+
+    def test_download_shaped(self, make_helper, clock):
+        """Test downloads are received at the download rate"""
+        limiter = _limiter(clock, download_bytes_per_second=50000, burst_seconds=0.2)
+
+        with make_helper(param_rate_limiter=limiter) as helper:
+            helper.download_file_to_sink_v0("token", bytearray(), chunk_size=10000)
+
+        assert clock.now == pytest.approx((len(CONTENT) - 10000) / 50000)
+
+    def test_delete_bursts_shaped(self, make_helper, clock):
+        """Test deletes are sent at the delete_files/v0 request rate"""
+        limiter = _limiter(clock, requests_per_second={"delete_files/v0": 5})
+
+        with make_helper(param_rate_limiter=limiter) as helper:
+            for _ in range(10):
+                helper.delete_file_v0(["missing"])
+
+        assert clock.now == pytest.approx(1.0)
+
+    def test_bulk_helpers_run_as_bulk(self, make_helper, clock):
+        """Test upload_files_in_bulk_v0 transfers use the bulk priority class"""
+        priorities = set()
+
+        class RecordingRateLimiter(RateLimiter):
+            def acquire_bytes(self, direction, size, priority=None):
+                priorities.add(get_rate_limit_priority())
+                super().acquire_bytes(direction, size, priority)
+
+        limiter = RecordingRateLimiter(upload_bytes_per_second=10**9)
+
+        with make_helper(param_rate_limiter=limiter) as helper:
+            helper.upload_files_in_bulk_v0(
+                [("a.txt", io.BytesIO(b"a"), "text/plain")] * 3
+            )
+            assert priorities == {PRIORITY_BULK}
+            priorities.clear()
+            helper.upload_file_using_tuple_v0(("a.txt", io.BytesIO(b"a"), "text/plain"))
+
+        assert priorities == {PRIORITY_INTERACTIVE}
+
+    def test_async_download_shaped(self, stub_server, clock):
+        """Test the async helper takes its tokens from the same limiter"""
+        pytest.importorskip("httpx")
+        from square_file_store_helper import AsyncSquareFileStoreHelper
+
+        limiter = _limiter(clock, download_bytes_per_second=50000, burst_seconds=0.2)
+
+        async def run():
+            async with AsyncSquareFileStoreHelper(
+                param_str_square_file_store_ip=stub_server.host,
+                param_int_square_file_store_port=stub_server.port,
+                param_rate_limiter=limiter,
+            ) as helper:
+                await helper.download_file_to_sink_v0(
+                    "token", bytearray(), chunk_size=10000
+                )
+
+        asyncio.run(run())
+
+        assert clock.now == pytest.approx((len(CONTENT) - 10000) / 50000)
@@ -0,0 +1,121 @@
+import io
+
+import pytest
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.pydantic_models import (
+    DeleteFilesV0Response,
+    UploadFileV0Response,
+)
+from square_file_store_helper.response_decoding import (
+    DeleteFilesV0Result,
+    StandardResult,
+    UploadFileV0Result,
+    decode_delete_files_v0_response,
+    decode_upload_file_v0_response,
+    get_standard_response_model,
+)
+
+UPLOAD_RESPONSE = {"data": {"main": "token1"}, "message": "uploaded", "log": None}
+DELETE_RESPONSE = {
+    "data": {"main": ["token1"], "failed_file_storage_tokens": ["token2"]},
+    "message": None,
+    "log": [{"error": "boom"}],
+}
+
+
+class TestDecodeResponses:
+    """Tests for the pydantic free response decoders"""
+
+    @pytest.mark.parametrize("trusted", [False, True])
+    def test_upload_response(self, trusted):
+        """Test upload responses decode into slotted results"""
+        result = decode_upload_file_v0_response(UPLOAD_RESPONSE, trusted)
+
+        assert result == StandardResult(UploadFileV0Result("token1"), "uploaded")
+        assert not hasattr(result, "__dict__")
+
+    @pytest.mark.parametrize("trusted", [False, True])
+    def test_delete_response(self, trusted):
+        """Test delete responses keep failed tokens and the log"""
+        result = decode_delete_files_v0_response(DELETE_RESPONSE, trusted)
+
+        assert result.data == DeleteFilesV0Result(["token1"], ["token2"])
+        assert result.log == [{"error": "boom"}]
+
+    def test_failed_tokens_default(self):
+        """Test a delete response without failed tokens decodes to an empty list"""
+        result = decode_delete_files_v0_response({"data": {"main": []}})
+
+        assert result.data.failed_file_storage_tokens == []
+
+    @pytest.mark.parametrize(
+        "response",
+        [
+            [],
+            {"data": "token1"},
+            {"data": {"main": 1}},
+            {"data": {}},
+            {"data": {"main": "token1"}, "message": 1},
+        ],
+    )
+    def test_invalid_upload_response(self, response):
+        """Test responses not matching the schema are rejected unless trusted"""
+        with pytest.raises(ValueError):
+            decode_upload_file_v0_response(response)
+
+    def test_invalid_delete_response(self):
+        """Test token lists must only hold strings"""
+        with pytest.raises(ValueError):
+            decode_delete_files_v0_response({"data": {"main": ["token1", None]}})
+
+    def test_to_pydantic(self):
+        """Test results convert to the equivalent pydantic models"""
+        upload = decode_upload_file_v0_response(UPLOAD_RESPONSE).to_pydantic()
+        delete = decode_delete_files_v0_response(DELETE_RESPONSE).to_pydantic()
+
+        assert upload == get_standard_response_model(UploadFileV0Response)(
+            **UPLOAD_RESPONSE
+        )
+        assert delete == get_standard_response_model(DeleteFilesV0Response)(
+            **DELETE_RESPONSE
+        )
+
+    def test_standard_response_model_cached(self):
+        """Test the StandardResponse specialization is built once"""
+        assert get_standard_response_model(
+            UploadFileV0Response
+        ) is get_standard_response_model(UploadFileV0Response)
+
+
+class TestResponseAsResult:
+    """Tests for response_as_result through the helper"""
+
+    @pytest.mark.parametrize("trusted", [False, True])
+    def test_upload_and_delete(self, stub_server, trusted):
+        """Test uploads and deletes return StandardResult objects"""
+        with SquareFileStoreHelper(
+            param_str_square_file_store_ip=stub_server.host,
+            param_int_square_file_store_port=stub_server.port,
+            param_bool_trust_responses=trusted,
+        ) as helper:
+            upload = helper.upload_file_using_tuple_v0(
+                ("a.txt", io.BytesIO(b"a"), "text/plain"), response_as_result=True
+            )
+            delete = helper.delete_file_v0([upload.data.main], response_as_result=True)
+
+        assert isinstance(upload.data, UploadFileV0Result)
+        assert delete.data.main == [upload.data.main]
+        assert stub_server.files == {}
+
+    def test_bulk_upload(self, stub_server):
+        """Test response_as_result is passed on to every bulk upload"""
+        with SquareFileStoreHelper(
+            param_str_square_file_store_ip=stub_server.host,
+            param_int_square_file_store_port=stub_server.port,
+        ) as helper:
+            outputs = helper.upload_files_in_bulk_v0(
+                [("a.txt", io.BytesIO(b"a"), "text/plain")], response_as_result=True
+            )
+
+        assert isinstance(outputs[0].response, StandardResult)
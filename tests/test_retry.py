@@ -0,0 +1,319 @@
+from io import BytesIO
+
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from square_file_store_helper.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryEngine,
+    RetryPolicy,
+    get_default_retry_policies,
+)
+
+
+def _engine(clock, **kwargs):
+    return RetryEngine(clock=clock, sleep=clock.sleep, random=lambda: 0.5, **kwargs)
+
+
+class TestRetryPolicy:
+    """Tests for RetryPolicy"""
+
+    def test_backoff(self):
+        """Test backoff grows exponentially, is capped and jittered"""
+        policy = RetryPolicy(initial_backoff=0.1, max_backoff=0.5)
+
+        assert policy.get_backoff(0, 0.5) == pytest.approx(0.05)
+        assert policy.get_backoff(2, 1.0) == pytest.approx(0.4)
+        assert policy.get_backoff(5, 1.0) == pytest.approx(0.5)
+        assert RetryPolicy(jitter=False).get_backoff(1, 0.0) == pytest.approx(0.2)
+
+    def test_is_retryable(self):
+        """Test only transient failures are retryable"""
+        policy = RetryPolicy(retry_on_status_codes=[503])
+        response = requests.Response()
+        response.status_code = 503
+        assert policy.is_retryable(requests.HTTPError(response=response))
+        response.status_code = 404
+        assert not policy.is_retryable(requests.HTTPError(response=response))
+        assert policy.is_retryable(requests.ConnectionError())
+        assert not policy.is_retryable(requests.exceptions.SSLError())
+        assert not policy.is_retryable(ValueError())
+
+    def test_upload_policy_retries_only_unprocessed(self):
+        """Test uploads are retried only when the server cannot have processed them"""
+        policy = get_default_retry_policies()["upload_file/v0"]
+        response = requests.Response()
+        response.status_code = 503
+        assert policy.is_retryable(requests.HTTPError(response=response))
+        assert policy.is_retryable(requests.exceptions.ConnectTimeout())
+        assert policy.is_retryable(
+            requests.ConnectionError(NewConnectionError(None, "refused"))
+        )
+        response.status_code = 500
+        assert not policy.is_retryable(requests.HTTPError(response=response))
+        assert not policy.is_retryable(requests.ReadTimeout())
+        assert not policy.is_retryable(requests.ConnectionError())
+
+    def test_invalid_values(self):
+        """Test invalid settings are rejected"""
+        with pytest.raises(ValueError):
+            RetryPolicy(max_attempts=0)
+        with pytest.raises(ValueError):
+            RetryPolicy(deadline=0)
+
+
+class TestCircuitBreaker:
+    """Tests for CircuitBreaker"""
+
+    def test_open_half_open_closed(self, clock):
+        """Test the breaker opens, lets one trial through and closes again"""
+        circuit_breaker = CircuitBreaker(
+            failure_threshold=2, recovery_timeout=10, clock=clock
+        )
+        circuit_breaker.record_failure()
+        assert circuit_breaker.allow_request()
+        circuit_breaker.record_failure()
+        assert circuit_breaker.state == "open"
+        assert not circuit_breaker.allow_request()
+
+        clock.now = 10
+        assert circuit_breaker.allow_request()
+        assert circuit_breaker.state == "half_open"
+        assert not circuit_breaker.allow_request()
+        circuit_breaker.record_failure()
+        assert circuit_breaker.state == "open"
+
+        clock.now = 20
+        assert circuit_breaker.allow_request()
+        circuit_breaker.record_success()
+        assert circuit_breaker.state == "closed"
+        assert circuit_breaker.allow_request()
+
+    def test_neutral_outcome_frees_trial(self, clock):
+        """Test a half open trial ending in a client error lets the next one through"""
+        circuit_breaker = CircuitBreaker(
+            failure_threshold=1, recovery_timeout=10, clock=clock
+        )
+        circuit_breaker.record_failure()
+        clock.now += 10
+
+        assert circuit_breaker.allow_request()
+        circuit_breaker.record_neutral()
+        assert circuit_breaker.state == "half_open"
+        assert circuit_breaker.allow_request()
+
+
+class TestHelperWithRetries:
+    """Tests for SquareFileStoreHelper with a retry engine against injected faults"""
+
+    def test_download_retried(self, stub_server, make_helper, temp_dir, clock):
+        """Test downloads survive resets and 5xx with exponential backoff"""
+        stub_server.files["token"] = ("a.txt", b"content", "text/plain")
+        stub_server.faults = ["reset", 503, 502]
+
+        with make_helper(param_retry_engine=_engine(clock)) as helper:
+            result = helper.download_file_using_stream_v0("token", temp_dir)
+
+        with open(result.file_path, "rb") as f:
+            assert f.read() == b"content"
+        assert clock.sleeps == pytest.approx([0.05, 0.1, 0.2])
+        assert stub_server.request_count == 4
+
+    def test_buffered_download_and_delete_retried(
+        self, stub_server, make_helper, temp_dir, clock
+    ):
+        """Test download_file_v0 and delete_file_v0 are retried"""
+        stub_server.files["token"] = ("a.txt", b"content", "text/plain")
+
+        with make_helper(param_retry_engine=_engine(clock)) as helper:
+            stub_server.faults = [500]
+            helper.download_file_v0("token", temp_dir)
+            stub_server.faults = [504]
+            response = helper.delete_file_v0(["token"])
+
+        assert response["data"]["main"] == ["token"]
+        assert len(clock.sleeps) == 2
+
+    def test_gives_up_after_max_attempts(
+        self, stub_server, make_helper, temp_dir, clock
+    ):
+        """Test the last error is raised once attempts are exhausted"""
+        stub_server.faults = [503] * 10
+        engine = _engine(clock, policies={"delete_files/v0": RetryPolicy(3)})
+
+        with make_helper(param_retry_engine=engine) as helper:
+            with pytest.raises(requests.HTTPError):
+                helper.delete_file_v0(["token"])
+
+        assert stub_server.request_count == 3
+
+    def test_client_errors_not_retried(self, stub_server, make_helper, temp_dir, clock):
+        """Test a 404 fails at once"""
+        with make_helper(param_retry_engine=_engine(clock)) as helper:
+            with pytest.raises(requests.HTTPError):
+                helper.download_file_v0("missing", temp_dir)
+
+        assert clock.sleeps == []
+        assert stub_server.request_count == 1
+
+    def test_upload_replayed(self, stub_server, make_helper, clock):
+        """Test a seekable upload is sent again in full"""
+        stub_server.faults = [503, 429]
+        file = BytesIO(b"upload content")
+        file.seek(7)
+
+        with make_helper(param_retry_engine=_engine(clock)) as helper:
+            token = helper.upload_file_using_tuple_v0(
+                ("a.txt", file, "text/plain"), stream=True
+            )["data"]["main"]
+
+        assert stub_server.files[token][1] == b"content"
+        assert stub_server.request_count == 3
+
+    @pytest.mark.parametrize("fault", [500, "reset"])
+    def test_upload_not_retried_when_possibly_processed(
+        self, stub_server, make_helper, clock, fault
+    ):
+        """Test uploads are not retried on failures that may follow processing"""
+        stub_server.faults = [fault]
+
+        with make_helper(param_retry_engine=_engine(clock)) as helper:
+            with pytest.raises(requests.RequestException):
+                helper.upload_file_using_tuple_v0(
+                    ("a.txt", BytesIO(b"content"), "text/plain")
+                )
+
+        assert stub_server.request_count == 1
+
+    def test_upload_not_retried_after_read_timeout(
+        self, stub_server, make_helper, clock
+    ):
+        """Test an upload timing out once sent is not sent a second time"""
+        stub_server.response_delay_seconds = 0.5
+        engine = _engine(clock)
+        engine.get_policy("upload_file/v0").deadline = 0.2
+
+        with make_helper(param_retry_engine=engine) as helper:
+            with pytest.raises(requests.ReadTimeout):
+                helper.upload_file_using_tuple_v0(
+                    ("a.txt", BytesIO(b"content"), "text/plain")
+                )
+
+        assert stub_server.request_count == 1
+        assert clock.sleeps == []
+
+    def test_upload_retried_on_connect_error(self, stub_server, make_helper, clock):
+        """Test an upload that could not connect is retried"""
+        stub_server.stop()
+
+        with make_helper(param_retry_engine=_engine(clock)) as helper:
+            with pytest.raises(requests.ConnectionError):
+                helper.upload_file_using_tuple_v0(
+                    ("a.txt", BytesIO(b"content"), "text/plain")
+                )
+
+        assert len(clock.sleeps) == 3
+
+    def test_unreplayable_upload_not_retried(self, stub_server, make_helper, clock):
+        """Test a generator body is attempted once"""
+        stub_server.faults = [503]
+
+        with make_helper(param_retry_engine=_engine(clock)) as helper:
+            with pytest.raises(requests.HTTPError):
+                helper.upload_file_using_tuple_v0(
+                    ("a.txt", iter([b"content"]), "text/plain"), stream=True
+                )
+
+        assert stub_server.request_count == 1
+
+    def test_retry_after(self, stub_server, make_helper, clock):
+        """Test Retry-After delays the next attempt, capped by max_backoff"""
+        stub_server.faults = [429, 429]
+        stub_server.fault_retry_after = "3"
+        engine = _engine(
+            clock, policies={"delete_files/v0": RetryPolicy(max_backoff=5)}
+        )
+
+        with make_helper(param_retry_engine=engine) as helper:
+            helper.delete_file_v0(["token"])
+
+        assert clock.sleeps == [3.0, 3.0]
+
+    def test_deadline(self, stub_server, make_helper, clock):
+        """Test no attempt starts past the deadline"""
+        stub_server.faults = [503] * 10
+        engine = _engine(
+            clock,
+            policies={
+                "delete_files/v0": RetryPolicy(
+                    max_attempts=10, initial_backoff=1, jitter=False, deadline=5
+                )
+            },
+        )
+
+        with make_helper(param_retry_engine=engine) as helper:
+            with pytest.raises(requests.HTTPError):
+                helper.delete_file_v0(["token"])
+
+        assert clock.sleeps == [1, 2]
+        assert stub_server.request_count == 3
+
+    def test_circuit_breaker(self, stub_server, make_helper, clock):
+        """Test an open circuit rejects calls without contacting the server"""
+        stub_server.faults = [503] * 3
+        engine = _engine(
+            clock,
+            policies={"delete_files/v0": RetryPolicy(max_attempts=2)},
+            failure_threshold=3,
+            recovery_timeout=60,
+        )
+
+        with make_helper(param_retry_engine=engine) as helper:
+            for _ in range(2):
+                with pytest.raises(requests.HTTPError):
+                    helper.delete_file_v0(["token"])
+            with pytest.raises(CircuitOpenError):
+                helper.delete_file_v0(["token"])
+            assert stub_server.request_count == 3
+
+            clock.now += 60
+            helper.delete_file_v0(["token"])
+
+        assert engine.get_circuit_breaker(stub_server.url_base).state == "closed"
+
+    def test_upload_failures_count_towards_circuit(
+        self, stub_server, make_helper, temp_dir, clock
+    ):
+        """Test non retryable upload 5xx count as host failures, client errors do not"""
+        stub_server.files["token"] = ("a.txt", b"content", "text/plain")
+        engine = _engine(
+            clock,
+            policies={"download_file/v0": RetryPolicy(max_attempts=4)},
+            failure_threshold=6,
+        )
+        circuit_breaker = engine.get_circuit_breaker(stub_server.url_base)
+
+        with make_helper(param_retry_engine=engine) as helper:
+            stub_server.faults = [502] * 4
+            with pytest.raises(requests.HTTPError):
+                helper.download_file_v0("token", temp_dir)
+            stub_server.faults = [502]
+            with pytest.raises(requests.HTTPError):
+                helper.upload_file_using_tuple_v0(
+                    ("a.txt", BytesIO(b"content"), "text/plain")
+                )
+            assert circuit_breaker.consecutive_failures == 5
+            with pytest.raises(requests.HTTPError):
+                helper.download_file_v0("missing", temp_dir)
+            assert circuit_breaker.consecutive_failures == 5
+            stub_server.faults = [500]
+            with pytest.raises(requests.HTTPError):
+                helper.upload_file_using_tuple_v0(
+                    ("a.txt", BytesIO(b"content"), "text/plain")
+                )
+            with pytest.raises(CircuitOpenError):
+                helper.download_file_v0("token", temp_dir)
+
+        assert circuit_breaker.state == "open"
@@ -1,5 +1,6 @@
 import os
-import tempfile
+import subprocess
+import sys
 from io import BytesIO
 from unittest.mock import Mock, mock_open, patch
 
@@ -7,6 +8,7 @@ import pytest
 import requests
 
 from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.pydantic_models import BulkUploadFileV0Input
 
 
 @pytest.fixture
@@ -19,18 +21,6 @@ def helper():
     )
 
 
-@pytest.fixture
-def temp_dir():
-    """Fixture for temporary directory"""
-    temp = tempfile.mkdtemp()
-    yield temp
-    # Cleanup
-    import shutil
-
-    if os.path.exists(temp):
-        shutil.rmtree(temp)
-
-
 class TestInitialization:
     """Tests for SquareFileStoreHelper initialization"""
 
@@ -51,6 +41,111 @@ class TestInitialization:
         )
 
 
+class TestLazyImport:
+    """Tests for deferred imports"""
+
+    def test_heavy_dependencies_not_imported(self):
+        """Test importing and constructing the helper loads no optional dependency"""
+        code = (
+            "import sys\n"
+            "from square_file_store_helper import SquareFileStoreHelper\n"
+            "SquareFileStoreHelper()\n"
+            "print(sorted({m.split('.')[0] for m in sys.modules} & "
+            "{'pydantic', 'kiss_headers', 'square_commons', 'httpx'}))"
+        )
+
+        completed = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+
+        assert completed.stdout.strip() == "[]"
+
+    def test_package_attributes(self):
+        """Test names formerly re-exported by the package are still resolved"""
+        import square_file_store_helper
+        from square_file_store_helper.pydantic_models import UploadFileV0Response
+
+        assert square_file_store_helper.UploadFileV0Response is UploadFileV0Response
+        assert callable(square_file_store_helper.make_request)
+        with pytest.raises(AttributeError):
+            square_file_store_helper.missing_name
+
+    @patch("square_file_store_helper.main.make_request")
+    def test_pydantic_response_model_cached(self, mock_request, helper):
+        """Test the StandardResponse specialization is built once"""
+        mock_request.return_value = {
+            "data": {"main": ["token1"]},
+            "message": None,
+            "log": None,
+        }
+
+        first = helper.delete_file_v0(["token1"], response_as_pydantic=True)
+        second = helper.delete_file_v0(["token1"], response_as_pydantic=True)
+
+        assert type(first) is type(second)
+        assert second.data.main == ["token1"]
+
+
+class TestConnectionPool:
+    """Tests for the pooled session shared by all helper methods"""
+
+    def test_pool_settings(self):
+        """Test pool settings are applied to the mounted adapters"""
+        helper = SquareFileStoreHelper(
+            param_int_connection_pool_size=3,
+            param_int_max_connections_per_host=7,
+            param_float_connection_idle_timeout=5.0,
+        )
+        adapter = helper.global_object_session.get_adapter("http://localhost")
+        assert adapter._pool_connections == 3
+        assert adapter._pool_maxsize == 7
+        assert adapter.idle_timeout == 5.0
+
+    def test_connection_reused_across_endpoints(self, stub_server, temp_dir):
+        """Test upload, download and delete share one kept-alive connection"""
+        with SquareFileStoreHelper(
+            param_str_square_file_store_ip=stub_server.host,
+            param_int_square_file_store_port=stub_server.port,
+        ) as helper:
+            token = helper.upload_file_using_tuple_v0(
+                file=("pooled.txt", BytesIO(b"pooled content"), "text/plain")
+            )["data"]["main"]
+            downloaded_file_path = helper.download_file_v0(token, temp_dir)
+            helper.delete_file_v0([token])
+
+        with open(downloaded_file_path, "rb") as f:
+            assert f.read() == b"pooled content"
+        assert stub_server.connection_count == 1
+
+    def test_idle_timeout_drops_connections(self, stub_server):
+        """Test pooled connections are discarded after the idle timeout"""
+        helper = SquareFileStoreHelper(
+            param_str_square_file_store_ip=stub_server.host,
+            param_int_square_file_store_port=stub_server.port,
+            param_float_connection_idle_timeout=0.0,
+        )
+        helper.delete_file_v0(["token1"])
+        helper.delete_file_v0(["token2"])
+        helper.close()
+
+        assert stub_server.connection_count == 2
+
+    @patch("square_file_store_helper.main.make_request")
+    def test_session_passed_to_requests(self, mock_request, helper):
+        """Test every endpoint is called with the helper session"""
+        mock_request.return_value = {"status": "deleted"}
+
+        helper.delete_file_v0(list_file_storage_token=["token"])
+
+        assert mock_request.call_args[1]["session"] is helper.global_object_session
+
+    def test_close(self, helper):
+        """Test close releases the session"""
+        with patch.object(helper.global_object_session, "close") as mock_close:
+            helper.close()
+        mock_close.assert_called_once()
+
+
 class TestUploadFileUsingFilePath:
     """Tests for upload_file_using_file_path_v0 method"""
 
@@ -179,6 +274,486 @@ class TestUploadFileUsingTuple:
             assert result["status"] == "success"
 
 
+class TestStreamingUpload:
+    """Tests for streaming multipart uploads"""
+
+    def test_stream_file_path(self, stub_server, make_helper, temp_dir):
+        """Test a streamed file path upload arrives intact"""
+        content = os.urandom(300_000)
+        file_path = os.path.join(temp_dir, "data.bin")
+        with open(file_path, "wb") as f:
+            f.write(content)
+
+        with make_helper() as helper:
+            token = helper.upload_file_using_file_path_v0(
+                file_path, app_id=1, stream=True, chunk_size=4096
+            )["data"]["main"]
+
+        assert stub_server.files[token] == (
+            "data.bin",
+            content,
+            "application/octet-stream",
+        )
+
+    def test_stream_pipe(self, stub_server, make_helper):
+        """Test a non seekable pipe can be streamed"""
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(write_fd, "wb") as writer:
+            writer.write(b"piped content")
+        with os.fdopen(read_fd, "rb") as reader, make_helper() as helper:
+            token = helper.upload_file_using_tuple_v0(
+                ("pipe.txt", reader, "text/plain"), stream=True
+            )["data"]["main"]
+
+        assert stub_server.files[token][1] == b"piped content"
+
+    def test_stream_generator(self, stub_server, make_helper):
+        """Test an iterable of bytes can be streamed"""
+
+        def generate():
+            for i in range(100):
+                yield f"line {i}\n".encode()
+
+        with make_helper() as helper:
+            token = helper.upload_file_using_tuple_v0(
+                ("lines.txt", generate(), "text/plain"), stream=True
+            )["data"]["main"]
+
+        assert stub_server.files[token][1] == b"".join(
+            f"line {i}\n".encode() for i in range(100)
+        )
+
+    @patch("square_file_store_helper.main.make_request")
+    def test_stream_sends_lazy_body(self, mock_request, helper):
+        """Test the streamed body replaces the files dict and knows its length"""
+        mock_request.return_value = {"data": {"main": "token"}}
+
+        helper.upload_file_using_tuple_v0(
+            ("a.txt", BytesIO(b"content"), "text/plain"),
+            system_relative_path="docs",
+            stream=True,
+        )
+
+        call_kwargs = mock_request.call_args[1]
+        encoder = call_kwargs["data"]
+        assert "files" not in call_kwargs
+        assert call_kwargs["headers"]["Content-Type"] == encoder.content_type
+        content_length = encoder.len
+        body = b"".join(encoder)
+        assert content_length == len(body)
+        assert b'name="system_relative_path"\r\n\r\ndocs\r\n' in body
+        assert b'name="app_id"' not in body
+        assert b"\r\n\r\ncontent\r\n" in body
+
+    @patch("square_file_store_helper.main.make_request")
+    def test_stream_memory_is_constant(self, mock_request, temp_dir):
+        """Test streaming a large file keeps memory bounded by the chunk size"""
+        import tracemalloc
+
+        file_path = os.path.join(temp_dir, "large.bin")
+        with open(file_path, "wb") as f:
+            f.truncate(64 * 1024 * 1024)
+        # zero copy would send the file as one FileRegion, never read into memory.
+        helper = SquareFileStoreHelper(
+            param_str_square_file_store_protocol="http",
+            param_str_square_file_store_ip="localhost",
+            param_int_square_file_store_port=10100,
+            param_bool_zero_copy_upload=False,
+        )
+
+        def consume(**kwargs):
+            total = 0
+            for chunk in kwargs["data"]:
+                assert isinstance(chunk, bytes)
+                assert len(chunk) <= 256 * 1024
+                total += len(chunk)
+            assert total > 64 * 1024 * 1024
+            return {"data": {"main": "token"}}
+
+        mock_request.side_effect = consume
+        tracemalloc.start()
+        try:
+            helper.upload_file_using_file_path_v0(
+                file_path, stream=True, chunk_size=256 * 1024
+            )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert peak < 4 * 1024 * 1024
+
+
+class TestZeroCopyUpload:
+    """Tests for sendfile uploads of regular files"""
+
+    def _write(self, temp_dir, content):
+        file_path = os.path.join(temp_dir, "data.bin")
+        with open(file_path, "wb") as f:
+            f.write(content)
+        return file_path
+
+    @pytest.mark.parametrize("stream", [False, True])
+    def test_file_path_uses_sendfile(self, stub_server, make_helper, temp_dir, stream):
+        """Test regular files are sent with os.sendfile and arrive intact"""
+        content = os.urandom(300_000)
+        file_path = self._write(temp_dir, content)
+
+        with patch("os.sendfile", wraps=os.sendfile) as mock_sendfile:
+            with make_helper() as helper:
+                token = helper.upload_file_using_file_path_v0(
+                    file_path, app_id=1, stream=stream
+                )["data"]["main"]
+
+        assert mock_sendfile.called
+        assert stub_server.files[token] == (
+            "data.bin",
+            content,
+            "application/octet-stream",
+        )
+
+    def test_tuple_from_current_position(self, stub_server, make_helper, temp_dir):
+        """Test only the bytes after the current file position are sent"""
+        file_path = self._write(temp_dir, b"header|payload")
+
+        with open(file_path, "rb") as f, make_helper() as helper:
+            f.seek(len(b"header|"))
+            token = helper.upload_file_using_tuple_v0(
+                ("payload.bin", f, "application/octet-stream")
+            )["data"]["main"]
+
+        assert stub_server.files[token][1] == b"payload"
+
+    def test_progress_callback(self, make_helper, temp_dir):
+        """Test progress is reported while the file is sent with sendfile"""
+        content = os.urandom(200_000)
+        file_path = self._write(temp_dir, content)
+        updates = []
+
+        with make_helper() as helper:
+            helper.upload_file_using_file_path_v0(
+                file_path,
+                progress_callback=lambda done, total: updates.append((done, total)),
+            )
+
+        assert len(updates) > 2
+        assert updates[-1][0] == updates[-1][1] > len(content)
+        assert all(a[0] <= b[0] for a, b in zip(updates, updates[1:]))
+
+    def test_retried_upload_resends_file(self, stub_server, make_helper, temp_dir):
+        """Test a retried zero copy upload sends the whole file again"""
+        from square_file_store_helper.retry import RetryEngine
+
+        content = os.urandom(100_000)
+        file_path = self._write(temp_dir, content)
+        stub_server.faults = [503]
+
+        with make_helper(
+            param_retry_engine=RetryEngine(sleep=lambda _: None)
+        ) as helper:
+            token = helper.upload_file_using_file_path_v0(file_path)["data"]["main"]
+
+        assert stub_server.request_count == 2
+        assert stub_server.files[token][1] == content
+
+    def test_disabled(self, stub_server, make_helper, temp_dir):
+        """Test param_bool_zero_copy_upload=False keeps the buffered path"""
+        file_path = self._write(temp_dir, b"content")
+
+        with patch("os.sendfile") as mock_sendfile:
+            with make_helper(param_bool_zero_copy_upload=False) as helper:
+                token = helper.upload_file_using_file_path_v0(file_path)["data"]["main"]
+
+        mock_sendfile.assert_not_called()
+        assert stub_server.files[token][1] == b"content"
+
+    def test_file_region_read_fallback(self, temp_dir):
+        """Test senders without sendfile read the same body from the file region"""
+        from square_file_store_helper.multipart import FileRegion, MultipartEncoder
+
+        file_path = self._write(temp_dir, b"0123456789")
+        with open(file_path, "rb") as f:
+            encoder = MultipartEncoder(
+                {"app_id": 1}, "file", "data.bin", f, "text/plain", zero_copy=True
+            )
+            content_length = encoder.len
+            parts = list(encoder)
+            region = parts[1]
+            assert isinstance(region, FileRegion)
+            assert len(region) == 10
+            assert region.read(4) == b"0123"
+            assert region.read() == b"456789"
+            assert region.read() == b""
+            assert content_length == len(parts[0]) + 10 + len(parts[2])
+
+    def test_non_regular_file_is_read(self):
+        """Test in memory files fall back to chunks read into memory"""
+        from square_file_store_helper.multipart import MultipartEncoder
+
+        encoder = MultipartEncoder(
+            {}, "file", "a.txt", BytesIO(b"content"), "text/plain", zero_copy=True
+        )
+
+        assert not encoder.zero_copy
+        assert b"\r\n\r\ncontent\r\n" in b"".join(encoder)
+
+
+class TestResumableDownload:
+    """Tests for resuming interrupted downloads with range requests"""
+
+    content = bytes(range(256)) * 400
+
+    @pytest.fixture
+    def stub_server(self, stub_server):
+        """Fixture for a local stub file store server holding content"""
+        stub_server.files["token"] = ("big file.bin", self.content, "application/pdf")
+        return stub_server
+
+    def test_resumes_after_interruptions(self, stub_server, make_helper, temp_dir):
+        """Test interrupted transfers continue from the bytes already on disk"""
+        stub_server.download_interruptions = 2
+        stub_server.download_interruption_after_bytes = 30000
+
+        with make_helper() as helper:
+            result = helper.download_file_using_stream_v0(
+                "token", temp_dir, chunk_size=1000
+            )
+
+        with open(result.file_path, "rb") as f:
+            assert f.read() == self.content
+        assert result.bytes_written == len(self.content)
+        assert stub_server.range_headers == [None, "bytes=30000-", "bytes=60000-"]
+        assert os.listdir(temp_dir) == ["big file.bin"]
+
+    def test_no_resume_without_range_support(self, stub_server, make_helper, temp_dir):
+        """Test servers without Accept-Ranges fail without leaving files behind"""
+        stub_server.support_ranges = False
+        stub_server.download_interruptions = 1
+        stub_server.download_interruption_after_bytes = 30000
+
+        with make_helper() as helper:
+            with pytest.raises(requests.exceptions.ChunkedEncodingError):
+                helper.download_file_using_stream_v0("token", temp_dir)
+
+        assert stub_server.range_headers == [None]
+        assert os.listdir(temp_dir) == []
+
+    def test_part_file_resumed_by_next_call(self, stub_server, make_helper, temp_dir):
+        """Test a .part file left by a failed call is resumed by the next one"""
+        stub_server.download_interruptions = 2
+        stub_server.download_interruption_after_bytes = 10000
+
+        with make_helper() as helper:
+            with pytest.raises(requests.exceptions.ChunkedEncodingError):
+                helper.download_file_using_stream_v0(
+                    "token", temp_dir, chunk_size=1000, max_resume_attempts=1
+                )
+            assert not os.path.exists(os.path.join(temp_dir, "big file.bin"))
+            assert [name.endswith(".part") for name in os.listdir(temp_dir)] == [True]
+
+            result = helper.download_file_using_stream_v0(
+                "token", temp_dir, chunk_size=1000
+            )
+
+        with open(result.file_path, "rb") as f:
+            assert f.read() == self.content
+        assert stub_server.range_headers == [
+            None,
+            "bytes=10000-",
+            None,
+            "bytes=20000-",
+        ]
+        assert os.listdir(temp_dir) == ["big file.bin"]
+
+    @patch("square_file_store_helper.main.parse_it")
+    @patch("square_file_store_helper.main.make_request")
+    def test_inconsistent_content_range_restarts(
+        self, mock_get, mock_parse, helper, temp_dir
+    ):
+        """Test a 206 for the wrong range is discarded and the download restarts"""
+
+        def response(status_code, headers, chunks):
+            def iter_content(chunk_size):
+                for chunk in chunks:
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    yield chunk
+
+            mock_response = Mock(spec=requests.Response)
+            mock_response.status_code = status_code
+            mock_response.headers = {"Accept-Ranges": "bytes", **headers}
+            mock_response.iter_content.side_effect = iter_content
+            return mock_response
+
+        mock_get.side_effect = [
+            response(
+                200,
+                {"Content-Length": "6"},
+                [b"abc", requests.exceptions.ChunkedEncodingError("reset")],
+            ),
+            response(
+                206, {"Content-Length": "3", "Content-Range": "bytes 0-2/6"}, [b"abc"]
+            ),
+            response(200, {"Content-Length": "6"}, [b"abcdef"]),
+        ]
+        _mock_filename_headers(mock_parse, "file.txt")
+
+        result = helper.download_file_using_stream_v0("token", temp_dir)
+
+        with open(result.file_path, "rb") as f:
+            assert f.read() == b"abcdef"
+        sent_headers = [call[1]["headers"] for call in mock_get.call_args_list]
+        assert sent_headers == [None, {"Range": "bytes=3-"}, None]
+
+
+class TestRangedDownload:
+    """Tests for parallel ranged downloads"""
+
+    content = bytes(range(256)) * 400
+
+    @pytest.fixture
+    def stub_server(self, stub_server):
+        """Fixture for a local stub file store server holding content"""
+        stub_server.files["token"] = ("ranged.bin", self.content, "application/pdf")
+        return stub_server
+
+    def test_parallel_ranges(self, stub_server, make_helper, temp_dir):
+        """Test the file is assembled from parallel byte ranges"""
+        with make_helper() as helper:
+            result = helper.download_file_using_stream_v0(
+                "token", temp_dir, chunk_size=1000, connection_count=4
+            )
+
+        with open(result.file_path, "rb") as f:
+            assert f.read() == self.content
+        assert result.bytes_written == len(self.content)
+        assert stub_server.range_headers[0] == "bytes=0-0"
+        assert sorted(stub_server.range_headers[1:]) == [
+            "bytes=0-25599",
+            "bytes=25600-51199",
+            "bytes=51200-76799",
+            "bytes=76800-102399",
+        ]
+        assert os.listdir(temp_dir) == ["ranged.bin"]
+
+    def test_range_resumed_after_interruption(self, stub_server, make_helper, temp_dir):
+        """Test an interrupted range is resumed from its last written byte"""
+        # the probe request and both ranges are interrupted once.
+        stub_server.download_interruptions = 3
+        stub_server.download_interruption_after_bytes = 5000
+
+        with make_helper() as helper:
+            result = helper.download_file_using_stream_v0(
+                "token", temp_dir, chunk_size=1000, connection_count=2
+            )
+
+        with open(result.file_path, "rb") as f:
+            assert f.read() == self.content
+        assert sorted(stub_server.range_headers[1:]) == [
+            "bytes=0-51199",
+            "bytes=5000-51199",
+            "bytes=51200-102399",
+            "bytes=56200-102399",
+        ]
+
+    def test_fallback_without_range_support(self, stub_server, make_helper, temp_dir):
+        """Test servers without range support use a single stream"""
+        stub_server.support_ranges = False
+
+        with make_helper() as helper:
+            result = helper.download_file_using_stream_v0(
+                "token", temp_dir, connection_count=4
+            )
+
+        with open(result.file_path, "rb") as f:
+            assert f.read() == self.content
+        assert stub_server.range_headers == ["bytes=0-0", None]
+
+    def test_empty_file(self, stub_server, make_helper, temp_dir):
+        """Test empty files fall back to a single stream"""
+        stub_server.files["token"] = ("ranged.bin", b"", "application/pdf")
+
+        with make_helper() as helper:
+            result = helper.download_file_using_stream_v0(
+                "token", temp_dir, connection_count=4
+            )
+
+        assert result.bytes_written == 0
+        assert os.path.getsize(result.file_path) == 0
+
+    def test_invalid_connection_count(self, helper, temp_dir):
+        """Test non-positive connection counts are rejected"""
+        with pytest.raises(ValueError):
+            helper.download_file_using_stream_v0("token", temp_dir, connection_count=0)
+
+
+class TestUploadFilesInBulk:
+    """Tests for upload_files_in_bulk_v0 method"""
+
+    def test_results_in_input_order(self, stub_server, temp_dir):
+        """Test mixed inputs are uploaded and failures do not stop the batch"""
+        file_paths = []
+        for i in range(20):
+            file_path = os.path.join(temp_dir, f"{i}.txt")
+            with open(file_path, "wb") as f:
+                f.write(str(i).encode())
+            file_paths.append(file_path)
+        files = [
+            *file_paths[:10],
+            os.path.join(temp_dir, "missing.txt"),
+            ("tuple.bin", BytesIO(b"tuple"), "application/octet-stream"),
+            *file_paths[10:],
+        ]
+
+        with SquareFileStoreHelper(
+            param_str_square_file_store_ip=stub_server.host,
+            param_int_square_file_store_port=stub_server.port,
+        ) as helper:
+            results = helper.upload_files_in_bulk_v0(
+                files, max_workers=4, response_as_pydantic=True
+            )
+
+        assert [result.index for result in results] == list(range(len(files)))
+        assert isinstance(results[10].error, FileNotFoundError)
+        assert not results[10].ok
+        assert stub_server.files[results[11].response.data.main][1] == b"tuple"
+        for i, result in enumerate(results[:10] + results[12:]):
+            assert result.ok
+            assert stub_server.files[result.response.data.main][1] == str(i).encode()
+
+    @patch("square_file_store_helper.main.make_request")
+    def test_per_item_overrides(self, mock_request, helper):
+        """Test shared app_id / system_relative_path and per item overrides"""
+        mock_request.return_value = {"data": {"main": "token"}}
+
+        helper.upload_files_in_bulk_v0(
+            [
+                ("a.txt", BytesIO(b"a"), "text/plain"),
+                BulkUploadFileV0Input(
+                    file=("b.txt", BytesIO(b"b"), "text/plain"), app_id=None
+                ),
+                BulkUploadFileV0Input(
+                    file=("c.txt", BytesIO(b"c"), "text/plain"),
+                    system_relative_path="custom",
+                ),
+            ],
+            app_id=5,
+            system_relative_path="shared",
+            max_workers=1,
+        )
+
+        sent = [call[1]["data"] for call in mock_request.call_args_list]
+        assert sent == [
+            {"app_id": 5, "system_relative_path": "shared"},
+            {"app_id": None, "system_relative_path": "shared"},
+            {"app_id": 5, "system_relative_path": "custom"},
+        ]
+
+    def test_invalid_max_workers(self, helper):
+        """Test non-positive max_workers are rejected"""
+        with pytest.raises(ValueError):
+            helper.upload_files_in_bulk_v0([], max_workers=0)
+
+
 class TestDownloadFile:
     """Tests for download_file_v0 method"""
 
@@ -323,6 +898,181 @@ class TestDownloadFile:
             helper.download_file_v0("token", "/tmp")
 
 
+def _mock_filename_headers(mock_parse, file_name):
+    mock_headers = Mock()
+    mock_content_disposition = Mock()
+    mock_content_disposition.has.side_effect = lambda x: x == "filename"
+    mock_content_disposition.__getitem__ = Mock(return_value=file_name)
+    mock_headers.content_disposition = mock_content_disposition
+    mock_parse.return_value = mock_headers
+
+
+class TestDownloadFileUsingStream:
+    """Tests for download_file_using_stream_v0 method"""
+
+    @patch("square_file_store_helper.main.parse_it")
+    @patch("square_file_store_helper.main.make_request")
+    def test_success(self, mock_get, mock_parse, helper, temp_dir):
+        """Test chunks are written to disk and bytes are reported"""
+        mock_response = Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.iter_content.return_value = iter([b"abc", b"", b"defg"])
+        mock_get.return_value = mock_response
+        _mock_filename_headers(mock_parse, "streamed.bin")
+
+        result = helper.download_file_using_stream_v0(
+            file_storage_token="token123",
+            output_folder_path=temp_dir,
+            chunk_size=4,
+        )
+
+        assert result.file_path == f"{temp_dir}{os.sep}streamed.bin"
+        assert result.file_name == "streamed.bin"
+        assert result.bytes_written == 7
+        with open(result.file_path, "rb") as f:
+            assert f.read() == b"abcdefg"
+        assert os.listdir(temp_dir) == ["streamed.bin"]
+        assert mock_get.call_args[1]["stream"] is True
+        mock_response.iter_content.assert_called_once_with(chunk_size=4)
+        mock_response.close.assert_called_once()
+
+    @patch("square_file_store_helper.main.parse_it")
+    @patch("square_file_store_helper.main.make_request")
+    def test_creates_output_folder(self, mock_get, mock_parse, helper, temp_dir):
+        """Test missing output folders are created"""
+        mock_response = Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.iter_content.return_value = iter([b"data"])
+        mock_get.return_value = mock_response
+        _mock_filename_headers(mock_parse, "file.txt")
+
+        output_folder_path = os.path.join(temp_dir, "nested", "folder")
+        result = helper.download_file_using_stream_v0("token", output_folder_path)
+
+        assert os.path.isfile(result.file_path)
+
+    @patch("square_file_store_helper.main.parse_it")
+    @patch("square_file_store_helper.main.make_request")
+    def test_interrupted_download_leaves_no_file(
+        self, mock_get, mock_parse, helper, temp_dir
+    ):
+        """Test a failure mid-stream removes the temporary file and keeps the old file"""
+
+        def broken_stream(chunk_size):
+            yield b"partial"
+            raise requests.ConnectionError("connection reset")
+
+        final_path = os.path.join(temp_dir, "file.txt")
+        with open(final_path, "wb") as f:
+            f.write(b"previous version")
+
+        mock_response = Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.iter_content.side_effect = broken_stream
+        mock_get.return_value = mock_response
+        _mock_filename_headers(mock_parse, "file.txt")
+
+        with pytest.raises(requests.ConnectionError):
+            helper.download_file_using_stream_v0("token", temp_dir)
+
+        assert os.listdir(temp_dir) == ["file.txt"]
+        with open(final_path, "rb") as f:
+            assert f.read() == b"previous version"
+        mock_response.close.assert_called_once()
+
+    def test_invalid_chunk_size(self, helper, temp_dir):
+        """Test non-positive chunk sizes are rejected"""
+        with pytest.raises(ValueError):
+            helper.download_file_using_stream_v0("token", temp_dir, chunk_size=0)
+
+
+class TestDownloadFilesInBulk:
+    """Tests for download_files_in_bulk_v0 method"""
+
+    @staticmethod
+    def _store(stub_server, tokens_to_names):
+        for token, file_name in tokens_to_names.items():
+            stub_server.files[token] = (file_name, token.encode(), "text/plain")
+
+    def test_suffix_on_collision(self, stub_server, temp_dir):
+        """Test colliding names get deterministic suffixes in input order"""
+        self._store(
+            stub_server,
+            {"t1": "a.txt", "t2": "a.txt", "t3": "b.txt", "t4": "a.txt"},
+        )
+        with open(os.path.join(temp_dir, "b.txt"), "wb") as f:
+            f.write(b"existing")
+
+        with SquareFileStoreHelper(
+            param_str_square_file_store_ip=stub_server.host,
+            param_int_square_file_store_port=stub_server.port,
+        ) as helper:
+            result = helper.download_files_in_bulk_v0(
+                ["t1", "t2", "missing", "t3", "t4", "t1"], temp_dir, max_workers=4
+            )
+
+        assert result.file_paths == {
+            "t1": os.path.join(temp_dir, "a.txt"),
+            "t2": os.path.join(temp_dir, "a (1).txt"),
+            "t3": os.path.join(temp_dir, "b (1).txt"),
+            "t4": os.path.join(temp_dir, "a (2).txt"),
+        }
+        for token, file_path in result.file_paths.items():
+            with open(file_path, "rb") as f:
+                assert f.read() == token.encode()
+        assert list(result.errors) == ["missing"]
+        assert isinstance(result.errors["missing"], requests.HTTPError)
+        assert sorted(os.listdir(temp_dir)) == [
+            "a (1).txt",
+            "a (2).txt",
+            "a.txt",
+            "b (1).txt",
+            "b.txt",
+        ]
+
+    def test_subdirectory_on_collision(self, stub_server, temp_dir):
+        """Test colliding names are moved to per token subdirectories"""
+        self._store(stub_server, {"t1": "a.txt", "t2": "a.txt"})
+
+        with SquareFileStoreHelper(
+            param_str_square_file_store_ip=stub_server.host,
+            param_int_square_file_store_port=stub_server.port,
+        ) as helper:
+            result = helper.download_files_in_bulk_v0(
+                ["t1", "t2"], temp_dir, on_collision="subdirectory"
+            )
+
+        assert result.file_paths == {
+            "t1": os.path.join(temp_dir, "a.txt"),
+            "t2": os.path.join(temp_dir, "t2", "a.txt"),
+        }
+        assert result.errors == {}
+
+    def test_fail_on_collision(self, stub_server, temp_dir):
+        """Test colliding names are reported as errors without leftovers"""
+        self._store(stub_server, {"t1": "a.txt", "t2": "a.txt"})
+
+        with SquareFileStoreHelper(
+            param_str_square_file_store_ip=stub_server.host,
+            param_int_square_file_store_port=stub_server.port,
+        ) as helper:
+            result = helper.download_files_in_bulk_v0(
+                ["t1", "t2"], temp_dir, on_collision="fail"
+            )
+
+        assert result.file_paths == {"t1": os.path.join(temp_dir, "a.txt")}
+        assert isinstance(result.errors["t2"], FileExistsError)
+        assert os.listdir(temp_dir) == ["a.txt"]
+
+    def test_invalid_policy(self, helper, temp_dir):
+        """Test unknown collision policies are rejected"""
+        with pytest.raises(ValueError):
+            helper.download_files_in_bulk_v0(["t1"], temp_dir, on_collision="skip")
+
+
 class TestDeleteFile:
     """Tests for delete_file_v0 method"""
 
@@ -374,6 +1124,98 @@ class TestDeleteFile:
         assert result["count"] == token_count
 
 
+class TestDeleteFileBatching:
+    """Tests for delete_file_v0 batching"""
+
+    @patch("square_file_store_helper.main.make_request")
+    def test_split_by_batch_size(self, mock_request, helper):
+        """Test tokens are split by item count and results merged in order"""
+        mock_request.side_effect = lambda **kwargs: {
+            "data": {"main": list(kwargs["params"]["file_storage_tokens"])},
+            "message": "files deleted successfully.",
+            "log": None,
+        }
+        tokens = [f"token{i}" for i in range(25)]
+
+        result = helper.delete_file_v0(
+            tokens, response_as_pydantic=True, max_batch_size=10
+        )
+
+        batch_sizes = sorted(
+            len(call[1]["params"]["file_storage_tokens"])
+            for call in mock_request.call_args_list
+        )
+        assert batch_sizes == [5, 10, 10]
+        assert result.data.main == tokens
+        assert result.data.failed_file_storage_tokens == []
+        assert result.message == "files deleted successfully."
+
+    @patch("square_file_store_helper.main.make_request")
+    def test_split_by_url_length(self, mock_request, helper):
+        """Test no request url exceeds max_url_length"""
+        mock_request.side_effect = lambda **kwargs: {
+            "data": {"main": list(kwargs["params"]["file_storage_tokens"])}
+        }
+        tokens = [f"{i:032d}" for i in range(100)]
+
+        result = helper.delete_file_v0(tokens, max_url_length=500)
+
+        assert mock_request.call_count > 1
+        for call in mock_request.call_args_list:
+            prepared = requests.Request(
+                "DELETE",
+                f"{helper.global_str_square_file_store_url_base}/delete_files/v0",
+                params=call[1]["params"],
+            ).prepare()
+            assert len(prepared.url) <= 500
+        assert result["data"]["main"] == tokens
+
+    @patch("square_file_store_helper.main.make_request")
+    def test_failed_batches_reported(self, mock_request, helper):
+        """Test tokens of failed batches are reported instead of raising"""
+
+        def fake_request(**kwargs):
+            batch = kwargs["params"]["file_storage_tokens"]
+            if "token3" in batch:
+                raise requests.HTTPError("502 Bad Gateway")
+            return {"data": {"main": list(batch)}, "message": "ok", "log": None}
+
+        mock_request.side_effect = fake_request
+        tokens = [f"token{i}" for i in range(6)]
+
+        result = helper.delete_file_v0(tokens, max_batch_size=2)
+
+        assert result["data"]["main"] == ["token0", "token1", "token4", "token5"]
+        assert result["data"]["failed_file_storage_tokens"] == ["token2", "token3"]
+        assert result["log"][0]["file_storage_tokens"] == ["token2", "token3"]
+        assert "502 Bad Gateway" in result["log"][0]["error"]
+
+    @patch("square_file_store_helper.main.make_request")
+    def test_single_batch_raises(self, mock_request, helper):
+        """Test a list that fits one batch keeps raising on failure"""
+        mock_request.side_effect = requests.HTTPError("502 Bad Gateway")
+
+        with pytest.raises(requests.HTTPError):
+            helper.delete_file_v0(["token1", "token2"])
+
+    def test_batches_against_server(self, stub_server):
+        """Test batched deletes against the stub server"""
+        tokens = [f"token{i}" for i in range(30)]
+        for token in tokens:
+            stub_server.files[token] = ("f.txt", b"", "text/plain")
+
+        with SquareFileStoreHelper(
+            param_str_square_file_store_ip=stub_server.host,
+            param_int_square_file_store_port=stub_server.port,
+        ) as helper:
+            result = helper.delete_file_v0(
+                tokens + ["missing"], max_batch_size=7, response_as_pydantic=True
+            )
+
+        assert result.data.main == tokens
+        assert stub_server.files == {}
+
+
 class TestIntegration:
     """Integration tests with real file system operations"""
 
@@ -0,0 +1,192 @@
+import os
+
+import pytest
+
+from square_file_store_helper import SquareFileStoreHelper
+from square_file_store_helper.sync import DirectorySync
+
+
+@pytest.fixture
+def helper(stub_server):
+    """Fixture for a helper talking to the stub server"""
+    with SquareFileStoreHelper(
+        param_str_square_file_store_ip=stub_server.host,
+        param_int_square_file_store_port=stub_server.port,
+    ) as helper:
+        yield helper
+
+
+def _write(root, relative_path, content):
+    path = os.path.join(root, *relative_path.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def _tree(temp_dir):
+    root = os.path.join(temp_dir, "tree")
+    _write(root, "a.txt", b"a")
+    _write(root, "docs/b.txt", b"b")
+    _write(root, "docs/deep/c.csv", b"c,c")
+    return root
+
+
+def _sync(helper, root, temp_dir, **kwargs):
+    return DirectorySync(
+        helper,
+        root,
+        os.path.join(temp_dir, "manifest.sqlite3"),
+        system_relative_path="backup",
+        **kwargs,
+    )
+
+
+def _tokens_by_path(stub_server):
+    return {
+        f"{stub_server.upload_fields[token]['system_relative_path']}/{name}": token
+        for token, (name, _, _) in stub_server.files.items()
+    }
+
+
+class TestDirectorySync:
+    """Tests for DirectorySync"""
+
+    def test_first_run_uploads_tree(self, stub_server, helper, temp_dir):
+        """Test every file is uploaded under a path derived from its directory"""
+        root = _tree(temp_dir)
+
+        result = _sync(helper, root, temp_dir, app_id=3).run()
+
+        assert result.uploaded == ["a.txt", "docs/b.txt", "docs/deep/c.csv"]
+        assert result.unchanged == 0
+        assert result.errors == {}
+        assert sorted(_tokens_by_path(stub_server)) == [
+            "backup/a.txt",
+            "backup/docs/b.txt",
+            "backup/docs/deep/c.csv",
+        ]
+        assert {fields["app_id"] for fields in stub_server.upload_fields.values()} == {
+            "3"
+        }
+
+    def test_unchanged_tree_sends_no_request(self, stub_server, helper, temp_dir):
+        """Test a second run over an unchanged tree only stats the files"""
+        root = _tree(temp_dir)
+        _sync(helper, root, temp_dir).run()
+        request_count = stub_server.request_count
+
+        result = _sync(helper, root, temp_dir).run()
+
+        assert result.uploaded == []
+        assert result.deleted == []
+        assert result.unchanged == 3
+        assert stub_server.request_count == request_count
+
+    def test_changed_file_replaces_token(self, stub_server, helper, temp_dir):
+        """Test a changed file is uploaded again and its old token deleted"""
+        root = _tree(temp_dir)
+        _sync(helper, root, temp_dir).run()
+        old_token = _tokens_by_path(stub_server)["backup/docs/b.txt"]
+        _write(root, "docs/b.txt", b"b changed")
+
+        result = _sync(helper, root, temp_dir).run()
+
+        assert result.uploaded == ["docs/b.txt"]
+        assert result.unchanged == 2
+        assert result.deleted == []
+        assert result.deleted_file_storage_tokens == [old_token]
+        assert old_token not in stub_server.files
+        new_token = _tokens_by_path(stub_server)["backup/docs/b.txt"]
+        assert stub_server.files[new_token][1] == b"b changed"
+
+    def test_touched_file_is_not_uploaded(self, stub_server, helper, temp_dir):
+        """Test a new modification time with the same content only updates the manifest"""
+        root = _tree(temp_dir)
+        _sync(helper, root, temp_dir).run()
+        path = os.path.join(root, "a.txt")
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+
+        result = _sync(helper, root, temp_dir).run()
+        request_count = stub_server.request_count
+        second_result = _sync(helper, root, temp_dir).run()
+
+        assert result.uploaded == []
+        assert result.unchanged == 3
+        assert second_result.unchanged == 3
+        assert stub_server.request_count == request_count
+
+    def test_removed_file_is_deleted(self, stub_server, helper, temp_dir):
+        """Test tokens of files removed locally are deleted"""
+        root = _tree(temp_dir)
+        _sync(helper, root, temp_dir).run()
+        token = _tokens_by_path(stub_server)["backup/docs/deep/c.csv"]
+        os.remove(os.path.join(root, "docs", "deep", "c.csv"))
+
+        result = _sync(helper, root, temp_dir).run()
+
+        assert result.deleted == ["docs/deep/c.csv"]
+        assert result.deleted_file_storage_tokens == [token]
+        assert token not in stub_server.files
+        assert len(stub_server.files) == 2
+
+    def test_include_exclude(self, stub_server, helper, temp_dir):
+        """Test include / exclude globs match relative paths and names"""
+        root = _tree(temp_dir)
+        _write(root, ".git/objects/x.txt", b"x")
+        _write(root, "docs/notes.tmp", b"tmp")
+        _write(root, "build/out.txt", b"out")
+
+        result = _sync(
+            helper,
+            root,
+            temp_dir,
+            include=["*.txt", "*.tmp"],
+            exclude=[".git", "*.tmp", "build/*"],
+        ).run()
+
+        assert result.uploaded == ["a.txt", "docs/b.txt"]
+
+    def test_failed_upload_retried_next_run(self, stub_server, helper, temp_dir):
+        """Test a failed upload is reported and retried by the next run"""
+        root = os.path.join(temp_dir, "tree")
+        _write(root, "a.txt", b"a")
+        stub_server.faults = [500]
+
+        result = _sync(helper, root, temp_dir).run()
+        second_result = _sync(helper, root, temp_dir).run()
+
+        assert list(result.errors) == ["a.txt"]
+        assert result.uploaded == []
+        assert second_result.uploaded == ["a.txt"]
+
+    def test_failed_deletion_retried_next_run(self, stub_server, helper, temp_dir):
+        """Test tokens whose deletion failed are deleted by the next run"""
+        root = os.path.join(temp_dir, "tree")
+        path = _write(root, "a.txt", b"a")
+        _sync(helper, root, temp_dir).run()
+        token = next(iter(stub_server.files))
+        os.remove(path)
+        stub_server.faults = [500]
+
+        result = _sync(helper, root, temp_dir).run()
+        second_result = _sync(helper, root, temp_dir).run()
+
+        assert result.deleted == ["a.txt"]
+        assert result.failed_file_storage_tokens == [token]
+        assert second_result.deleted == []
+        assert second_result.deleted_file_storage_tokens == [token]
+        assert stub_server.files == {}
+
+    def test_manifest_bound_to_destination(self, helper, temp_dir):
+        """Test a manifest cannot be reused for another destination"""
+        root = _tree(temp_dir)
+        _sync(helper, root, temp_dir)
+
+        with pytest.raises(ValueError):
+            DirectorySync(
+                helper,
+                root,
+                os.path.join(temp_dir, "manifest.sqlite3"),
+                system_relative_path="elsewhere",
+            )
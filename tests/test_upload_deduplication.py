@@ -0,0 +1,148 @@
+import io
+import os
+
+import pytest
+
+from square_file_store_helper.upload_deduplication import UploadDeduplicationIndex
+
+
+def _write(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+class TestUploadDeduplicationIndex:
+    """Tests for UploadDeduplicationIndex"""
+
+    def test_hash_file_restores_position(self):
+        """Test hashing starts at and returns to the current position"""
+        file = io.BytesIO(b"skip-content")
+        file.seek(5)
+
+        content_hash, size = UploadDeduplicationIndex.hash_file(file)
+
+        assert size == 7
+        assert file.tell() == 5
+        assert (
+            content_hash
+            == UploadDeduplicationIndex.hash_file(io.BytesIO(b"content"))[0]
+        )
+
+    def test_find_add_invalidate(self, temp_dir):
+        """Test entries are keyed by content, name, app_id and path"""
+        index = UploadDeduplicationIndex(os.path.join(temp_dir, "index.sqlite3"))
+        index.add("hash", "a.txt", None, "others/misc", "token")
+
+        assert index.find("hash", "a.txt", None, "others/misc") == "token"
+        assert index.find("hash", "a.txt", 1, "others/misc") is None
+        assert index.find("hash", "b.txt", None, "others/misc") is None
+        assert index.find("hash", "a.txt", None, "other/path") is None
+
+        index.invalidate(["token"])
+        assert index.find("hash", "a.txt", None, "others/misc") is None
+
+
+class TestHelperWithUploadDeduplication:
+    """Tests for SquareFileStoreHelper with an upload deduplication index"""
+
+    def _helper(self, make_helper, temp_dir):
+        return make_helper(
+            param_upload_deduplication_index=UploadDeduplicationIndex(
+                os.path.join(temp_dir, "dedup", "index.sqlite3")
+            ),
+        )
+
+    def test_duplicate_upload_skipped(self, stub_server, make_helper, temp_dir):
+        """Test uploading the same file twice sends it once"""
+        file_path = _write(os.path.join(temp_dir, "report.txt"), b"report")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            first = helper.upload_file_using_file_path_v0(file_path)
+            second = helper.upload_file_using_file_path_v0(
+                file_path, response_as_pydantic=True
+            )
+            stats = helper.global_object_upload_deduplication_index.get_stats()
+
+        assert second.data.main == first["data"]["main"]
+        assert len(stub_server.files) == 1
+        assert stats.hits == 1
+        assert stats.misses == 1
+        assert stats.bytes_saved == 6
+        assert stats.hit_ratio == 0.5
+
+    def test_different_destination_uploaded(self, stub_server, make_helper, temp_dir):
+        """Test the same content with another app_id or path is uploaded again"""
+        file_path = _write(os.path.join(temp_dir, "report.txt"), b"report")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            helper.upload_file_using_file_path_v0(file_path)
+            helper.upload_file_using_file_path_v0(file_path, app_id=1)
+            helper.upload_file_using_file_path_v0(
+                file_path, system_relative_path="other/path"
+            )
+
+        assert len(stub_server.files) == 3
+
+    def test_changed_content_uploaded(self, stub_server, make_helper, temp_dir):
+        """Test a modified file under the same name is uploaded again"""
+        file_path = _write(os.path.join(temp_dir, "report.txt"), b"v1")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            first = helper.upload_file_using_file_path_v0(file_path)
+            _write(file_path, b"v2")
+            second = helper.upload_file_using_file_path_v0(file_path)
+
+        assert first["data"]["main"] != second["data"]["main"]
+        assert stub_server.files[second["data"]["main"]][1] == b"v2"
+
+    def test_tuple_upload_deduplicated(self, stub_server, make_helper, temp_dir):
+        """Test seekable tuple uploads are deduplicated and sent in full on a miss"""
+        with self._helper(make_helper, temp_dir) as helper:
+            first = helper.upload_file_using_tuple_v0(
+                ("a.txt", io.BytesIO(b"content"), "text/plain")
+            )
+            second = helper.upload_file_using_tuple_v0(
+                ("a.txt", io.BytesIO(b"content"), "text/plain")
+            )
+
+        assert first["data"]["main"] == second["data"]["main"]
+        assert stub_server.files[first["data"]["main"]][1] == b"content"
+        assert len(stub_server.files) == 1
+
+    def test_index_survives_restart(self, stub_server, make_helper, temp_dir):
+        """Test a new helper instance reuses the persisted index"""
+        file_path = _write(os.path.join(temp_dir, "report.txt"), b"report")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            helper.upload_file_using_file_path_v0(file_path)
+        with self._helper(make_helper, temp_dir) as helper:
+            helper.upload_file_using_file_path_v0(file_path)
+
+        assert len(stub_server.files) == 1
+
+    def test_delete_invalidates_index(self, stub_server, make_helper, temp_dir):
+        """Test a deleted file is uploaded again"""
+        file_path = _write(os.path.join(temp_dir, "report.txt"), b"report")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            first = helper.upload_file_using_file_path_v0(file_path)
+            helper.delete_file_v0([first["data"]["main"]])
+            second = helper.upload_file_using_file_path_v0(file_path)
+
+        assert second["data"]["main"] in stub_server.files
+        assert second["data"]["main"] != first["data"]["main"]
+
+    def test_failed_delete_keeps_index(self, stub_server, make_helper, temp_dir):
+        """Test a file the store failed to delete is still deduplicated"""
+        file_path = _write(os.path.join(temp_dir, "report.txt"), b"report")
+
+        with self._helper(make_helper, temp_dir) as helper:
+            first = helper.upload_file_using_file_path_v0(file_path)
+            stub_server.faults = [503]
+            with pytest.raises(Exception):
+                helper.delete_file_v0([first["data"]["main"]])
+            second = helper.upload_file_using_file_path_v0(file_path)
+
+        assert second["data"]["main"] == first["data"]["main"]
+        assert len(stub_server.files) == 1